@@ -0,0 +1,131 @@
+# %%
+# Imports #
+
+import argparse
+import time
+
+import config  # noqa: F401
+import numpy as np
+import pandas as pd
+from pygsheets.utils import numericise_all
+from utils.display_tools import print_logger
+from utils.google_tools import (
+    convert_values_to_df,
+    get_book_sheet_df,
+    get_book_sheet_df_raw,
+)
+
+# %%
+# Functions #
+
+
+def get_synthetic_values(num_rows, num_cols, as_strings=True):
+    """
+    Builds a sheet shaped list of rows like the Sheets API returns.
+    With as_strings every cell is text like FORMATTED_VALUE, otherwise numbers
+    stay numbers like UNFORMATTED_VALUE.
+    """
+    np.random.seed(0)  # for reproducibility
+    ls_columns = []
+    for col in range(num_cols):
+        if col % 4 == 0:
+            column = np.random.randint(1, 100000, num_rows).tolist()
+        elif col % 4 == 1:
+            column = np.round(np.random.rand(num_rows) * 1000, 2).tolist()
+        elif col % 4 == 2:
+            column = np.random.choice(["alpha", "beta", "gamma"], num_rows).tolist()
+        else:
+            column = (
+                pd.date_range("2020-01-01", periods=num_rows, freq="h")
+                .strftime("%Y-%m-%d")
+                .tolist()
+            )
+        if as_strings:
+            column = [str(value) for value in column]
+        ls_columns.append(column)
+
+    header = [f"col_{col}" for col in range(num_cols)]
+    return [header] + [list(row) for row in zip(*ls_columns)]
+
+
+def convert_values_like_get_as_df(values):
+    """Replicates the conversion get_as_df(numerize=True) does after the download."""
+    max_row = max(len(row) for row in values)
+    values = [row + [""] * (max_row - len(row)) for row in values]
+    values = [numericise_all(row, "") for row in values]
+    return pd.DataFrame(values[1:], columns=values[0])
+
+
+def time_function(func, *args, **kwargs):
+    start_time = time.time()
+    result = func(*args, **kwargs)
+    return time.time() - start_time, result
+
+
+def benchmark_conversion(num_rows, num_cols):
+    """Compares the conversion cost alone, without any network calls."""
+    formatted_values = get_synthetic_values(num_rows, num_cols, as_strings=True)
+    unformatted_values = get_synthetic_values(num_rows, num_cols, as_strings=False)
+
+    get_as_df_time, _ = time_function(convert_values_like_get_as_df, formatted_values)
+    raw_formatted_time, _ = time_function(convert_values_to_df, formatted_values)
+    raw_unformatted_time, _ = time_function(convert_values_to_df, unformatted_values)
+
+    print_logger(f"Conversion of {num_rows} x {num_cols} values", as_break=True)
+    dict_times = {
+        "get_as_df numerize": get_as_df_time,
+        "raw FORMATTED_VALUE": raw_formatted_time,
+        "raw UNFORMATTED_VALUE": raw_unformatted_time,
+    }
+    max_time = max(dict_times.values())
+    for name, elapsed in dict_times.items():
+        print(
+            f"{name}".ljust(30),
+            f"{elapsed:.2f}s".ljust(8),
+            "|" * int(elapsed / max_time * 100),
+        )
+
+    return dict_times
+
+
+def benchmark_sheet(book_name, sheet_name):
+    """Compares download plus conversion against a real sheet."""
+    get_as_df_time, df_get_as_df = time_function(
+        get_book_sheet_df, book_name, sheet_name
+    )
+    raw_time, df_raw = time_function(get_book_sheet_df_raw, book_name, sheet_name)
+
+    print_logger(
+        f"Reading {book_name} : {sheet_name} with shape {df_raw.shape}", as_break=True
+    )
+    print(f"get_book_sheet_df:     {get_as_df_time:.2f}s")
+    print(f"get_book_sheet_df_raw: {raw_time:.2f}s")
+    print(f"same shape: {df_get_as_df.shape == df_raw.shape}")
+
+    return get_as_df_time, raw_time
+
+
+# %%
+# Main #
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark sheet values to DataFrame conversion."
+    )
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--cols", type=int, default=40)
+    parser.add_argument(
+        "--book", type=str, default=None, help="Also benchmark a real book"
+    )
+    parser.add_argument(
+        "--sheet", type=str, default=None, help="Sheet of the real book"
+    )
+    args = parser.parse_args()
+
+    benchmark_conversion(args.rows, args.cols)
+
+    if args.book is not None and args.sheet is not None:
+        benchmark_sheet(args.book, args.sheet)
+
+
+# %%
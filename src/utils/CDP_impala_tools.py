@@ -12,6 +12,7 @@ from dotenv import load_dotenv
 if __name__ == "__main__":
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from utils.cache_tools import QUERY_CACHE_DEFAULT_TTL_SECONDS, read_through_query_cache
 from utils.config_utils import file_dir, grandparent_dir
 from utils.display_tools import print_logger
 
@@ -31,7 +32,23 @@ if os.path.exists(user_env_path):
 # Queries #
 
 
-def query_cdp(query):
+def query_cdp(
+    query,
+    params=None,
+    cache=False,
+    cache_ttl_seconds=QUERY_CACHE_DEFAULT_TTL_SECONDS,
+):
+    if cache is not False:
+        return read_through_query_cache(
+            "cdp",
+            [os.getenv("CDP_HOST"), os.getenv("CDP_USERNAME")],
+            query,
+            lambda: query_cdp(query, params=params),
+            params=params,
+            cache=cache,
+            cache_ttl_seconds=cache_ttl_seconds,
+        )
+
     print_logger(f"Running query: {query}", level="info")
     dwh_host = os.getenv("CDP_HOST")
     dwh_user = os.getenv("CDP_USERNAME")
@@ -46,7 +63,7 @@ def query_cdp(query):
     )
 
     dwh_cursor = conn.cursor()
-    dwh_cursor.execute(query)
+    dwh_cursor.execute(query, params)
     dwh_data = dwh_cursor.fetchall()
     col_names = [v[0] for v in dwh_cursor.description]
     return_data = [v for v in dwh_data]
@@ -0,0 +1,305 @@
+# %%
+# Imports #
+
+import hashlib
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+# append grandparent
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.config_utils import query_cache_dir
+from utils.display_tools import print_logger
+
+# %%
+# Keys #
+
+
+def get_cache_key(*parts):
+    """
+    Builds a stable cache key from any json serializable parts.
+
+    Args:
+        *parts: The values that identify the cached item.
+
+    Returns:
+        str: A sha256 hex digest of the parts.
+    """
+    key_string = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(key_string.encode("utf-8")).hexdigest()
+
+
+def get_cache_paths(cache_dir, cache_key):
+    """
+    Returns the data and metadata paths for a cache key.
+
+    Args:
+        cache_dir (str): The directory the cache lives in.
+        cache_key (str): The key of the cached item.
+
+    Returns:
+        tuple: (parquet path, pickle path, metadata path)
+    """
+    return (
+        os.path.join(cache_dir, f"{cache_key}.parquet"),
+        os.path.join(cache_dir, f"{cache_key}.pkl"),
+        os.path.join(cache_dir, f"{cache_key}.json"),
+    )
+
+
+# %%
+# Read and Write #
+
+
+def is_cache_expired(dict_metadata, ttl_seconds):
+    """
+    Checks if a cached item is older than the ttl.
+
+    Args:
+        dict_metadata (dict): The metadata stored with the cached item.
+        ttl_seconds (int or None): The max age in seconds, None never expires.
+
+    Returns:
+        bool: True if the item is expired.
+    """
+    if ttl_seconds is None:
+        return False
+    return time.time() - dict_metadata.get("created_at", 0) > ttl_seconds
+
+
+def read_df_cache(cache_dir, cache_key, memory_map=True):
+    """
+    Reads a cached DataFrame and its metadata.
+
+    Args:
+        cache_dir (str): The directory the cache lives in.
+        cache_key (str): The key of the cached item.
+        memory_map (bool): Whether to memory map parquet files when reading.
+
+    Returns:
+        tuple: (DataFrame, dict metadata), or (None, None) on a miss.
+    """
+    parquet_path, pickle_path, metadata_path = get_cache_paths(cache_dir, cache_key)
+    if not os.path.exists(metadata_path):
+        return None, None
+
+    try:
+        with open(metadata_path, "r") as f:
+            dict_metadata = json.load(f)
+
+        if dict_metadata.get("format") == "pickle":
+            df = pd.read_pickle(pickle_path)
+        else:
+            df = pd.read_parquet(parquet_path, memory_map=memory_map)
+    except Exception as e:
+        print_logger(
+            f"Failed to read cache entry {cache_key}, treating as a miss, error: {e}",
+            level="warning",
+        )
+        return None, None
+
+    return df, dict_metadata
+
+
+def write_df_cache(cache_dir, cache_key, df, dict_metadata=None):
+    """
+    Writes a DataFrame and its metadata to the cache. Parquet is used when the
+    frame can be converted to arrow, otherwise it falls back to pickle.
+    The metadata file is written last so readers never see a partial entry.
+
+    Args:
+        cache_dir (str): The directory the cache lives in.
+        cache_key (str): The key of the cached item.
+        df (pd.DataFrame): The DataFrame to cache.
+        dict_metadata (dict, optional): Extra metadata to store with the item.
+
+    Returns:
+        dict: The metadata that was written.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    parquet_path, pickle_path, metadata_path = get_cache_paths(cache_dir, cache_key)
+
+    dict_metadata = dict(dict_metadata or {})
+    dict_metadata["cache_key"] = cache_key
+    dict_metadata["created_at"] = time.time()
+    dict_metadata["num_rows"] = len(df)
+
+    try:
+        df.to_parquet(parquet_path + ".tmp")
+        os.replace(parquet_path + ".tmp", parquet_path)
+        dict_metadata["format"] = "parquet"
+    except Exception as e:
+        print_logger(
+            f"Could not write cache entry {cache_key} as parquet, using pickle, error: {e}",
+            level="debug",
+        )
+        if os.path.exists(parquet_path + ".tmp"):
+            os.remove(parquet_path + ".tmp")
+        df.to_pickle(pickle_path + ".tmp")
+        os.replace(pickle_path + ".tmp", pickle_path)
+        dict_metadata["format"] = "pickle"
+
+    with open(metadata_path + ".tmp", "w") as f:
+        json.dump(dict_metadata, f, default=str)
+    os.replace(metadata_path + ".tmp", metadata_path)
+
+    return dict_metadata
+
+
+def clear_df_cache(cache_dir, dict_match_metadata=None):
+    """
+    Deletes cached items, optionally only those whose metadata matches.
+
+    Args:
+        cache_dir (str): The directory the cache lives in.
+        dict_match_metadata (dict, optional): Only delete items whose metadata
+            has all of these key value pairs. Deletes everything when None.
+
+    Returns:
+        int: The number of cached items deleted.
+    """
+    if not os.path.exists(cache_dir):
+        return 0
+
+    num_deleted = 0
+    for file_name in os.listdir(cache_dir):
+        if not file_name.endswith(".json"):
+            continue
+        cache_key = file_name[: -len(".json")]
+        parquet_path, pickle_path, metadata_path = get_cache_paths(cache_dir, cache_key)
+
+        if dict_match_metadata:
+            try:
+                with open(metadata_path, "r") as f:
+                    dict_metadata = json.load(f)
+            except Exception:
+                continue
+            if any(
+                dict_metadata.get(key) != value
+                for key, value in dict_match_metadata.items()
+            ):
+                continue
+
+        for path in [metadata_path, parquet_path, pickle_path]:
+            if os.path.exists(path):
+                os.remove(path)
+        num_deleted += 1
+
+    print_logger(f"Deleted {num_deleted} cache entries from {cache_dir}")
+    return num_deleted
+
+
+# %%
+# Query Cache #
+
+# False: always run the query, True: reuse a cached result until it is older
+# than the ttl, refresh: always run the query and overwrite the cache
+QUERY_CACHE_OPTIONS = [False, True, "refresh"]
+QUERY_CACHE_DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+
+def normalize_sql(query):
+    """
+    Normalizes a query for use in a cache key. Only leading and trailing
+    whitespace and a trailing semicolon are removed, the rest of the text is
+    kept as it is since comments and whitespace can't be told apart from
+    string literals without a full SQL tokenizer for every dialect.
+
+    Args:
+        query (str): The SQL query.
+
+    Returns:
+        str: The normalized query.
+    """
+    return query.strip().rstrip(";").strip()
+
+
+def get_query_cache_key(source, connection_identity, query, params=None):
+    """
+    Builds the cache key of a query result.
+
+    Args:
+        source (str): The database the query runs on, like "snowflake".
+        connection_identity (list): What the result depends on besides the
+            query, like the account, role and warehouse.
+        query (str): The SQL query.
+        params (optional): The query parameters.
+
+    Returns:
+        str: The cache key.
+    """
+    return get_cache_key(source, connection_identity, normalize_sql(query), params)
+
+
+def read_through_query_cache(
+    source,
+    connection_identity,
+    query,
+    fetch_df,
+    params=None,
+    cache=False,
+    cache_ttl_seconds=QUERY_CACHE_DEFAULT_TTL_SECONDS,
+):
+    """
+    Returns a query result from the local cache when there is a fresh one,
+    otherwise runs the query with fetch_df and caches the result. Hits are
+    read from a memory mapped Parquet file.
+
+    Args:
+        source (str): The database the query runs on, like "snowflake".
+        connection_identity (list): What the result depends on besides the
+            query, like the account, role and warehouse.
+        query (str): The SQL query, part of the cache key.
+        fetch_df (callable): Runs the query when the cache can't be used.
+        params (optional): The query parameters, part of the cache key.
+        cache (bool or str): One of QUERY_CACHE_OPTIONS (default is False).
+        cache_ttl_seconds (int): Max age of a cache entry.
+
+    Returns:
+        pd.DataFrame: The query result.
+    """
+    if cache not in QUERY_CACHE_OPTIONS:
+        raise ValueError(f"cache must be one of {QUERY_CACHE_OPTIONS}, got {cache}")
+    if cache is False:
+        return fetch_df()
+
+    cache_key = get_query_cache_key(source, connection_identity, query, params)
+
+    if cache is True:
+        df, dict_metadata = read_df_cache(query_cache_dir, cache_key)
+        if df is not None and not is_cache_expired(dict_metadata, cache_ttl_seconds):
+            print_logger(f"Using cached {source} result {cache_key}", level="info")
+            return df
+
+    df = fetch_df()
+    write_df_cache(
+        query_cache_dir,
+        cache_key,
+        df,
+        {"source": source, "query": normalize_sql(query)[:1000]},
+    )
+    return df
+
+
+def clear_query_cache(source=None):
+    """
+    Deletes cached query results.
+
+    Args:
+        source (str, optional): Only delete results from this database, like
+            "postgres", deletes every cached result when None.
+
+    Returns:
+        int: The number of cached results deleted.
+    """
+    if source is None:
+        return clear_df_cache(query_cache_dir)
+    return clear_df_cache(query_cache_dir, {"source": source})
+
+
+# %%
@@ -19,6 +19,11 @@ src_utils_dir = os.path.join(src_dir, "utils")
 drive_download_cache_dir = os.path.join(data_dir, "drive_download_cache")
 s3_download_cache = os.path.join(data_dir, "s3_download_cache")
 temp_upload_dir = os.path.join(data_dir, "temp_upload")
+sheet_cache_dir = os.path.join(data_dir, "sheet_cache")
+sheet_write_progress_dir = os.path.join(data_dir, "sheet_write_progress")
+query_cache_dir = os.path.join(data_dir, "query_cache")
+discovery_cache_dir = os.path.join(data_dir, "discovery_cache")
+query_dir = os.path.join(grandparent_dir, "queries")
 
 directories = [
     data_dir,
@@ -29,6 +34,11 @@ directories = [
     drive_download_cache_dir,
     s3_download_cache,
     temp_upload_dir,
+    sheet_cache_dir,
+    sheet_write_progress_dir,
+    query_cache_dir,
+    discovery_cache_dir,
+    query_dir,
 ]
 for directory in directories:
     if not os.path.exists(directory):
@@ -8,7 +8,12 @@ import mimetypes
 import os
 import os.path
 import re
+import sqlite3
 import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import closing
 from email import encoders
 from email.mime.base import MIMEBase
 from email.mime.multipart import MIMEMultipart
@@ -20,14 +25,15 @@ from dateutil.parser import parse
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 
 # append grandparent
 if __name__ == "__main__":
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.config_utils import file_dir, grandparent_dir
+from utils.config_utils import data_dir, file_dir, grandparent_dir
 from utils.display_tools import print_logger
+from utils.google_auth_tools import build_google_service
 
 # %%
 # Variables #
@@ -35,6 +41,43 @@ from utils.display_tools import print_logger
 # If modifying these scopes, delete the file token.json.
 SCOPES = ["https://www.googleapis.com/auth/gmail.modify"]
 
+# local store of synced message metadata and the last historyId per search
+gmail_sync_db_path = os.path.join(data_dir, "gmail_sync.sqlite")
+
+# headers kept in the local store, fetched with format="metadata"
+GMAIL_METADATA_HEADERS = ["From", "To", "Subject", "Date"]
+
+# ids of messages whose attachments were downloaded, before the sync store
+legacy_done_message_ids_path = os.path.join(file_dir, "done_message_ids.txt")
+
+# compiled once, matched against every decoded text part
+EMAIL_ADDRESS_PATTERN = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+
+# below this many text parts extraction runs inline, a process pool costs more
+EMAIL_EXTRACT_PROCESS_MIN_PARTS = 2000
+
+# margin around the dates of changed messages when a sync re-checks the search
+GMAIL_SYNC_DATE_MARGIN_SECONDS = 24 * 60 * 60
+
+# searches using these operators gain and lose matches as time passes without
+# any history event, so every sync checks them against a fresh list
+GMAIL_TIME_RELATIVE_SEARCH_PATTERN = re.compile(
+    r"(?<![\w-])(?:newer_than|older_than|before|older):", re.IGNORECASE
+)
+
+# gmail rate limits batches above 50 calls per user
+GMAIL_BATCH_MAX_REQUESTS = 50
+
+# attachments are decoded and written in pieces, must be a multiple of 4
+GMAIL_ATTACHMENT_DECODE_CHUNK_CHARS = 4 * 1024 * 1024
+
+# credentials per account_type, shared by every thread
+dict_gmail_credentials = {}
+gmail_credentials_lock = threading.Lock()
+
+# built services hold an httplib2 connection, which is not thread safe
+thread_local_gmail_services = threading.local()
+
 
 # %%
 # Authentication #
@@ -57,7 +100,32 @@ def deploy_auth_files_from_env(account_type):
             f.write(os.environ[f"GMAIL_TOKEN_{account_type.upper()}"])
 
 
-def get_gmail_service(account_type="default"):
+def save_gmail_token(creds, token_path):
+    """
+    Writes the user's access and refresh tokens through a temp file, so a
+    crash mid write never leaves a corrupt token file behind.
+
+    Args:
+        creds (google.oauth2.credentials.Credentials): The credentials to save.
+        token_path (str): The path of the token file.
+    """
+    with open(token_path + ".tmp", "w") as token:
+        token.write(creds.to_json())
+    os.replace(token_path + ".tmp", token_path)
+
+
+def load_gmail_credentials(account_type="default"):
+    """
+    Loads the credentials of an account from its token file, deploying the
+    auth files from the environment if needed. Runs the login flow when there
+    is no usable token.
+
+    Args:
+        account_type (str): The account to authenticate as.
+
+    Returns:
+        google.oauth2.credentials.Credentials: The credentials.
+    """
     oauth_path = os.path.join(grandparent_dir, f"gmail_oauth_{account_type}.json")
     token_path = os.path.join(grandparent_dir, f"gmail_token_{account_type}.json")
 
@@ -95,16 +163,62 @@ def get_gmail_service(account_type="default"):
             )
             creds = flow.run_local_server(port=0)
 
-            # Save the credentials for the next run
-            with open(
-                token_path,
-                "w",
-            ) as token:
-                token.write(creds.to_json())
+        # Save the credentials for the next run
+        save_gmail_token(creds, token_path)
+
+    return creds
 
-    service = build("gmail", "v1", credentials=creds)
 
-    return service
+def get_gmail_credentials(account_type="default"):
+    """
+    Returns the credentials of an account shared by every thread, loading
+    them on first use. Tokens are refreshed in memory shortly before they
+    expire and the refreshed token is saved for the next process.
+
+    Args:
+        account_type (str): The account to authenticate as.
+
+    Returns:
+        google.oauth2.credentials.Credentials: The credentials.
+    """
+    with gmail_credentials_lock:
+        creds = dict_gmail_credentials.get(account_type)
+        if creds is None:
+            creds = load_gmail_credentials(account_type)
+            dict_gmail_credentials[account_type] = creds
+        elif not creds.valid and creds.refresh_token:
+            print_logger(f"Refreshing gmail token for {account_type}")
+            creds.refresh(Request())
+            save_gmail_token(
+                creds,
+                os.path.join(grandparent_dir, f"gmail_token_{account_type}.json"),
+            )
+    return creds
+
+
+def get_gmail_service(account_type="default"):
+    """
+    Returns a gmail service for the current thread, building it on first use.
+    Every thread shares the credentials of the account, only the http client
+    is per thread because httplib2 is not thread safe.
+
+    Args:
+        account_type (str): The account to authenticate as.
+
+    Returns:
+        googleapiclient.discovery.Resource: The gmail service.
+    """
+    creds = get_gmail_credentials(account_type)
+
+    if getattr(thread_local_gmail_services, "dict_services", None) is None:
+        thread_local_gmail_services.dict_services = {}
+
+    dict_services = thread_local_gmail_services.dict_services
+    if account_type not in dict_services:
+        dict_services[account_type] = build_google_service(
+            "gmail", "v1", credentials=creds
+        )
+    return dict_services[account_type]
 
 
 # %%
@@ -225,225 +339,1055 @@ def send_email(
 
 
 # %%
-# Funtions #
+# Batch Requests #
+
+
+def is_retryable_gmail_error(error):
+    """Checks if a failed request is worth retrying, rate limits and server errors."""
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status in [429, 500, 502, 503, 504]:
+        return True
+    return error.resp.status == 403 and (
+        b"rateLimitExceeded" in error.content
+        or b"userRateLimitExceeded" in error.content
+    )
+
+
+def is_missing_gmail_error(error):
+    """Checks if a request failed because gmail no longer has the item, like a deleted message."""
+    return isinstance(error, HttpError) and error.resp.status == 404
+
+
+def execute_gmail_batch(service, ls_keys, build_request, max_retries=5):
+    """
+    Sends one Gmail call per key through batch HTTP requests of up to
+    GMAIL_BATCH_MAX_REQUESTS calls each. Only the calls that failed with a
+    rate limit or server error are sent again, with exponential backoff.
+
+    Args:
+        service (googleapiclient.discovery.Resource): The gmail service.
+        ls_keys (list): The unique keys to make a call for, like message ids.
+        build_request (callable): Builds the API request of a key, called as
+            build_request(service, key).
+        max_retries (int, optional): The max number of times a call is retried.
+
+    Returns:
+        dict: Each key mapped to {"result": response or None, "error": exception or None}.
+    """
+    dict_results = {}
+    ls_pending_keys = list(dict.fromkeys(ls_keys))
+
+    for attempt in range(max_retries + 1):
+        ls_retry_keys = []
+
+        def callback(request_id, response, exception):
+            key = ls_pending_keys[int(request_id)]
+            if exception is not None and is_retryable_gmail_error(exception):
+                ls_retry_keys.append(key)
+            dict_results[key] = {"result": response, "error": exception}
 
+        for i in range(0, len(ls_pending_keys), GMAIL_BATCH_MAX_REQUESTS):
+            ls_batch_keys = ls_pending_keys[i : i + GMAIL_BATCH_MAX_REQUESTS]
+            batch = service.new_batch_http_request(callback=callback)
+            for request_id, key in enumerate(ls_batch_keys, start=i):
+                batch.add(build_request(service, key), request_id=str(request_id))
+            batch.execute()
 
-def get_attachment_from_search_string(  # noqa: C901
+        if not ls_retry_keys or attempt == max_retries:
+            break
+
+        delay = 2**attempt
+        print_logger(
+            f"{len(ls_retry_keys)} batched Gmail calls were rate limited or failed, "
+            f"retrying them in {delay} seconds..."
+        )
+        time.sleep(delay)
+        ls_pending_keys = ls_retry_keys
+
+    return dict_results
+
+
+def get_messages_and_errors(
+    service, ls_message_ids, format="full", metadata_headers=None
+):
+    """
+    Fetches many messages with batched messages.get calls, keeping every
+    message that was fetched when others fail.
+
+    Args:
+        service (googleapiclient.discovery.Resource): The gmail service.
+        ls_message_ids (list): The message ids to fetch.
+        format (str): The messages.get format, "metadata" skips the bodies.
+        metadata_headers (list, optional): The headers to return with "metadata".
+
+    Returns:
+        tuple: (dict of message ids to the fetched message resources,
+            dict of message ids to the errors of the ones that failed)
+    """
+    dict_kwargs = {"format": format}
+    if metadata_headers is not None:
+        dict_kwargs["metadataHeaders"] = metadata_headers
+
+    dict_results = execute_gmail_batch(
+        service,
+        ls_message_ids,
+        lambda service, message_id: service.users()
+        .messages()
+        .get(userId="me", id=message_id, **dict_kwargs),
+    )
+
+    dict_messages = {}
+    dict_errors = {}
+    for message_id, dict_result in dict_results.items():
+        if dict_result["error"] is None:
+            dict_messages[message_id] = dict_result["result"]
+        else:
+            dict_errors[message_id] = dict_result["error"]
+    return dict_messages, dict_errors
+
+
+def get_messages(service, ls_message_ids, format="full", metadata_headers=None):
+    """
+    Fetches many messages with batched messages.get calls. Messages gmail no
+    longer has, like ones deleted after they were listed, are logged and left
+    out of the result.
+
+    Args:
+        service (googleapiclient.discovery.Resource): The gmail service.
+        ls_message_ids (list): The message ids to fetch.
+        format (str): The messages.get format, "metadata" skips the bodies.
+        metadata_headers (list, optional): The headers to return with "metadata".
+
+    Returns:
+        dict: Each fetched message id mapped to its message resource.
+
+    Raises:
+        HttpError: The first error other than a missing message, after retries.
+    """
+    dict_messages, dict_errors = get_messages_and_errors(
+        service, ls_message_ids, format=format, metadata_headers=metadata_headers
+    )
+    check_message_errors(dict_errors, len(ls_message_ids))
+    return dict_messages
+
+
+def check_message_errors(dict_errors, num_messages):
+    """
+    Logs the messages that could not be fetched and raises the first error
+    other than a missing message.
+
+    Args:
+        dict_errors (dict): Message ids mapped to the errors of their fetch.
+        num_messages (int): The number of messages that were fetched.
+
+    Returns:
+        list: The ids of the messages gmail no longer has.
+
+    Raises:
+        HttpError: The first error other than a missing message.
+    """
+    ls_missing_ids = [
+        message_id
+        for message_id, error in dict_errors.items()
+        if is_missing_gmail_error(error)
+    ]
+    if ls_missing_ids:
+        print_logger(
+            f"{len(ls_missing_ids)} messages no longer exist, skipping them: {ls_missing_ids}",
+            level="warning",
+        )
+
+    ls_errors = [
+        (message_id, error)
+        for message_id, error in dict_errors.items()
+        if not is_missing_gmail_error(error)
+    ]
+    if ls_errors:
+        message_id, error = ls_errors[0]
+        print_logger(
+            f"{len(ls_errors)} of {num_messages} messages could not be fetched, "
+            f"first failure {message_id}: {error}",
+            level="error",
+        )
+        raise error
+
+    return ls_missing_ids
+
+
+# %%
+# Sync #
+
+
+def get_gmail_sync_connection():
+    """
+    Opens the local sync store, creating its tables on first use.
+
+    Returns:
+        sqlite3.Connection: A connection to the sync store.
+    """
+    conn = sqlite3.connect(gmail_sync_db_path, timeout=30)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sync_state (
+            account_type TEXT NOT NULL,
+            search_string TEXT NOT NULL,
+            history_id INTEGER NOT NULL,
+            synced_at REAL NOT NULL,
+            PRIMARY KEY (account_type, search_string)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS messages (
+            account_type TEXT NOT NULL,
+            search_string TEXT NOT NULL,
+            message_id TEXT NOT NULL,
+            thread_id TEXT,
+            history_id INTEGER,
+            internal_date INTEGER,
+            sender TEXT,
+            recipient TEXT,
+            subject TEXT,
+            date_header TEXT,
+            label_ids TEXT,
+            size_estimate INTEGER,
+            PRIMARY KEY (account_type, search_string, message_id)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS done_messages (
+            account_type TEXT NOT NULL,
+            search_string TEXT NOT NULL,
+            message_id TEXT NOT NULL,
+            done_at REAL NOT NULL,
+            PRIMARY KEY (account_type, search_string, message_id)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ledger_imports (
+            path TEXT PRIMARY KEY,
+            byte_offset INTEGER NOT NULL
+        )
+        """
+    )
+    return conn
+
+
+def get_gmail_sync_state(search_string, account_type="default"):
+    """
+    Returns the stored sync state of a search.
+
+    Args:
+        search_string (str): The gmail search string.
+        account_type (str): The account the search runs against.
+
+    Returns:
+        dict or None: The history_id and synced_at, None if never synced.
+    """
+    with closing(get_gmail_sync_connection()) as conn:
+        row = conn.execute(
+            "SELECT history_id, synced_at FROM sync_state "
+            "WHERE account_type = ? AND search_string = ?",
+            (account_type, search_string),
+        ).fetchone()
+    if row is None:
+        return None
+    return {"history_id": row[0], "synced_at": row[1]}
+
+
+def save_gmail_sync(
+    search_string,
+    account_type,
+    history_id,
+    ls_rows,
+    replace=False,
+    ls_removed_message_ids=None,
+):
+    """
+    Stores message metadata and the new historyId of a search in one
+    transaction, so a failed run never advances the historyId past messages
+    that were not stored or removed.
+
+    Args:
+        search_string (str): The gmail search string.
+        account_type (str): The account the search runs against.
+        history_id (int): The mailbox historyId the search is synced up to.
+        ls_rows (list): Dicts from get_message_metadata_row.
+        replace (bool): Whether to drop the messages stored for the search first.
+        ls_removed_message_ids (list, optional): Messages to drop from the
+            search, deleted or no longer matching it.
+    """
+    with closing(get_gmail_sync_connection()) as conn:
+        with conn:
+            if replace:
+                conn.execute(
+                    "DELETE FROM messages WHERE account_type = ? AND search_string = ?",
+                    (account_type, search_string),
+                )
+            remove_synced_messages(
+                conn, search_string, account_type, ls_removed_message_ids or []
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO messages VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        account_type,
+                        search_string,
+                        row["message_id"],
+                        row["thread_id"],
+                        row["history_id"],
+                        row["internal_date"],
+                        row["sender"],
+                        row["recipient"],
+                        row["subject"],
+                        row["date_header"],
+                        row["label_ids"],
+                        row["size_estimate"],
+                    )
+                    for row in ls_rows
+                ],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                (account_type, search_string, int(history_id), time.time()),
+            )
+
+
+def remove_synced_messages(conn, search_string, account_type, ls_message_ids):
+    """
+    Drops messages from the stored messages of a search.
+
+    Args:
+        conn (sqlite3.Connection): A connection to the sync store.
+        search_string (str): The gmail search string.
+        account_type (str): The account the search runs against.
+        ls_message_ids (list): The message ids to drop.
+    """
+    conn.executemany(
+        "DELETE FROM messages "
+        "WHERE account_type = ? AND search_string = ? AND message_id = ?",
+        [(account_type, search_string, message_id) for message_id in ls_message_ids],
+    )
+
+
+def get_synced_messages_df(search_string, account_type="default", sync=True):
+    """
+    Returns the stored metadata of every message matching a search, newest
+    first like messages.list.
+
+    Args:
+        search_string (str): The gmail search string.
+        account_type (str): The account the search runs against.
+        sync (bool): Whether to sync the search before reading the store.
+
+    Returns:
+        pd.DataFrame: One row per message.
+    """
+    if sync:
+        sync_messages_from_search_string(search_string, account_type=account_type)
+
+    with closing(get_gmail_sync_connection()) as conn:
+        df = pd.read_sql_query(
+            "SELECT * FROM messages WHERE account_type = ? AND search_string = ? "
+            "ORDER BY internal_date DESC",
+            conn,
+            params=(account_type, search_string),
+        )
+    return df.drop(columns=["account_type", "search_string"])
+
+
+def get_synced_messages(service, search_string, account_type, ls_message_ids):
+    """
+    Fetches the full messages of a synced search. Messages gmail no longer has
+    are dropped from the sync store, so later runs don't ask for them again.
+
+    Args:
+        service (googleapiclient.discovery.Resource): The gmail service.
+        search_string (str): The gmail search string.
+        account_type (str): The account the search runs against.
+        ls_message_ids (list): The message ids to fetch.
+
+    Returns:
+        dict: Each fetched message id mapped to its message resource.
+    """
+    dict_messages, dict_errors = get_messages_and_errors(service, ls_message_ids)
+    ls_missing_ids = check_message_errors(dict_errors, len(ls_message_ids))
+    if ls_missing_ids:
+        with closing(get_gmail_sync_connection()) as conn:
+            with conn:
+                remove_synced_messages(
+                    conn, search_string, account_type, ls_missing_ids
+                )
+    return dict_messages
+
+
+def get_message_metadata_row(message):
+    """
+    Flattens a message fetched with format="metadata" into a store row.
+
+    Args:
+        message (dict): The message resource.
+
+    Returns:
+        dict: The row for the messages table.
+    """
+    dict_headers = {
+        header["name"].lower(): header["value"]
+        for header in message.get("payload", {}).get("headers", [])
+    }
+    return {
+        "message_id": message["id"],
+        "thread_id": message.get("threadId"),
+        "history_id": int(message.get("historyId", 0)),
+        "internal_date": int(message.get("internalDate", 0)),
+        "sender": dict_headers.get("from", ""),
+        "recipient": dict_headers.get("to", ""),
+        "subject": dict_headers.get("subject", ""),
+        "date_header": dict_headers.get("date", ""),
+        "label_ids": ",".join(message.get("labelIds", [])),
+        "size_estimate": message.get("sizeEstimate"),
+    }
+
+
+def list_message_ids(service, search_string):
+    """
+    Lists the ids of every message matching a search, following pagination.
+
+    Args:
+        service (googleapiclient.discovery.Resource): The gmail service.
+        search_string (str): The gmail search string.
+
+    Returns:
+        list: The message ids, newest first.
+    """
+    ls_message_ids = []
+    request = (
+        service.users().messages().list(userId="me", q=search_string, maxResults=500)
+    )
+    while request is not None:
+        response = request.execute()
+        ls_message_ids.extend(message["id"] for message in response.get("messages", []))
+        request = (
+            service.users()
+            .messages()
+            .list_next(previous_request=request, previous_response=response)
+        )
+    return ls_message_ids
+
+
+def list_changed_message_ids(service, start_history_id):
+    """
+    Lists the ids of messages added, relabelled or deleted in the mailbox since
+    a historyId. Relabelled messages can start or stop matching a search, like
+    a message moved to the trash.
+
+    Args:
+        service (googleapiclient.discovery.Resource): The gmail service.
+        start_history_id (int): The historyId of the last sync.
+
+    Returns:
+        tuple: (set of added or relabelled message ids, set of deleted
+            message ids, latest mailbox historyId)
+    """
+    set_changed_ids = set()
+    set_deleted_ids = set()
+    history_id = start_history_id
+    request = (
+        service.users()
+        .history()
+        .list(
+            userId="me",
+            startHistoryId=str(start_history_id),
+            historyTypes=[
+                "messageAdded",
+                "messageDeleted",
+                "labelAdded",
+                "labelRemoved",
+            ],
+            maxResults=500,
+        )
+    )
+    while request is not None:
+        response = request.execute()
+        history_id = int(response.get("historyId", history_id))
+        for history in response.get("history", []):
+            for history_type in ["messagesAdded", "labelsAdded", "labelsRemoved"]:
+                for changed in history.get(history_type, []):
+                    set_changed_ids.add(changed["message"]["id"])
+            for deleted in history.get("messagesDeleted", []):
+                set_deleted_ids.add(deleted["message"]["id"])
+        request = (
+            service.users()
+            .history()
+            .list_next(previous_request=request, previous_response=response)
+        )
+    return set_changed_ids - set_deleted_ids, set_deleted_ids, history_id
+
+
+def get_messages_metadata(service, ls_message_ids):
+    """
+    Fetches the metadata headers of messages without their bodies, batched.
+
+    Args:
+        service (googleapiclient.discovery.Resource): The gmail service.
+        ls_message_ids (list): The message ids to fetch.
+
+    Returns:
+        list: Store rows from get_message_metadata_row.
+    """
+    dict_messages = get_messages(
+        service,
+        ls_message_ids,
+        format="metadata",
+        metadata_headers=GMAIL_METADATA_HEADERS,
+    )
+    return [
+        get_message_metadata_row(dict_messages[message_id])
+        for message_id in ls_message_ids
+        if message_id in dict_messages
+    ]
+
+
+def get_changed_messages_matching_search(service, search_string, set_changed_ids):
+    """
+    Splits messages that were added or relabelled into the ones that match a
+    search and the ones that don't. History is not filtered by the search, so
+    the search is listed again, only over the dates of the changed messages.
+
+    Args:
+        service (googleapiclient.discovery.Resource): The gmail service.
+        search_string (str): The gmail search string.
+        set_changed_ids (set): The ids of the added or relabelled messages.
+
+    Returns:
+        tuple: (list of store rows of the matching messages, set of ids of
+            the messages that don't match or no longer exist)
+    """
+    if not set_changed_ids:
+        return [], set()
+
+    dict_messages, dict_errors = get_messages_and_errors(
+        service,
+        sorted(set_changed_ids),
+        format="metadata",
+        metadata_headers=GMAIL_METADATA_HEADERS,
+    )
+    set_removed_ids = set(check_message_errors(dict_errors, len(set_changed_ids)))
+    if not dict_messages:
+        return [], set_removed_ids
+
+    ls_rows = [get_message_metadata_row(message) for message in dict_messages.values()]
+    ls_internal_seconds = [row["internal_date"] // 1000 for row in ls_rows]
+    after_epoch = min(ls_internal_seconds) - GMAIL_SYNC_DATE_MARGIN_SECONDS
+    before_epoch = max(ls_internal_seconds) + GMAIL_SYNC_DATE_MARGIN_SECONDS
+    set_matching_ids = set(
+        list_message_ids(
+            service, f"({search_string}) after:{after_epoch} before:{before_epoch}"
+        )
+    )
+
+    ls_matching_rows = [row for row in ls_rows if row["message_id"] in set_matching_ids]
+    set_removed_ids |= {
+        row["message_id"]
+        for row in ls_rows
+        if row["message_id"] not in set_matching_ids
+    }
+    return ls_matching_rows, set_removed_ids
+
+
+def is_time_relative_search(search_string):
+    """
+    Checks if a search can change its matches as time passes, like
+    newer_than:7d, which the mailbox history does not record.
+
+    Args:
+        search_string (str): The gmail search string.
+
+    Returns:
+        bool: True if the search uses a time relative operator.
+    """
+    return GMAIL_TIME_RELATIVE_SEARCH_PATTERN.search(search_string) is not None
+
+
+def reconcile_messages_with_search(
+    service, search_string, set_known_ids, ls_matching_rows, set_removed_ids
+):
+    """
+    Checks the stored messages of a search against a fresh list of it. Stored
+    messages that are no longer listed are removed, listed messages that are
+    not stored are fetched and added.
+
+    Args:
+        service (googleapiclient.discovery.Resource): The gmail service.
+        search_string (str): The gmail search string.
+        set_known_ids (set): The ids of the messages stored for the search.
+        ls_matching_rows (list): Store rows of changed messages matching it.
+        set_removed_ids (set): The ids of changed messages that don't match it.
+
+    Returns:
+        tuple: (list of store rows to save, set of message ids to remove)
+    """
+    set_listed_ids = set(list_message_ids(service, search_string))
+    ls_matching_rows = [
+        row for row in ls_matching_rows if row["message_id"] in set_listed_ids
+    ]
+    set_fetched_ids = {row["message_id"] for row in ls_matching_rows}
+    ls_rows = ls_matching_rows + get_messages_metadata(
+        service, sorted(set_listed_ids - set_known_ids - set_fetched_ids)
+    )
+    return ls_rows, set_removed_ids | (set_known_ids - set_listed_ids)
+
+
+def sync_messages_from_search_string(
     search_string,
-    output_path,
-    output_file_name=None,
-    force_download=False,
     account_type="default",
+    full_sync=False,
 ):
-    # search gmail for message
+    """
+    Brings the local store of a search up to date. The first run lists the
+    whole search, later runs read the mailbox history since the stored
+    historyId, so a run with no changes is a single history.list call.
+    Deleted messages are dropped, and the search is only re-checked around the
+    dates of added or relabelled messages to add the ones that match it and
+    drop the ones that no longer do. Searches with time relative operators,
+    like newer_than:, are also checked against a fresh list of their ids.
+    Falls back to a full sync when gmail no longer has the stored historyId.
+
+    Args:
+        search_string (str): The gmail search string.
+        account_type (str): The account the search runs against.
+        full_sync (bool): Whether to ignore the stored state and list everything.
+
+    Returns:
+        pd.DataFrame: The metadata of messages new since the last sync.
+    """
     service = get_gmail_service(account_type=account_type)
-    results = service.users().messages().list(userId="me", q=search_string).execute()
-    all_messages_from_search = results.get("messages", [])
-    ls_paths_with_file_names = []
-    if not all_messages_from_search:
-        print("No messages found.")
+    dict_state = (
+        None if full_sync else get_gmail_sync_state(search_string, account_type)
+    )
+
+    ls_rows = None
+    if dict_state is not None:
+        try:
+            set_changed_ids, set_deleted_ids, history_id = list_changed_message_ids(
+                service, dict_state["history_id"]
+            )
+        except HttpError as e:
+            if e.resp.status != 404:
+                raise
+            print_logger(
+                f"historyId {dict_state['history_id']} expired for {search_string}, running a full sync",
+                level="warning",
+            )
+        else:
+            ls_matching_rows, set_removed_ids = get_changed_messages_matching_search(
+                service, search_string, set_changed_ids
+            )
+            with closing(get_gmail_sync_connection()) as conn:
+                set_known_ids = {
+                    row[0]
+                    for row in conn.execute(
+                        "SELECT message_id FROM messages "
+                        "WHERE account_type = ? AND search_string = ?",
+                        (account_type, search_string),
+                    )
+                }
+            if is_time_relative_search(search_string):
+                ls_matching_rows, set_removed_ids = reconcile_messages_with_search(
+                    service,
+                    search_string,
+                    set_known_ids,
+                    ls_matching_rows,
+                    set_removed_ids,
+                )
+            ls_removed_ids = sorted((set_removed_ids | set_deleted_ids) & set_known_ids)
+            # matching rows are all stored again, which refreshes their labels
+            save_gmail_sync(
+                search_string,
+                account_type,
+                history_id,
+                ls_matching_rows,
+                ls_removed_message_ids=ls_removed_ids,
+            )
+            ls_rows = [
+                row
+                for row in ls_matching_rows
+                if row["message_id"] not in set_known_ids
+            ]
+            if ls_removed_ids:
+                print_logger(
+                    f"Removed {len(ls_removed_ids)} messages that were deleted or "
+                    f"no longer match {search_string}"
+                )
+
+    if ls_rows is None:
+        # take the historyId before listing so nothing added during the list is missed
+        history_id = int(service.users().getProfile(userId="me").execute()["historyId"])
+        ls_message_ids = list_message_ids(service, search_string)
+        ls_rows = get_messages_metadata(service, ls_message_ids)
+        save_gmail_sync(search_string, account_type, history_id, ls_rows, replace=True)
+
+    print_logger(f"Synced {len(ls_rows)} new messages for {search_string}")
+    return pd.DataFrame(
+        ls_rows, columns=list(get_message_metadata_row({"id": ""}).keys())
+    )
+
+
+# %%
+# Processed Message Ledger #
+
+
+def import_legacy_done_message_ids(conn):
+    """
+    Copies ids appended to done_message_ids.txt since the last import into
+    the ledger, under the empty namespace that every search checks. Only the
+    new tail of the file is read, from the byte offset stored last time.
+
+    Args:
+        conn (sqlite3.Connection): A connection to the sync store.
+    """
+    if not os.path.exists(legacy_done_message_ids_path):
         return
-    for this_message_from_reults in all_messages_from_search:
-        message_id = this_message_from_reults["id"]
-        print("message_id: " + str(message_id))
 
-        message_was_already_done = False
+    row = conn.execute(
+        "SELECT byte_offset FROM ledger_imports WHERE path = ?",
+        (legacy_done_message_ids_path,),
+    ).fetchone()
+    offset = row[0] if row is not None else 0
+    if os.path.getsize(legacy_done_message_ids_path) <= offset:
+        return
 
-        if not os.path.exists(os.path.join(file_dir, "done_message_ids.txt")):
-            with open(os.path.join(file_dir, "done_message_ids.txt"), "w") as f:
-                f.write("")
+    with open(legacy_done_message_ids_path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    # leave a partly written last line for the next import
+    data = data[: data.rfind(b"\n") + 1]
+    if not data:
+        return
+    ls_message_ids = [line.strip() for line in data.decode().splitlines()]
 
-        else:
-            with open(
-                os.path.join(file_dir, "done_message_ids.txt"), "r+"
-            ) as message_log:
-                for line in message_log:
-                    if line.strip() == str(message_id):
-                        message_was_already_done = True
-                        continue
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO done_messages VALUES ('', '', ?, ?)",
+            [(message_id, time.time()) for message_id in ls_message_ids if message_id],
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO ledger_imports VALUES (?, ?)",
+            (legacy_done_message_ids_path, offset + len(data)),
+        )
+    print_logger(
+        f"Imported {len(ls_message_ids)} ids from {legacy_done_message_ids_path}"
+    )
 
-        if message_was_already_done and not force_download:
-            print("Message already downloaded and force_download is False")
-            continue
-        elif message_was_already_done and force_download:
-            print(
-                (
-                    "Message already downloaded and force_download is True, "
-                    "downloading again"
-                )
+
+def get_done_message_ids(search_string, account_type="default"):
+    """
+    Returns the ids of messages already processed for a search, including
+    the ids from the legacy done_message_ids.txt, as a set for O(1) lookups.
+
+    Args:
+        search_string (str): The gmail search string.
+        account_type (str): The account the search runs against.
+
+    Returns:
+        set: The processed message ids.
+    """
+    with closing(get_gmail_sync_connection()) as conn:
+        import_legacy_done_message_ids(conn)
+        return {
+            row[0]
+            for row in conn.execute(
+                "SELECT message_id FROM done_messages "
+                "WHERE (account_type = ? AND search_string = ?) "
+                "OR (account_type = '' AND search_string = '')",
+                (account_type, search_string),
+            )
+        }
+
+
+def mark_messages_done(search_string, ls_message_ids, account_type="default"):
+    """
+    Records messages as processed for a search in one transaction.
+
+    Args:
+        search_string (str): The gmail search string.
+        ls_message_ids (list): The ids of the processed messages.
+        account_type (str): The account the search runs against.
+    """
+    with closing(get_gmail_sync_connection()) as conn:
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO done_messages VALUES (?, ?, ?, ?)",
+                [
+                    (account_type, search_string, message_id, time.time())
+                    for message_id in ls_message_ids
+                ],
             )
 
-        executed_message = (
-            service.users().messages().get(userId="me", id=message_id).execute()
-        )
 
-        internal_date_received = executed_message["internalDate"]
-
-        internal_dt_received = pd.to_datetime(
-            int(float(internal_date_received) / 1000), unit="s", origin="unix"
-        ).strftime(format="%Y-%m-%d")
-        str_internal_dt_received = str(internal_dt_received)
-
-        internal_dt_received_with_seconds = pd.to_datetime(
-            int(float(internal_date_received) / 1000), unit="s", origin="unix"
-        ).strftime(format="%Y.%m.%d %H.%M.%S")
-        str_internal_dt_received_with_seconds = str(internal_dt_received_with_seconds)
-
-        message_subject = ""
-        for item in executed_message["payload"]["headers"]:
-            if item["name"] == "Subject":
-                message_subject = item["value"]
-                print(f"subject is {message_subject}")
-                break
-        for part in executed_message["payload"]["parts"]:
-            if part["filename"]:
-                print("detected attachment type 1")
-                original_file_extension = part["filename"].split(".")[-1]
-                if output_file_name is None:
-                    print("output_file_name is None, using original file name")
-                    filename = part["filename"]
-                    filename = (
-                        filename.replace("/", " ")
-                        .replace(":", "")
-                        .replace("?", "")
-                        .replace("&", "and")
+# %%
+# Funtions #
+
+
+def clean_attachment_file_name(filename):
+    """Removes characters that are not allowed in file names."""
+    return (
+        filename.replace("/", " ").replace(":", "").replace("?", "").replace("&", "and")
+    )
+
+
+def get_attachment_download(message, output_file_name=None):  # noqa: C901
+    """
+    Finds the attachment of a message and the file name to save it under.
+
+    Args:
+        message (dict): The message resource, fetched with format="full".
+        output_file_name (str, optional): The naming mode or a fixed file name,
+            see get_attachment_from_search_string.
+
+    Returns:
+        tuple or None: (file name, attachment id), None without an attachment.
+    """
+    dt_received = pd.to_datetime(
+        int(float(message["internalDate"]) / 1000), unit="s", origin="unix"
+    )
+    str_internal_dt_received = str(dt_received.strftime(format="%Y-%m-%d"))
+    str_internal_dt_received_with_seconds = str(
+        dt_received.strftime(format="%Y.%m.%d %H.%M.%S")
+    )
+
+    message_subject = ""
+    for item in message["payload"]["headers"]:
+        if item["name"] == "Subject":
+            message_subject = item["value"]
+            print(f"subject is {message_subject}")
+            break
+
+    for part in message["payload"].get("parts", []):
+        if part["filename"]:
+            print("detected attachment type 1")
+            original_file_extension = part["filename"].split(".")[-1]
+            if output_file_name is None:
+                print("output_file_name is None, using original file name")
+                filename = part["filename"]
+            elif output_file_name == "original with date":
+                print(
+                    (
+                        "output_file_name is original with date, "
+                        "using original file name with date"
                     )
-                elif output_file_name == "original with date":
-                    print(
-                        (
-                            "output_file_name is original with date, "
-                            "using original file name with date"
-                        )
+                )
+                filename = (
+                    part["filename"]
+                    + " "
+                    + str_internal_dt_received
+                    + "."
+                    + original_file_extension
+                )
+            elif output_file_name == "original with date and seconds":
+                print(
+                    (
+                        "output_file_name is original with date and seconds, "
+                        "using original file name with date and seconds"
                     )
+                )
+                filename = (
+                    part["filename"]
+                    + " "
+                    + str_internal_dt_received_with_seconds
+                    + "."
+                    + original_file_extension
+                )
+            else:
+                filename = output_file_name
+            filename = clean_attachment_file_name(filename)
+            print(f"filename is {filename}")
+            return filename, part["body"]["attachmentId"]
+
+        try:
+            if part["parts"][0]["filename"]:
+                print("detected attachment type 2")
+                # replace characters for windows
+                original_file_name = (
+                    part["parts"][0]["filename"]
+                    .replace(":", " -")
+                    .replace("/", "-")
+                    .replace("\\", "-")
+                    .replace("&", "-")
+                )
+                original_file_name = clean_attachment_file_name(original_file_name)
+                original_file_extension = original_file_name.split(".")[-1]
+                if output_file_name == "original with subject and datetime":
                     filename = (
-                        part["filename"]
+                        original_file_name
                         + " "
-                        + str_internal_dt_received
+                        + message_subject
+                        + str_internal_dt_received_with_seconds
                         + "."
                         + original_file_extension
                     )
+                elif output_file_name == "domo split":
                     filename = (
-                        filename.replace("/", " ")
-                        .replace(":", "")
-                        .replace("?", "")
-                        .replace("&", "and")
-                    )
-                elif output_file_name == "original with date and seconds":
-                    print(
-                        (
-                            "output_file_name is original with date and seconds, "
-                            "using original file name with date and seconds"
-                        )
+                        original_file_name.split(" - ")[0]
+                        + " - Active Roster - "
+                        + str_internal_dt_received
+                        + " - "
+                        + original_file_name.replace("|||", "$").split("$")[1]
+                        + "."
+                        + original_file_extension
                     )
+                elif output_file_name == "highjump":
                     filename = (
-                        part["filename"]
+                        "highjump file"
                         + " "
                         + str_internal_dt_received_with_seconds
                         + "."
                         + original_file_extension
                     )
-                    filename = (
-                        filename.replace("/", " ")
-                        .replace(":", "")
-                        .replace("?", "")
-                        .replace("&", "and")
-                    )
+                elif output_file_name is None:
+                    filename = original_file_name
                 else:
-                    filename = output_file_name
-                    filename = (
-                        filename.replace("/", " ")
-                        .replace(":", "")
-                        .replace("?", "")
-                        .replace("&", "and")
-                    )
+                    filename = clean_attachment_file_name(output_file_name)
                 print(f"filename is {filename}")
-                attachment = (
-                    service.users()
-                    .messages()
-                    .attachments()
-                    .get(
-                        id=part["body"]["attachmentId"],
-                        userId="me",
-                        messageId=message_id,
-                    )
-                    .execute()
+                return filename, part["parts"][0]["body"]["attachmentId"]
+        except Exception:
+            print("did not detect attachment type 2")
+
+    return None
+
+
+def write_base64_data_to_file(data, path):
+    """
+    Decodes urlsafe base64 data to a file piece by piece, through a .part file
+    so a failed write never leaves a truncated file at path.
+
+    Args:
+        data (str): The urlsafe base64 encoded data.
+        path (str): The path to write the decoded bytes to.
+    """
+    part_path = path + ".part"
+    with open(part_path, "wb") as f:
+        for i in range(0, len(data), GMAIL_ATTACHMENT_DECODE_CHUNK_CHARS):
+            f.write(
+                base64.urlsafe_b64decode(
+                    data[i : i + GMAIL_ATTACHMENT_DECODE_CHUNK_CHARS]
                 )
-                file_data = base64.urlsafe_b64decode(attachment["data"].encode("utf-8"))
-                break
-            else:
-                try:
-                    if part["parts"][0]["filename"]:
-                        print("detected attachment type 2")
-                        original_file_name = part["parts"][0]["filename"]
-                        # replace characters for windows
-                        original_file_name = (
-                            original_file_name.replace(":", " -")
-                            .replace("/", "-")
-                            .replace("\\", "-")
-                            .replace("&", "-")
-                        )
-                        original_file_name = (
-                            original_file_name.replace("/", " ")
-                            .replace(":", "")
-                            .replace("?", "")
-                            .replace("&", "and")
-                        )
-                        original_file_extension = original_file_name.split(".")[-1]
-                        if output_file_name == "original with subject and datetime":
-                            filename = (
-                                original_file_name
-                                + " "
-                                + message_subject
-                                + str_internal_dt_received_with_seconds
-                                + "."
-                                + original_file_extension
-                            )
-                        elif output_file_name == "domo split":
-                            filename = (
-                                original_file_name.split(" - ")[0]
-                                + " - Active Roster - "
-                                + str_internal_dt_received
-                                + " - "
-                                + original_file_name.replace("|||", "$").split("$")[1]
-                                + "."
-                                + original_file_extension
-                            )
-                        elif output_file_name == "highjump":
-                            filename = (
-                                "highjump file"
-                                + " "
-                                + str_internal_dt_received_with_seconds
-                                + "."
-                                + original_file_extension
-                            )
-                        attachment_id = part["parts"][0]["body"]["attachmentId"]
-                        attachment = (
-                            service.users()
-                            .messages()
-                            .attachments()
-                            .get(id=attachment_id, userId="me", messageId=message_id)
-                            .execute()
-                        )
-                        file_data = base64.urlsafe_b64decode(
-                            attachment["data"].encode("utf-8")
-                        )
-                        break
-                except Exception:
-                    print("did not detect attachment type 2")
+            )
+    os.replace(part_path, path)
+
+
+def download_attachments_to_path(account_type, ls_attachments, path):
+    """
+    Downloads attachments to one path in order, so when several messages map
+    to the same file name the last one wins like a serial download.
+
+    Args:
+        account_type (str): The account to download as.
+        ls_attachments (list): (message id, attachment id) tuples.
+        path (str): The path to write the attachments to.
+
+    Returns:
+        list: The message ids that were downloaded.
+    """
+    service = get_gmail_service(account_type=account_type)
+    for message_id, attachment_id in ls_attachments:
+        attachment = (
+            service.users()
+            .messages()
+            .attachments()
+            .get(id=attachment_id, userId="me", messageId=message_id)
+            .execute()
+        )
+        write_base64_data_to_file(attachment["data"], path)
+    return [message_id for message_id, _ in ls_attachments]
+
+
+def get_attachment_from_search_string(
+    search_string,
+    output_path,
+    output_file_name=None,
+    force_download=False,
+    account_type="default",
+    workers=4,
+):
+    # search gmail for message
+    service = get_gmail_service(account_type=account_type)
+    ls_message_ids = get_synced_messages_df(search_string, account_type=account_type)[
+        "message_id"
+    ].tolist()
+    if not ls_message_ids:
+        print("No messages found.")
+        return
 
+    # skip processed messages before fetching anything about them
+    set_done_message_ids = get_done_message_ids(search_string, account_type)
+    ls_pending_message_ids = []
+    for message_id in ls_message_ids:
+        print("message_id: " + str(message_id))
+
+        message_was_already_done = message_id in set_done_message_ids
+
+        if message_was_already_done and not force_download:
+            print("Message already downloaded and force_download is False")
+            continue
+        elif message_was_already_done and force_download:
+            print(
+                (
+                    "Message already downloaded and force_download is True, "
+                    "downloading again"
+                )
+            )
+        ls_pending_message_ids.append(message_id)
+
+    # fetch the pending messages in batches, then their attachments in parallel
+    dict_messages = get_synced_messages(
+        service, search_string, account_type, ls_pending_message_ids
+    )
+    ls_paths_with_file_names = []
+    dict_path_attachments = {}
+    ls_no_attachment_message_ids = []
+    for message_id in ls_pending_message_ids:
+        if message_id not in dict_messages:
+            continue
+        attachment_download = get_attachment_download(
+            dict_messages[message_id], output_file_name
+        )
+        if attachment_download is None:
+            print(f"no attachment found in message {message_id}")
+            ls_no_attachment_message_ids.append(message_id)
+            continue
+        filename, attachment_id = attachment_download
         path_with_file_name = os.path.join(output_path, filename)
         print(f"path_with_file_name is {path_with_file_name}")
-        with open(path_with_file_name, "wb") as f:
-            f.write(file_data)
         ls_paths_with_file_names.append(path_with_file_name)
+        dict_path_attachments.setdefault(path_with_file_name, []).append(
+            (message_id, attachment_id)
+        )
 
-        if not force_download:
-            with open(
-                os.path.join(file_dir, "done_message_ids.txt"), "a+"
-            ) as message_log:
-                message_log.write(str(message_id) + "\n")
-        else:
-            print("force download so not logging message id")
+    # messages without an attachment are processed too, don't fetch them again
+    if ls_no_attachment_message_ids and not force_download:
+        mark_messages_done(search_string, ls_no_attachment_message_ids, account_type)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        ls_futures = [
+            executor.submit(
+                download_attachments_to_path, account_type, ls_attachments, path
+            )
+            for path, ls_attachments in dict_path_attachments.items()
+        ]
+        for future in as_completed(ls_futures):
+            ls_done_message_ids = future.result()
+            if not force_download:
+                mark_messages_done(search_string, ls_done_message_ids, account_type)
+            else:
+                print("force download so not logging message id")
 
     return ls_paths_with_file_names
 
@@ -452,77 +1396,204 @@ def get_attachment_from_search_string(  # noqa: C901
 # email addresses #
 
 
-def get_email_addresses_from_search_string(
+def iter_message_parts(payload):
+    """
+    Walks a message payload and all its nested parts depth first.
+
+    Args:
+        payload (dict): The payload of a message, or any part of it.
+
+    Yields:
+        dict: Each part, starting with the payload itself.
+    """
+    yield payload
+    for part in payload.get("parts", []):
+        yield from iter_message_parts(part)
+
+
+def decode_part_body(part):
+    """
+    Decodes the body data of a part, replacing bytes that are not utf-8.
+
+    Args:
+        part (dict): A message part with body data.
+
+    Returns:
+        str: The decoded text, empty when the part has no data.
+    """
+    data = part.get("body", {}).get("data")
+    if not data:
+        return ""
+    return base64.urlsafe_b64decode(data.encode("utf-8")).decode(
+        "utf-8", errors="replace"
+    )
+
+
+def get_message_text_parts(message):
+    """
+    Lists the text/plain and text/html parts of a message that have data.
+
+    Args:
+        message (dict): The message resource, fetched with format="full".
+
+    Returns:
+        list: (message id, part id, part) tuples.
+    """
+    return [
+        (message["id"], part.get("partId", ""), part)
+        for part in iter_message_parts(message["payload"])
+        if part.get("mimeType") in ["text/plain", "text/html"]
+        and part.get("body", {}).get("data")
+    ]
+
+
+def extract_email_addresses_from_parts(ls_text_parts):
+    """
+    Decodes text parts and finds the email addresses in them.
+
+    Args:
+        ls_text_parts (list): (message id, part id, part) tuples.
+
+    Returns:
+        list: (message id, part id, address) tuples.
+    """
+    ls_rows = []
+    for message_id, part_id, part in ls_text_parts:
+        for address in EMAIL_ADDRESS_PATTERN.findall(decode_part_body(part)):
+            ls_rows.append((message_id, part_id, address))
+    return ls_rows
+
+
+def get_email_addresses_df(ls_messages, workers=None):
+    """
+    Extracts the email addresses in the text parts of messages. Large batches
+    are decoded and matched across a process pool, since both are CPU bound.
+
+    Args:
+        ls_messages (list): Message resources, fetched with format="full".
+        workers (int, optional): The number of processes, defaults to the cpus.
+
+    Returns:
+        pd.DataFrame: One row per address found with message_id, part and address.
+    """
+    ls_text_parts = [
+        text_part
+        for message in ls_messages
+        for text_part in get_message_text_parts(message)
+    ]
+
+    if len(ls_text_parts) < EMAIL_EXTRACT_PROCESS_MIN_PARTS:
+        ls_rows = extract_email_addresses_from_parts(ls_text_parts)
+    else:
+        workers = workers or os.cpu_count() or 1
+        chunk_size = -(-len(ls_text_parts) // (workers * 4))
+        ls_chunks = [
+            ls_text_parts[i : i + chunk_size]
+            for i in range(0, len(ls_text_parts), chunk_size)
+        ]
+        print_logger(
+            f"Extracting email addresses from {len(ls_text_parts)} parts on {workers} processes"
+        )
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            ls_rows = [
+                row
+                for ls_chunk_rows in executor.map(
+                    extract_email_addresses_from_parts, ls_chunks
+                )
+                for row in ls_chunk_rows
+            ]
+
+    return pd.DataFrame(
+        ls_rows, columns=["message_id", "part", "address"]
+    ).drop_duplicates(ignore_index=True)
+
+
+def get_email_addresses_df_from_search_string(
     search_string,
     account_type="default",
+    workers=None,
 ):
-    # search gmail for message
+    """
+    Extracts the email addresses in the bodies of every message of a search.
+
+    Args:
+        search_string (str): The gmail search string.
+        account_type (str): The account the search runs against.
+        workers (int, optional): The number of extraction processes.
+
+    Returns:
+        pd.DataFrame: One row per address found with message_id, part and address.
+    """
     service = get_gmail_service(account_type=account_type)
-    results = service.users().messages().list(userId="me", q=search_string).execute()
-    all_messages_from_search = results.get("messages", [])
-    print(f"found {len(all_messages_from_search)} messages")
+    ls_message_ids = get_synced_messages_df(search_string, account_type=account_type)[
+        "message_id"
+    ].tolist()
+    print_logger(f"found {len(ls_message_ids)} messages")
 
-    if not all_messages_from_search:
-        print("No messages found.")
-        return
+    dict_messages = get_synced_messages(
+        service, search_string, account_type, ls_message_ids
+    )
+    return get_email_addresses_df(
+        [
+            dict_messages[message_id]
+            for message_id in ls_message_ids
+            if message_id in dict_messages
+        ],
+        workers=workers,
+    )
 
-    email_addresses = []
-    email_regex = r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"
 
-    for this_message_from_results in all_messages_from_search:
-        message_id = this_message_from_results["id"]
+def get_email_addresses_from_search_string(
+    search_string,
+    account_type="default",
+):
+    df_addresses = get_email_addresses_df_from_search_string(
+        search_string,
+        account_type=account_type,
+    )
 
-        executed_message = (
-            service.users().messages().get(userId="me", id=message_id).execute()
-        )
+    if df_addresses.empty:
+        print("No email addresses found.")
 
-        if "parts" in executed_message["payload"]:
-            for part in executed_message["payload"]["parts"]:
-                print(part["mimeType"])
-                print("#" * 30)
-                if part["mimeType"] == "text/plain":
-                    decoded_data = base64.urlsafe_b64decode(
-                        part["body"]["data"].encode("utf-8")
-                    ).decode("utf-8")
-                    print(decoded_data)
-                    email_matches = re.findall(email_regex, decoded_data)
-                    email_addresses.extend(email_matches)
-                elif part["mimeType"] == "text/html":
-                    decoded_data = base64.urlsafe_b64decode(
-                        part["body"]["data"].encode("utf-8")
-                    ).decode("utf-8")
-                    print(decoded_data)
-                    email_matches = re.findall(email_regex, decoded_data)
-                    email_addresses.extend(email_matches)
-
-    return list(set(email_addresses))
+    return df_addresses["address"].unique().tolist()
 
 
 # %%
 # Email Bodies #
 
 
+def get_message_body(message):
+    """
+    Decodes the body of a message, preferring the plain text version.
+
+    Args:
+        message (dict): The message resource, fetched with format="full".
+
+    Returns:
+        str: The body, empty when the message has no text part.
+    """
+    ls_text_parts = get_message_text_parts(message)
+    for _, _, part in ls_text_parts:
+        if part["mimeType"] == "text/plain":
+            return decode_part_body(part)
+    if ls_text_parts:
+        return decode_part_body(ls_text_parts[0][2])
+    return ""
+
+
 def get_body_dataframe_from_search_string(
     search_string,
     account_type="default",
 ):
     # search gmail for message
     service = get_gmail_service(account_type=account_type)
-    all_messages_from_search = []
-    request = service.users().messages().list(userId="me", q=search_string)
+    ls_message_ids = get_synced_messages_df(search_string, account_type=account_type)[
+        "message_id"
+    ].tolist()
 
-    while request:
-        response = request.execute()
-        all_messages_from_search.extend(response.get("messages", []))
-        request = (
-            service.users()
-            .messages()
-            .list_next(previous_request=request, previous_response=response)
-        )
+    print(f"found {len(ls_message_ids)} messages")
 
-    print(f"found {len(all_messages_from_search)} messages")
-
-    if not all_messages_from_search:
+    if not ls_message_ids:
         print("No messages found.")
         return
 
@@ -530,8 +1601,13 @@ def get_body_dataframe_from_search_string(
     messages_data = []
 
     # Iterate through each message
-    for message in all_messages_from_search:
-        msg = service.users().messages().get(userId="me", id=message["id"]).execute()
+    dict_messages = get_synced_messages(
+        service, search_string, account_type, ls_message_ids
+    )
+    for message_id in ls_message_ids:
+        if message_id not in dict_messages:
+            continue
+        msg = dict_messages[message_id]
 
         # Extract headers
         headers = msg["payload"]["headers"]
@@ -557,25 +1633,13 @@ def get_body_dataframe_from_search_string(
         )
 
         # Extract and decode body
-        body = ""
-        if "data" in msg["payload"]["body"]:
-            body = base64.urlsafe_b64decode(msg["payload"]["body"]["data"]).decode(
-                "utf-8"
-            )
-        else:
-            parts = msg["payload"].get("parts", [])
-            for part in parts:
-                if part["partId"] == "0" and "data" in part["body"]:
-                    body = base64.urlsafe_b64decode(part["body"]["data"]).decode(
-                        "utf-8"
-                    )
-                    break
+        body = get_message_body(msg)
 
         # Append data to the list
         messages_data.append(
             {
                 "date": date,
-                "message_id": message["id"],
+                "message_id": message_id,
                 "sender": sender,
                 "recipient": recipient,
                 "subject": subject,
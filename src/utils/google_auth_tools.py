@@ -0,0 +1,260 @@
+# %%
+# Imports #
+
+import hashlib
+import json
+import os
+import sys
+import threading
+
+from dotenv import load_dotenv
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+from googleapiclient.discovery_cache.base import Cache
+from googleapiclient.errors import UnknownApiNameOrVersion
+
+# append grandparent
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.config_utils import discovery_cache_dir, grandparent_dir
+from utils.display_tools import print_logger
+
+# %%
+# Load Environment #
+
+# source .env file
+dotenv_path = os.path.join(grandparent_dir, ".env")
+if os.path.exists(dotenv_path):
+    load_dotenv(dotenv_path)
+
+
+# %%
+# Variables #
+
+SERVICE_ACCOUNT_ENV_KEY = "GOOGLE_SERVICE_ACCOUNT"
+json_file_path = os.path.join(
+    grandparent_dir,
+    "service_account_credentials.json",
+)
+
+# one credential object covers every Google API used by the utils
+GOOGLE_SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+    "https://www.googleapis.com/auth/documents",
+]
+
+# filled on first use, see get_service_account_info and get_google_credentials
+dict_service_account_info = {}
+dict_google_credentials = {}
+credentials_lock = threading.Lock()
+
+# built services hold an httplib2 connection, which is not thread safe
+thread_local_services = threading.local()
+
+
+# %%
+# Google Credentials #
+
+
+def load_service_account_info():
+    """
+    Reads the service account json from the environment variable, repairing
+    escaped newlines if needed, or from the json file next to the repo.
+
+    Returns:
+        dict: The parsed service account info.
+    """
+    service_account_env_data = os.getenv(SERVICE_ACCOUNT_ENV_KEY)
+
+    if service_account_env_data is not None:
+        print_logger(
+            f"Found environment variable for service account with key: {SERVICE_ACCOUNT_ENV_KEY}"
+        )
+        if not service_account_env_data:
+            raise ValueError(
+                f"Environment variable {SERVICE_ACCOUNT_ENV_KEY} is not set or empty"
+            )
+
+        try:
+            service_account_env_data_json = json.loads(service_account_env_data)
+        except json.JSONDecodeError as e:
+            print_logger(
+                f"JSONDecodeError: {e} with reading json from environment variable, trying to repair and reload"
+            )
+            service_account_env_data = service_account_env_data.replace("\n", "\\n")
+            service_account_env_data_json = json.loads(service_account_env_data)
+
+            # fix environment variable without modifying the .env file
+            os.environ[SERVICE_ACCOUNT_ENV_KEY] = service_account_env_data
+
+    elif os.path.exists(json_file_path):
+        print_logger(
+            f"No environment varible with key: {SERVICE_ACCOUNT_ENV_KEY}, Found json credentails at: {json_file_path}"
+        )
+        with open(json_file_path, "r") as f:
+            service_account_env_data = f.read()
+        service_account_env_data_json = json.loads(service_account_env_data)
+
+        # add environment variable without modifying the .env file
+        os.environ[SERVICE_ACCOUNT_ENV_KEY] = service_account_env_data
+
+    else:
+        raise ValueError(
+            f"No environment varible with key: {SERVICE_ACCOUNT_ENV_KEY}, and no json credentails at: {json_file_path}"
+        )
+
+    print_logger(
+        f"google_service_account email: {service_account_env_data_json['client_email']}"
+    )
+    return service_account_env_data_json
+
+
+def get_service_account_info():
+    """
+    Returns the service account info, loading it on first use.
+
+    Returns:
+        dict: The parsed service account info.
+    """
+    if not dict_service_account_info:
+        with credentials_lock:
+            if not dict_service_account_info:
+                dict_service_account_info.update(load_service_account_info())
+    return dict_service_account_info
+
+
+def get_service_account_email():
+    """
+    Returns the email of the service account, loading it on first use.
+
+    Returns:
+        str: The client email of the service account.
+    """
+    return get_service_account_info()["client_email"]
+
+
+def get_google_credentials():
+    """
+    Returns the service account credentials shared by Sheets, Drive and Docs,
+    creating them on first use. google-auth refreshes the token in place, so
+    every client built from this object reuses the same access token.
+
+    Returns:
+        google.oauth2.service_account.Credentials: The shared credentials.
+    """
+    if "service_account" not in dict_google_credentials:
+        service_account_info = get_service_account_info()
+        with credentials_lock:
+            if "service_account" not in dict_google_credentials:
+                dict_google_credentials["service_account"] = (
+                    service_account.Credentials.from_service_account_info(
+                        service_account_info,
+                        scopes=GOOGLE_SCOPES,
+                    )
+                )
+    return dict_google_credentials["service_account"]
+
+
+# %%
+# Google Services #
+
+
+class DiscoveryFileCache(Cache):
+    """
+    Keeps discovery documents in discovery_cache_dir so build() only fetches
+    an API's document once per machine instead of once per process.
+    """
+
+    def get_path(self, url):
+        url_hash = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(discovery_cache_dir, f"{url_hash}.json")
+
+    def get(self, url):
+        path = self.get_path(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, url, content):
+        path = self.get_path(url)
+        try:
+            os.makedirs(discovery_cache_dir, exist_ok=True)
+            with open(path + ".tmp", "w") as f:
+                f.write(content)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print_logger(
+                f"Could not cache discovery document for {url}, error: {e}",
+                level="warning",
+            )
+
+
+def build_google_service(api_name, api_version, credentials=None):
+    """
+    Builds a Google API service without a network round trip for the
+    discovery document. The document bundled with googleapiclient is used
+    when there is one, otherwise it is fetched once and kept on disk.
+
+    Args:
+        api_name (str): The name of the API, like "drive".
+        api_version (str): The version of the API, like "v3".
+        credentials (google.auth.credentials.Credentials, optional): The
+            credentials to use, defaults to the shared service account.
+
+    Returns:
+        googleapiclient.discovery.Resource: The service object.
+    """
+    if credentials is None:
+        credentials = get_google_credentials()
+
+    try:
+        return build(
+            api_name,
+            api_version,
+            credentials=credentials,
+            static_discovery=True,
+        )
+    except UnknownApiNameOrVersion:
+        print_logger(
+            f"No bundled discovery document for {api_name} {api_version}, using the disk cache",
+            level="debug",
+        )
+        return build(
+            api_name,
+            api_version,
+            credentials=credentials,
+            static_discovery=False,
+            cache=DiscoveryFileCache(),
+        )
+
+
+def get_google_service(api_name, api_version):
+    """
+    Returns a service for the current thread built on the shared credentials,
+    building it on first use.
+
+    Args:
+        api_name (str): The name of the API, like "drive".
+        api_version (str): The version of the API, like "v3".
+
+    Returns:
+        googleapiclient.discovery.Resource: The service object.
+    """
+    if getattr(thread_local_services, "dict_services", None) is None:
+        thread_local_services.dict_services = {}
+
+    dict_services = thread_local_services.dict_services
+    if (api_name, api_version) not in dict_services:
+        dict_services[(api_name, api_version)] = build_google_service(
+            api_name, api_version
+        )
+    return dict_services[(api_name, api_version)]
+
+
+# %%
@@ -1,13 +1,10 @@
 # %%
 # Imports #
 
-import json
 import os
 import sys
 
 from dotenv import load_dotenv
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 # append grandparent
@@ -16,6 +13,11 @@ if __name__ == "__main__":
 
 from utils.config_utils import grandparent_dir
 from utils.display_tools import pprint_dict, print_logger
+from utils.google_auth_tools import (
+    get_google_credentials,
+    get_google_service,
+    get_service_account_email,
+)
 
 # %%
 # Load Environment #
@@ -27,42 +29,29 @@ if os.path.exists(dotenv_path):
 
 
 # %%
-# Google Credentials #
-
-service_account_env_key = "GOOGLE_SERVICE_ACCOUNT"
-raw_json = os.getenv(service_account_env_key)
-
-try:
-    service_account_email = json.loads(raw_json)["client_email"]
-    fixed_json = raw_json
-except json.JSONDecodeError as e:
-    print_logger(f"Issues: {e} with reading json from environment variable")
-    print_logger("Fixing json from environment variable")
-    fixed_json = raw_json.replace("\n", "\\n")
-    service_account_email = json.loads(fixed_json)["client_email"]
-    # fix environment variable without modifying the .env file
-    os.environ[service_account_env_key] = fixed_json
-
-print_logger(f"google_service_account email: {service_account_email}")
-
-
-if os.getenv(service_account_env_key):
-    print_logger("Using service account credentials from environment variable")
-    # create credentials from google service account info
-    credentials_docs = service_account.Credentials.from_service_account_info(
-        json.loads(os.getenv(service_account_env_key), strict=False),
-        scopes=["https://www.googleapis.com/auth/documents"],
-    )
-else:
-    print_logger("Using json file for service account credentials")
-    # create credentials from json file
-    credentials_docs = service_account.Credentials.from_service_account_file(
-        os.path.join(grandparent_dir, "service_account_credentials.json"),
-        scopes=["https://www.googleapis.com/auth/documents"],
-    )
+# Google Docs Service #
+
+
+def get_docs_service():
+    """
+    Returns the Docs service for the current thread, built on first use with
+    the credentials shared with Sheets and Drive.
+
+    Returns:
+        googleapiclient.discovery.Resource: The Google Docs service object.
+    """
+    return get_google_service("docs", "v1")
+
 
-# Create a Google Docs API client
-docs_service = build("docs", "v1", credentials=credentials_docs)
+def __getattr__(name):
+    """Keeps the names that used to be created at import time importable."""
+    if name == "docs_service":
+        return get_docs_service()
+    if name == "credentials_docs":
+        return get_google_credentials()
+    if name == "service_account_email":
+        return get_service_account_email()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # %%
@@ -80,7 +69,7 @@ def get_google_doc_from_id(id):
     """
 
     try:
-        document = docs_service.documents().get(documentId=id).execute()
+        document = get_docs_service().documents().get(documentId=id).execute()
         return document
     except HttpError as e:
         print_logger(f"Error: {e}", level="warning")
@@ -112,7 +101,7 @@ def append_text_to_doc_by_id(id, text):
     """
 
     # Get the current length of the document
-    document = docs_service.documents().get(documentId=id).execute()
+    document = get_docs_service().documents().get(documentId=id).execute()
     current_length = document["body"]["content"][-1]["endIndex"] - 1
 
     requests = [
@@ -124,7 +113,8 @@ def append_text_to_doc_by_id(id, text):
         }
     ]
     result = (
-        docs_service.documents()
+        get_docs_service()
+        .documents()
         .batchUpdate(documentId=id, body={"requests": requests})
         .execute()
     )
@@ -1,25 +1,46 @@
 # %%
 # Imports #
 
-import io
+import fnmatch
+import hashlib
 import json
 import os
+import re
+import shutil
 import sys
+import tempfile
+import threading
 import time
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import openpyxl
 import pandas as pd
 from dotenv import load_dotenv
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
+from googleapiclient.http import MediaIoBaseUpload
+
+try:
+    import xlsxwriter
+except ImportError:  # optional, openpyxl's write only mode is used without it
+    xlsxwriter = None
 
 # append grandparent
 if __name__ == "__main__":
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.config_utils import data_dir, grandparent_dir, temp_upload_dir
+from utils.config_utils import (
+    data_dir,
+    drive_download_cache_dir,
+    grandparent_dir,
+)
 from utils.display_tools import pprint_dict, print_logger
+from utils.google_auth_tools import (
+    get_google_credentials,
+    get_google_service,
+    get_service_account_email,
+)
 
 # %%
 # Load Environment #
@@ -41,89 +62,91 @@ if GOOGLE_DRIVE_FOLDER_ID_REPORT is not None:
 
 ls_files_downloaded_this_run = []
 
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
 
-# %%
-# Google Credentials #
+# downloads are streamed to disk this many bytes at a time
+DRIVE_DOWNLOAD_CHUNK_BYTES = 32 * 1024 * 1024
 
-SERVICE_ACCOUNT_ENV_KEY = "GOOGLE_SERVICE_ACCOUNT"
-json_file_path = os.path.join(
-    grandparent_dir,
-    "service_account_credentials.json",
+# uploads are sent resumably this many bytes at a time, a multiple of 256 KB
+DRIVE_UPLOAD_CHUNK_BYTES = 16 * 1024 * 1024
+
+# reports are serialized in memory up to this size before spilling to disk
+REPORT_SPOOL_MAX_BYTES = 256 * 1024 * 1024
+
+# above this many cells excel reports are written row by row in constant memory
+EXCEL_CONSTANT_MEMORY_MIN_CELLS = 1_000_000
+
+# excel writers stamp the zip entries and document properties with the current
+# time, reports get these fixed values instead so the same data gives the same
+# bytes and skip_if_unchanged can match
+EXCEL_FIXED_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+EXCEL_FIXED_PROPERTY_DATE = b"1980-01-01T00:00:00Z"
+EXCEL_CORE_PROPERTIES_PATH = "docProps/core.xml"
+EXCEL_PROPERTY_DATE_PATTERN = re.compile(
+    rb"(<dcterms:(?:created|modified)\b[^>]*>)[^<]*(</dcterms:)"
 )
-service_account_env_data = os.getenv(SERVICE_ACCOUNT_ENV_KEY)
-service_account_env_data_json = None
-service_account_email = None
 
-if service_account_env_data is not None:
-    print_logger(
-        f"Found environment variable for service account with key: {SERVICE_ACCOUNT_ENV_KEY}"
-    )
+# content addressed download cache, see download_and_get_drive_file_path
+DRIVE_DOWNLOAD_CACHE_MAX_BYTES = int(
+    os.getenv("GOOGLE_DRIVE_DOWNLOAD_CACHE_MAX_BYTES", str(20 * 1024**3))
+)
+DRIVE_DOWNLOAD_CACHE_MANIFEST_NAME = "drive_cache_manifest.json"
+drive_download_cache_lock = threading.Lock()
 
-    try:
-        if service_account_env_data:
-            service_account_env_data_json = json.loads(service_account_env_data)
-        else:
-            raise ValueError(
-                f"Environment variable {SERVICE_ACCOUNT_ENV_KEY} is not set or empty"
-            )
-    except json.JSONDecodeError as e:
-        print_logger(
-            f"JSONDecodeError: {e} with reading json from environment variable, trying to repair and reload"
-        )
-        if service_account_env_data is not None:
-            service_account_env_data = service_account_env_data.replace("\n", "\\n")
-            service_account_env_data_json = json.loads(service_account_env_data)
-        else:
-            raise ValueError(
-                f"Environment variable {SERVICE_ACCOUNT_ENV_KEY} is not set or empty"
-            )
+# (parent_id, name) to id lookups, persisted between runs
+DRIVE_PATH_CACHE_TTL_SECONDS = int(
+    os.getenv("GOOGLE_DRIVE_PATH_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60))
+)
+drive_path_cache_path = os.path.join(data_dir, "drive_path_cache.json")
+dict_drive_path_cache = {}
+drive_path_cache_lock = threading.Lock()
 
-        # fix environment variable without modifying the .env file
-        os.environ[SERVICE_ACCOUNT_ENV_KEY] = service_account_env_data
+# path cache keys checked against Drive by this process, entries are trusted
+# after their first check so a cached path costs one get per level per run
+set_checked_drive_path_keys = set()
 
-elif os.path.exists(json_file_path):
-    print_logger(
-        f"No environment varible with key: {SERVICE_ACCOUNT_ENV_KEY}, Found json credentails at: {json_file_path}"
-    )
-    service_account_env_data = open(json_file_path).read()
-    service_account_env_data_json = json.loads(service_account_env_data)
 
-    # add environment variable without modifying the .env file
-    os.environ[SERVICE_ACCOUNT_ENV_KEY] = service_account_env_data
+# %%
+# Google Drive Service #
 
-else:
-    raise ValueError(
-        f"No environment varible with key: {SERVICE_ACCOUNT_ENV_KEY}, and no json credentails at: {json_file_path}"
-    )
 
-service_account_email = service_account_env_data_json["client_email"]
-print_logger(f"google_service_account email: {service_account_email}")
+def get_drive_service():
+    """
+    Returns the Drive service for the current thread, built on first use with
+    the credentials shared with Sheets and Docs.
+
+    Returns:
+        googleapiclient.discovery.Resource: The Google Drive service object.
+    """
+    drive_service = get_google_service("drive", "v3")
+    # increase timeout
+    drive_service._http.timeout = 600
+    return drive_service
 
-# create credentials from google service account info
-google_service_account_credentials = (
-    service_account.Credentials.from_service_account_info(
-        service_account_env_data_json,
-        scopes=["https://www.googleapis.com/auth/drive"],
-    )
-)
 
-# Create a Google Drive API client
-drive_service = build("drive", "v3", credentials=google_service_account_credentials)
-# increase timeout
-drive_service._http.timeout = 600
+def __getattr__(name):
+    """Keeps the names that used to be created at import time importable."""
+    if name == "drive_service":
+        return get_drive_service()
+    if name == "google_service_account_credentials":
+        return get_google_credentials()
+    if name == "service_account_email":
+        return get_service_account_email()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # %%
 # Retry Helper #
 
 
-def execute_with_retry(api_request, max_retries=5):
+def execute_with_retry(api_request, max_retries=5, no_retry_statuses=()):
     """
     Executes a Google Drive API request with retry logic and exponential backoff.
 
     Args:
         api_request: The API request object (before calling .execute())
         max_retries: Maximum number of retry attempts (default: 5)
+        no_retry_statuses: HTTP statuses raised right away, like 404 (default: ())
 
     Returns:
         The result of the API request execution
@@ -137,6 +160,8 @@ def execute_with_retry(api_request, max_retries=5):
         try:
             return api_request.execute()
         except (HttpError, TimeoutError) as e:
+            if isinstance(e, HttpError) and e.resp.status in no_retry_statuses:
+                raise
             if attempt == max_retries - 1:
                 print_logger(
                     f"Max retries ({max_retries}) reached. Failed with error: {e}"
@@ -151,21 +176,364 @@ def execute_with_retry(api_request, max_retries=5):
             time.sleep(delay)
 
 
+# %%
+# Path Cache #
+
+
+def get_drive_path_cache_key(parent_id, name, is_folder):
+    return f"{parent_id}/{'folder' if is_folder else 'file'}/{name}"
+
+
+def load_drive_path_cache():
+    """Loads the persisted path cache into dict_drive_path_cache on first use."""
+    with drive_path_cache_lock:
+        if dict_drive_path_cache.get("loaded"):
+            return
+        dict_drive_path_cache["entries"] = {}
+        if os.path.exists(drive_path_cache_path):
+            try:
+                with open(drive_path_cache_path, "r") as f:
+                    dict_drive_path_cache["entries"] = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print_logger(
+                    f"Could not read drive path cache, starting empty, error: {e}",
+                    level="warning",
+                )
+        dict_drive_path_cache["loaded"] = True
+
+
+def save_drive_path_cache():
+    """Writes the path cache to disk atomically."""
+    with drive_path_cache_lock:
+        dict_entries = dict(dict_drive_path_cache.get("entries", {}))
+    tmp_path = f"{drive_path_cache_path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(dict_entries, f)
+    os.replace(tmp_path, drive_path_cache_path)
+
+
+def get_cached_drive_id(parent_id, name, is_folder):
+    """
+    Looks up the id of a child of a Drive folder in the path cache.
+
+    Args:
+        parent_id (str): The ID of the parent folder.
+        name (str): The name of the child.
+        is_folder (bool): Whether the child is a folder.
+
+    Returns:
+        str: The cached id, or None if missing or older than the ttl.
+    """
+    load_drive_path_cache()
+    key = get_drive_path_cache_key(parent_id, name, is_folder)
+    with drive_path_cache_lock:
+        dict_entry = dict_drive_path_cache["entries"].get(key)
+    if dict_entry is None:
+        return None
+    if time.time() - dict_entry["cached_at"] > DRIVE_PATH_CACHE_TTL_SECONDS:
+        return None
+    return dict_entry["id"]
+
+
+def set_cached_drive_id(parent_id, name, is_folder, item_id, save=True):
+    """
+    Records the id of a child of a Drive folder in the path cache.
+
+    Args:
+        parent_id (str): The ID of the parent folder.
+        name (str): The name of the child.
+        is_folder (bool): Whether the child is a folder.
+        item_id (str): The ID of the child.
+        save (bool): Whether to persist the cache to disk right away.
+    """
+    load_drive_path_cache()
+    key = get_drive_path_cache_key(parent_id, name, is_folder)
+    with drive_path_cache_lock:
+        dict_drive_path_cache["entries"][key] = {
+            "id": item_id,
+            "cached_at": time.time(),
+        }
+        set_checked_drive_path_keys.add(key)
+    if save:
+        save_drive_path_cache()
+
+
+def invalidate_drive_path_cache(parent_id=None, item_id=None):
+    """
+    Removes entries from the path cache, everything if no filter is given.
+
+    Args:
+        parent_id (str, optional): Remove the cached children of this folder.
+        item_id (str or list, optional): Remove the entries that resolve to
+            this id or ids, use after renaming, moving or deleting items.
+
+    Returns:
+        int: The number of entries removed.
+    """
+    set_item_ids = {item_id} if isinstance(item_id, str) else set(item_id or [])
+
+    load_drive_path_cache()
+    with drive_path_cache_lock:
+        dict_entries = dict_drive_path_cache["entries"]
+        if parent_id is None and item_id is None:
+            ls_keys = list(dict_entries.keys())
+        else:
+            ls_keys = [
+                key
+                for key, dict_entry in dict_entries.items()
+                if (parent_id is not None and key.startswith(f"{parent_id}/"))
+                or dict_entry["id"] in set_item_ids
+            ]
+        for key in ls_keys:
+            del dict_entries[key]
+            set_checked_drive_path_keys.discard(key)
+    save_drive_path_cache()
+    return len(ls_keys)
+
+
+def escape_drive_query_value(value):
+    """Escapes a value for use inside a quoted Drive query string."""
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+
+def is_cached_drive_id_current(parent_id, name, item_id):
+    """
+    Checks with a single get by id that a cached item is still named name,
+    still inside parent_id and not trashed.
+
+    Args:
+        parent_id (str): The ID of the parent folder.
+        name (str): The name of the child.
+        item_id (str): The cached ID of the child.
+
+    Returns:
+        bool: True if the cached id still resolves the name.
+    """
+    try:
+        dict_item = execute_with_retry(
+            get_drive_service()
+            .files()
+            .get(
+                fileId=item_id, fields="name, parents, trashed", supportsAllDrives=True
+            ),
+            no_retry_statuses=(404,),
+        )
+    except HttpError as e:
+        if e.resp.status == 404:
+            return False
+        raise
+
+    return (
+        not dict_item.get("trashed", False)
+        and dict_item.get("name") == name
+        and parent_id in dict_item.get("parents", [])
+    )
+
+
+def get_drive_child_id(parent_id, name, is_folder=False, use_cache=True):
+    """
+    Gets the id of a file or folder by name within a parent folder, checking
+    the path cache first and caching what the lookup finds. A cached id is
+    checked once per process, if it was trashed, deleted, renamed or moved
+    since it is dropped and looked up again.
+
+    Args:
+        parent_id (str): The ID of the parent folder.
+        name (str): The name of the child.
+        is_folder (bool): Whether the child is a folder.
+        use_cache (bool): Whether to read from the path cache.
+
+    Returns:
+        str: The ID of the child, or None if it does not exist.
+    """
+    if use_cache:
+        item_id = get_cached_drive_id(parent_id, name, is_folder)
+        key = get_drive_path_cache_key(parent_id, name, is_folder)
+        if item_id is not None:
+            with drive_path_cache_lock:
+                is_checked = key in set_checked_drive_path_keys
+            if is_checked or is_cached_drive_id_current(parent_id, name, item_id):
+                with drive_path_cache_lock:
+                    set_checked_drive_path_keys.add(key)
+                return item_id
+            print_logger(
+                f"Cached id {item_id} of {name} in {parent_id} is stale, looking it up again",
+                level="debug",
+            )
+            invalidate_drive_path_cache(item_id=item_id)
+
+    mime_type_operator = "=" if is_folder else "!="
+    query = (
+        f"name='{escape_drive_query_value(name)}' and "
+        f"'{parent_id}' in parents and trashed=false and "
+        f"mimeType{mime_type_operator}'{FOLDER_MIME_TYPE}'"
+    )
+    results = execute_with_retry(
+        get_drive_service().files().list(q=query, fields="files(id, name)")
+    ).get("files", [])
+    if not results:
+        return None
+
+    item_id = results[0]["id"]
+    set_cached_drive_id(parent_id, name, is_folder, item_id)
+    return item_id
+
+
+def crawl_drive_folder_tree(
+    folder_id,
+    fields="id, name, mimeType, parents",
+    max_depth=None,
+    batch_size=40,
+):
+    """
+    Lists every item below a folder and fills the path cache with them.
+    The tree is crawled one level at a time, listing the children of up to
+    batch_size folders with a single paged query, instead of one query per
+    folder per lookup.
+
+    Args:
+        folder_id (str): The ID of the root folder of the tree.
+        fields (str): The file fields to request, must include id, name,
+            mimeType and parents.
+        max_depth (int, optional): How many levels below the root to crawl,
+            None crawls the whole tree.
+        batch_size (int): How many folders to list per query.
+
+    Returns:
+        list: One dict per item with the requested fields plus "parent_id"
+            and "ls_path", the list of names from the root to the item.
+    """
+    dict_folder_paths = {folder_id: []}
+    ls_level_folder_ids = [folder_id]
+    ls_items = []
+    depth = 0
+
+    while ls_level_folder_ids and (max_depth is None or depth < max_depth):
+        ls_next_level_folder_ids = []
+        for i in range(0, len(ls_level_folder_ids), batch_size):
+            ls_batch_ids = ls_level_folder_ids[i : i + batch_size]
+            parents_query = " or ".join(
+                f"'{batch_id}' in parents" for batch_id in ls_batch_ids
+            )
+            page_token = None
+            while True:
+                results = execute_with_retry(
+                    get_drive_service()
+                    .files()
+                    .list(
+                        q=f"({parents_query}) and trashed=false",
+                        fields=f"nextPageToken, files({fields})",
+                        pageSize=1000,
+                        pageToken=page_token,
+                    )
+                )
+                for file in results.get("files", []):
+                    is_folder = file.get("mimeType") == FOLDER_MIME_TYPE
+                    for parent_id in file.get("parents", []):
+                        if parent_id not in ls_batch_ids:
+                            continue
+                        set_cached_drive_id(
+                            parent_id, file["name"], is_folder, file["id"], save=False
+                        )
+                        ls_path = dict_folder_paths[parent_id] + [file["name"]]
+                        ls_items.append(
+                            {**file, "parent_id": parent_id, "ls_path": ls_path}
+                        )
+                        if is_folder and file["id"] not in dict_folder_paths:
+                            dict_folder_paths[file["id"]] = ls_path
+                            ls_next_level_folder_ids.append(file["id"])
+
+                page_token = results.get("nextPageToken", None)
+                if page_token is None:
+                    break
+
+        ls_level_folder_ids = ls_next_level_folder_ids
+        depth += 1
+
+    save_drive_path_cache()
+    print_logger(
+        f"Crawled {len(ls_items)} items in {len(dict_folder_paths)} folders under {folder_id}",
+        level="debug",
+    )
+    return ls_items
+
+
+def prefetch_drive_folder_tree(folder_id, max_depth=None):
+    """
+    Fills the path cache with every item below a folder so later path
+    lookups and uploads in that tree do not need any list calls.
+
+    Args:
+        folder_id (str): The ID of the root folder of the tree.
+        max_depth (int, optional): How many levels below the root to crawl.
+
+    Returns:
+        int: The number of items cached.
+    """
+    return len(crawl_drive_folder_tree(folder_id, max_depth=max_depth))
+
+
+def resolve_drive_folder_path(folder_id, ls_folder_path, create=False, use_cache=True):
+    """
+    Walks a list of folder names down from a folder, one cached lookup per level.
+
+    Args:
+        folder_id (str): The ID of the folder to start from.
+        ls_folder_path (list): The folder names to walk, in order.
+        create (bool): Whether to create folders that do not exist.
+        use_cache (bool): Whether to read from the path cache.
+
+    Returns:
+        str: The ID of the last folder in the path.
+
+    Raises:
+        ValueError: If a folder does not exist and create is False.
+    """
+    curr_dir_id = folder_id
+    for folder_name in ls_folder_path:
+        print_logger(
+            f"Looking for folder {folder_name} in folder ID {curr_dir_id}",
+            level="debug",
+        )
+        child_id = get_drive_child_id(
+            curr_dir_id, folder_name, is_folder=True, use_cache=use_cache
+        )
+        if child_id is None:
+            if not create:
+                raise ValueError(f"Folder not found: {folder_name}")
+            print_logger(
+                f"Folder doesn't exist, creating folder: {folder_name}", level="info"
+            )
+            child_id = create_folder_in_drive(
+                get_drive_service(), curr_dir_id, folder_name
+            )
+            set_cached_drive_id(curr_dir_id, folder_name, True, child_id)
+            print_logger(f"Folder: {folder_name} created with ID: {child_id}")
+        curr_dir_id = child_id
+
+    return curr_dir_id
+
+
 # %%
 # Get Functions #
 
 
-def get_drive_file_id_from_folder_id_path(folder_id, ls_file_path, is_folder=False):
+def get_drive_file_id_from_folder_id_path(
+    folder_id, ls_file_path, is_folder=False, use_cache=True
+):
     """
     Given a folder ID and a list of folder and file names, returns
     the ID of the file with the specified name that
     is located within the final folder in the specified path.
+    Every level is looked up in the path cache before asking Drive.
 
     Args:
         folder_id (str): The ID of the top-level folder to start the search from.
         ls_file_path (List[str] or str): A list of folder and file names
         that make up the path to the desired file. The
         final item in the list should be the name of the desired file.
+        is_folder (bool): Whether the final item is a folder.
+        use_cache (bool): Whether to read from the path cache.
 
     Returns:
         str: The ID of the desired file.
@@ -179,65 +547,19 @@ def get_drive_file_id_from_folder_id_path(folder_id, ls_file_path, is_folder=Fal
     if isinstance(ls_file_path, str):
         ls_file_path = [ls_file_path]
 
-    curr_dir_id = folder_id
-    for folder_name in ls_file_path[:-1]:
-        print_logger(
-            f"Scanning folder {folder_name} with ID {curr_dir_id}", level="debug"
-        )
-
-        results = None  # Initialize results to None
-        file_found = False  # Initialize a flag variable to False
-
-        while not file_found:
-            # Retrieve a list of files in the specified folder
-            # search for the folder by name and within the current directory
-            query = (
-                f"name='{folder_name}' and "
-                f"'{curr_dir_id}' in parents and "
-                "trashed=false and "
-                "mimeType='application/vnd.google-apps.folder'"
-            )
-
-            results = execute_with_retry(
-                drive_service.files().list(q=query, fields="files(id, name)")
-            )
-
-            # Iterate through the files on the current page
-            for file in results.get("files", []):
-                if file.get("name") == folder_name:
-                    curr_dir_id = file["id"]
-                    file_found = True  # Set the flag to True when the file is found
-                    break  # Exit the loop if the file is found
-
-            page_token = results.get("nextPageToken", None)
-
-            if page_token is None or file_found:
-                # Exit the loop if the file is found or if there are no more pages
-                break
-
-        if not results:
-            raise ValueError(f"Folder not found: {folder_name}")
-
-    # we've traversed to the final parent dir, now look for folder or file
+    # traverse to the final parent dir, then look for the folder or file
+    curr_dir_id = resolve_drive_folder_path(
+        folder_id, ls_file_path[:-1], use_cache=use_cache
+    )
     filename = ls_file_path[-1]
-    if is_folder:
-        query = (
-            f"name='{filename}' and '{curr_dir_id}' in parents and "
-            "trashed=false and mimeType='application/vnd.google-apps.folder'"
-        )
-    else:
-        query = (
-            f"name='{filename}' and '{curr_dir_id}' in parents and trashed=false "
-            "and mimeType!='application/vnd.google-apps.folder'"
-        )
-    results = execute_with_retry(
-        drive_service.files().list(q=query, fields="files(id, name)")
-    ).get("files", [])
+    item_id = get_drive_child_id(
+        curr_dir_id, filename, is_folder=is_folder, use_cache=use_cache
+    )
 
-    if not results:
+    if item_id is None:
         raise ValueError(f"File not found: {filename}")
 
-    return results[0]["id"]
+    return item_id
 
 
 def get_file_list_from_folder_id(folder_id):
@@ -259,7 +581,9 @@ def get_file_list_from_folder_id(folder_id):
     while True:
         # Retrieve a list of files in the specified folder
         results = execute_with_retry(
-            drive_service.files().list(
+            get_drive_service()
+            .files()
+            .list(
                 q=f"'{folder_id}' in parents and trashed=false",
                 fields="nextPageToken, files(id, name)",
                 pageToken=page_token,
@@ -304,43 +628,136 @@ def get_file_list_from_folder_id_file_path(root_folder_id, ls_file_path):
     return ls_files_dict
 
 
-def download_file_by_id(id, path, max_retries=3):
+def get_drive_file_metadata(
+    file_id, fields="id, name, mimeType, size, md5Checksum, modifiedTime"
+):
     """
-    Downloads a file from Google Drive by its ID and saves it to the specified path.
+    Gets the metadata of a Drive file without downloading its contents.
 
     Args:
-        id (str): The ID of the file to download.
-        path (str): The path where the downloaded file will be saved.
-        max_retries (int, optional): The maximum number of download
-            retries in case of failure. Defaults to 3.
+        file_id (str): The ID of the file.
+        fields (str, optional): The file fields to request.
 
-    Raises:
-        TimeoutError: If the download fails after the maximum number of retries.
+    Returns:
+        dict: The requested metadata of the file.
+    """
+    return execute_with_retry(
+        get_drive_service()
+        .files()
+        .get(fileId=file_id, fields=fields, supportsAllDrives=True)
+    )
+
+
+def get_stream_md5(stream, block_size=8 * 1024 * 1024):
+    """
+    Computes the md5 of a binary stream in blocks, matching Drive's md5Checksum.
+    The stream is read from the start and rewound afterwards.
+
+    Args:
+        stream (io.IOBase): A seekable binary stream.
+        block_size (int, optional): How many bytes to read at a time.
 
     Returns:
-        None
+        str: The hex digest of the stream.
+    """
+    md5 = hashlib.md5()
+    stream.seek(0)
+    for block in iter(lambda: stream.read(block_size), b""):
+        md5.update(block)
+    stream.seek(0)
+    return md5.hexdigest()
+
+
+def get_file_md5(path, block_size=8 * 1024 * 1024):
+    """
+    Computes the md5 of a local file in blocks, matching Drive's md5Checksum.
+
+    Args:
+        path (str): The path of the file.
+        block_size (int, optional): How many bytes to read at a time.
+
+    Returns:
+        str: The hex digest of the file.
+    """
+    with open(path, "rb") as f:
+        return get_stream_md5(f, block_size=block_size)
+
+
+def download_file_range_to_part_file(file_id, part_path, chunk_size, total_size=None):
+    """
+    Streams a Drive file into a partial file with HTTP Range requests,
+    appending to whatever a previous attempt already wrote.
+
+    Args:
+        file_id (str): The ID of the file to download.
+        part_path (str): The partial file to append to.
+        chunk_size (int): How many bytes to request at a time.
+        total_size (int, optional): The size of the file if known.
+    """
+    request = get_drive_service().files().get_media(fileId=file_id)
+
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if total_size is not None and offset > total_size:
+        os.remove(part_path)
+        offset = 0
+    if offset > 0:
+        print_logger(f"Resuming download of {file_id} at byte {offset}", level="info")
+
+    with open(part_path, "ab") as f:
+        while total_size is None or offset < total_size:
+            resp, content = request.http.request(
+                request.uri,
+                method="GET",
+                headers={"range": f"bytes={offset}-{offset + chunk_size - 1}"},
+            )
+            if resp.status == 416:
+                # nothing left past offset
+                break
+            if resp.status not in (200, 206):
+                raise HttpError(resp, content, uri=request.uri)
+            if resp.status == 200 and offset > 0:
+                # the range was ignored and the whole file was sent
+                f.seek(0)
+                f.truncate()
+                offset = 0
+
+            f.write(content)
+            offset += len(content)
+
+            if "content-range" in resp:
+                total_size = int(resp["content-range"].rsplit("/", 1)[1])
+            elif resp.status == 200 or not content:
+                total_size = offset
+
+
+def read_part_file_revision(part_revision_path):
+    """Returns the revision saved next to a .part file, None if there is none."""
+    try:
+        with open(part_revision_path, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def download_file_range_with_retries(
+    file_id, part_path, chunk_size, total_size, max_retries
+):
+    """
+    Runs download_file_range_to_part_file, resuming after network and server
+    errors up to max_retries attempts.
     """
     retries = 0
-    while retries < max_retries:
+    while True:
         try:
-            # download the file
-            request = drive_service.files().get_media(fileId=id)
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while done is False:
-                status, done = downloader.next_chunk()
-
-            os.makedirs(os.path.dirname(path), exist_ok=True)
-
-            # save the downloaded file to disk
-            with io.open(path, "wb") as f:
-                fh.seek(0)
-                f.write(fh.read())
-
-            # If the download is successful, break out of the loop
-            break
-        except TimeoutError as e:
+            download_file_range_to_part_file(file_id, part_path, chunk_size, total_size)
+            return
+        except (TimeoutError, ConnectionError, HttpError) as e:
+            if (
+                isinstance(e, HttpError)
+                and e.resp.status < 500
+                and e.resp.status != 429
+            ):
+                raise
             print_logger(f"Download attempt {retries + 1} failed: {e}")
             retries += 1
             if retries < max_retries:
@@ -350,18 +767,111 @@ def download_file_by_id(id, path, max_retries=3):
                 print_logger("Max retries reached. Download failed.")
                 raise
 
-    # Check if the download was successful
-    if retries < max_retries:
-        print_logger("Download successful!")
-    else:
-        print_logger("Max retries reached. Download failed.")
+
+def download_file_by_id(
+    id,
+    path,
+    max_retries=3,
+    chunk_size=DRIVE_DOWNLOAD_CHUNK_BYTES,
+    verify_checksum=True,
+    dict_metadata=None,
+):
+    """
+    Downloads a file from Google Drive by its ID and saves it to the specified path.
+    The file is streamed to a .part file next to the destination in chunks,
+    so memory use stays at one chunk. A failed attempt resumes from the last
+    byte written, and the file is only moved into place once complete and,
+    when Drive has a checksum for it, matching md5Checksum. The revision of
+    the .part file is saved next to it, a .part file of another revision is
+    deleted, and a resumed download that fails the checksum starts over once.
+
+    Args:
+        id (str): The ID of the file to download.
+        path (str): The path where the downloaded file will be saved.
+        max_retries (int, optional): The maximum number of download
+            retries in case of failure. Defaults to 3.
+        chunk_size (int, optional): How many bytes to request at a time.
+            Defaults to DRIVE_DOWNLOAD_CHUNK_BYTES.
+        verify_checksum (bool, optional): Whether to check the md5 of the
+            download against Drive. Defaults to True.
+        dict_metadata (dict, optional): The file's size and md5Checksum when
+            already known, saves a metadata call. Defaults to None.
+
+    Raises:
+        TimeoutError: If the download fails after the maximum number of retries.
+        ValueError: If the downloaded file does not match Drive's checksum.
+
+    Returns:
+        dict: The Drive metadata of the downloaded file.
+    """
+    if dict_metadata is None:
+        dict_metadata = get_drive_file_metadata(id)
+    total_size = int(dict_metadata["size"]) if "size" in dict_metadata else None
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    part_path = f"{path}.part"
+    part_revision_path = f"{part_path}.json"
+    dict_revision = {
+        "md5Checksum": dict_metadata.get("md5Checksum"),
+        "modifiedTime": dict_metadata.get("modifiedTime"),
+    }
+    if os.path.exists(part_path) and read_part_file_revision(
+        part_revision_path
+    ) not in [None, dict_revision]:
+        print_logger(
+            f"Partial download of {id} is from another revision, starting over",
+            level="info",
+        )
+        os.remove(part_path)
+    with open(part_revision_path, "w") as f:
+        json.dump(dict_revision, f)
+
+    is_resumed = os.path.exists(part_path)
+    while True:
+        download_file_range_with_retries(
+            id, part_path, chunk_size, total_size, max_retries
+        )
+
+        if verify_checksum and dict_metadata.get("md5Checksum"):
+            downloaded_md5 = get_file_md5(part_path)
+            if downloaded_md5 != dict_metadata["md5Checksum"]:
+                os.remove(part_path)
+                if is_resumed:
+                    print_logger(
+                        f"Resumed download of {id} does not match its checksum, starting over",
+                        level="warning",
+                    )
+                    is_resumed = False
+                    continue
+                os.remove(part_revision_path)
+                raise ValueError(
+                    f"Checksum mismatch for {id}: got {downloaded_md5}, "
+                    f"expected {dict_metadata['md5Checksum']}"
+                )
+        break
+
+    os.replace(part_path, path)
+    os.remove(part_revision_path)
+    print_logger("Download successful!")
+
+    return dict_metadata
 
 
 def download_and_get_drive_file_path(
-    root_folder_id, ls_file_path, force_download=False, dest_root_dir_override=None
+    root_folder_id,
+    ls_file_path,
+    force_download=False,
+    dest_root_dir_override=None,
+    revalidate=True,
 ):
     """
     Downloads a file from Google Drive and returns the file path.
+    Downloads go through a content addressed cache: the file's contents are
+    stored once per md5 in the cache root and hard linked to every path that
+    uses them, or copied where the file system can't link. The manifest
+    records the Drive file id of each path, so an existing copy is
+    revalidated with one metadata call and only downloaded again when its
+    md5Checksum or modifiedTime changed.
 
     Args:
         root_folder_id (str): The ID of the root folder in Google Drive.
@@ -370,6 +880,8 @@ def download_and_get_drive_file_path(
             file even if it already exists. Defaults to False.
         dest_root_dir_override (str, optional): The destination root
             directory override. Defaults to None.
+        revalidate (bool, optional): Whether to check an existing copy against
+            Drive, when False any existing copy is used. Defaults to True.
 
     Returns:
         str: The file path of the downloaded file.
@@ -377,7 +889,7 @@ def download_and_get_drive_file_path(
     if dest_root_dir_override is not None:
         drive_download_cache_dir_to_use = dest_root_dir_override
     else:
-        drive_download_cache_dir_to_use = os.path.join(data_dir, "drive_download_cache")
+        drive_download_cache_dir_to_use = drive_download_cache_dir
 
     # create folders if they dont exist
     if not os.path.exists(drive_download_cache_dir_to_use):
@@ -390,47 +902,649 @@ def download_and_get_drive_file_path(
         print_logger(f"File already downloaded this run: {dest_file_path}")
         return dest_file_path
 
-    if (not force_download) and (os.path.exists(dest_file_path)):
-        print_logger(
-            f"File already exists and force_download is false: {dest_file_path}"
+    if (not force_download) and (not revalidate) and os.path.exists(dest_file_path):
+        print_logger(f"File already exists and revalidate is false: {dest_file_path}")
+        return dest_file_path
+
+    dict_metadata, parent_id = None, None
+    if not force_download:
+        dict_metadata, parent_id = get_download_cache_path_metadata(
+            drive_download_cache_dir_to_use, dest_file_path, ls_file_path[-1]
         )
+    if dict_metadata is None:
+        parent_id = resolve_drive_folder_path(root_folder_id, ls_file_path[:-1])
+        drive_file_id = get_drive_child_id(parent_id, ls_file_path[-1])
+        if drive_file_id is None:
+            raise ValueError(f"File not found: {ls_file_path[-1]}")
+        dict_metadata = get_drive_file_metadata(drive_file_id)
+
+    if not force_download and use_download_cache_entry(
+        drive_download_cache_dir_to_use, dict_metadata, dest_file_path, parent_id
+    ):
+        print_logger(f"File is current in the download cache: {dest_file_path}")
+        ls_files_downloaded_this_run.append(dest_file_path)
         return dest_file_path
 
+    # download the file from google drive into the cache and link it into place
     print_logger(f"Downloading file: {ls_file_path}")
-    drive_file_id = get_drive_file_id_from_folder_id_path(root_folder_id, ls_file_path)
-
-    # make dest dirs if they dont exist
-    dest_dir = os.path.dirname(dest_file_path)
-    print_logger(f"dest_dir: {dest_dir}")
-    if not os.path.exists(dest_dir):
-        print_logger(f"Making dir: {dest_dir}")
-        os.makedirs(dest_dir)
-
-    # download the file from google drive
-    download_file_by_id(drive_file_id, dest_file_path)
+    blob_path = get_download_cache_blob_path(
+        drive_download_cache_dir_to_use, dict_metadata
+    )
+    download_file_by_id(dict_metadata["id"], blob_path, dict_metadata=dict_metadata)
+    if dict_metadata.get("modifiedTime"):
+        modified_timestamp = pd.Timestamp(dict_metadata["modifiedTime"]).timestamp()
+        os.utime(blob_path, (modified_timestamp, modified_timestamp))
+    add_download_cache_entry(
+        drive_download_cache_dir_to_use, dict_metadata, dest_file_path, parent_id
+    )
     print_logger(f"Downloaded file: {ls_file_path}")
 
+    ls_files_downloaded_this_run.append(dest_file_path)
     return dest_file_path
 
 
 # %%
-# Link Functions #
+# Download Cache #
 
 
-def get_drive_file_link(file_id):
-    if (file_id == "") or (file_id is None):
-        return ""
-    return f"https://drive.google.com/file/d/{file_id}/view?usp=drive_link"
+def get_download_cache_blob_key(dict_metadata):
+    """Files are keyed by content, or by id and revision when Drive has no md5."""
+    if dict_metadata.get("md5Checksum"):
+        return dict_metadata["md5Checksum"]
+    revision_string = f"{dict_metadata['id']}/{dict_metadata.get('modifiedTime')}"
+    return hashlib.md5(revision_string.encode("utf-8")).hexdigest()
 
 
-# %%
-# Rename Functions #
+def get_download_cache_blob_path(cache_root, dict_metadata):
+    return os.path.join(
+        cache_root, ".blobs", get_download_cache_blob_key(dict_metadata)
+    )
 
 
-def rename_file(file_id, new_name):
+def load_download_cache_manifest(cache_root):
+    """
+    Reads the download cache manifest of a cache root.
+
+    Args:
+        cache_root (str): The directory the cache lives in.
+
+    Returns:
+        dict: "files" maps Drive file ids to their md5Checksum, modifiedTime,
+            size and blob, "blobs" maps blob keys to their size, mtime, last
+            access time, the paths using them and the paths that are copies,
+            "paths" maps paths to the Drive file and folder ids they came from.
+    """
+    manifest_path = os.path.join(cache_root, DRIVE_DOWNLOAD_CACHE_MANIFEST_NAME)
+    dict_manifest = {"files": {}, "blobs": {}, "paths": {}}
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, "r") as f:
+                dict_manifest.update(json.load(f))
+        except (OSError, json.JSONDecodeError) as e:
+            print_logger(
+                f"Could not read download cache manifest, starting empty, error: {e}",
+                level="warning",
+            )
+    return dict_manifest
+
+
+def save_download_cache_manifest(cache_root, dict_manifest):
+    """Writes the download cache manifest of a cache root atomically."""
+    manifest_path = os.path.join(cache_root, DRIVE_DOWNLOAD_CACHE_MANIFEST_NAME)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(dict_manifest, f)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def get_download_cache_path_metadata(cache_root, dest_path, file_name):
+    """
+    Gets the current Drive metadata of the file a path was downloaded from,
+    with one get by the file id the manifest recorded for the path.
+
+    Args:
+        cache_root (str): The directory the cache lives in.
+        dest_path (str): The path the file is wanted at.
+        file_name (str): The name the file should still have in Drive.
+
+    Returns:
+        tuple: (dict metadata, parent folder id), (None, None) if the path is
+            not recorded or the file was deleted, trashed, renamed or moved.
+    """
+    with drive_download_cache_lock:
+        dict_path = load_download_cache_manifest(cache_root)["paths"].get(dest_path)
+    if dict_path is None:
+        return None, None
+
+    try:
+        dict_metadata = execute_with_retry(
+            get_drive_service()
+            .files()
+            .get(
+                fileId=dict_path["id"],
+                fields="id, name, mimeType, size, md5Checksum, modifiedTime, parents, trashed",
+                supportsAllDrives=True,
+            ),
+            no_retry_statuses=(404,),
+        )
+    except HttpError as e:
+        if e.resp.status == 404:
+            return None, None
+        raise
+
+    if (
+        dict_metadata.get("trashed", False)
+        or dict_metadata.get("name") != file_name
+        or dict_path["parent_id"] not in dict_metadata.get("parents", [])
+    ):
+        return None, None
+    return dict_metadata, dict_path["parent_id"]
+
+
+def link_download_cache_blob(blob_path, dest_path):
+    """
+    Puts a cached blob at a path as a hard link, so the path takes no extra
+    disk space, or as a copy with the blob's mtime where the file system
+    can't link. A path that already holds the blob is left alone.
+
+    Args:
+        blob_path (str): The path of the blob.
+        dest_path (str): The path the file is wanted at.
+
+    Returns:
+        bool: True if the path is a copy that takes its own disk space.
+    """
+    stat_blob = os.stat(blob_path)
+    is_dest_current = False
+    if os.path.exists(dest_path):
+        stat_dest = os.stat(dest_path)
+        if os.path.samestat(stat_blob, stat_dest):
+            return False
+        is_dest_current = (stat_dest.st_size, stat_dest.st_mtime) == (
+            stat_blob.st_size,
+            stat_blob.st_mtime,
+        )
+
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = dest_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(blob_path, tmp_path)
+    except OSError:
+        if not is_dest_current:
+            shutil.copy2(blob_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+        return True
+    os.replace(tmp_path, dest_path)
+    return False
+
+
+def is_download_cache_blob_valid(blob_path, dict_metadata, dict_blob=None):
+    """
+    Checks a cached blob against the Drive size of the file. Paths are hard
+    links to their blob, so an edit through a path changes the blob's mtime,
+    a blob whose mtime is not the one recorded is checked against the md5.
+
+    Args:
+        blob_path (str): The path of the blob.
+        dict_metadata (dict): The current Drive metadata of the file.
+        dict_blob (dict, optional): The manifest entry of the blob.
+
+    Returns:
+        bool: True if the blob holds the file's current contents.
+    """
+    stat_blob = os.stat(blob_path)
+    if "size" in dict_metadata and stat_blob.st_size != int(dict_metadata["size"]):
+        return False
+    if dict_blob is not None and stat_blob.st_mtime == dict_blob.get("mtime"):
+        return True
+    if dict_metadata.get("md5Checksum"):
+        return get_file_md5(blob_path) == dict_metadata["md5Checksum"]
+    return False
+
+
+def use_download_cache_entry(cache_root, dict_metadata, dest_path, parent_id=None):
+    """
+    Serves a Drive file from the download cache if the cache holds its
+    current revision, linking it to dest_path when needed. A blob that does
+    not match the file anymore is dropped, and a copy at dest_path from before
+    the cache existed is adopted if it matches.
+
+    Args:
+        cache_root (str): The directory the cache lives in.
+        dict_metadata (dict): The current Drive metadata of the file.
+        dest_path (str): The path the file is wanted at.
+        parent_id (str, optional): The ID of the Drive folder of the file.
+
+    Returns:
+        bool: True if dest_path now holds the current revision of the file.
+    """
+    blob_key = get_download_cache_blob_key(dict_metadata)
+    blob_path = get_download_cache_blob_path(cache_root, dict_metadata)
+    with drive_download_cache_lock:
+        dict_blob = load_download_cache_manifest(cache_root)["blobs"].get(blob_key)
+
+    if os.path.exists(blob_path) and not is_download_cache_blob_valid(
+        blob_path, dict_metadata, dict_blob
+    ):
+        print_logger(
+            f"Cached blob {blob_path} does not match {dict_metadata['id']}, dropping it",
+            level="warning",
+        )
+        os.remove(blob_path)
+
+    if not os.path.exists(blob_path):
+        if not is_local_copy_current(dest_path, dict_metadata):
+            return False
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        if os.path.exists(blob_path + ".tmp"):
+            os.remove(blob_path + ".tmp")
+        try:
+            os.link(dest_path, blob_path + ".tmp")
+        except OSError:
+            shutil.copy2(dest_path, blob_path + ".tmp")
+        os.replace(blob_path + ".tmp", blob_path)
+
+    add_download_cache_entry(cache_root, dict_metadata, dest_path, parent_id)
+    return True
+
+
+def get_download_cache_blob_bytes(dict_blob):
+    """Returns the disk space a blob takes with the paths that are copies of it."""
+    return dict_blob["size"] * (1 + len(dict_blob.get("copied_paths", [])))
+
+
+def add_download_cache_entry(cache_root, dict_metadata, dest_path, parent_id=None):
+    """
+    Links a cached blob to dest_path, records it in the manifest and evicts
+    the least recently used blobs if the cache is over its size budget.
+
+    Args:
+        cache_root (str): The directory the cache lives in.
+        dict_metadata (dict): The Drive metadata of the file in the blob.
+        dest_path (str): The path the file is wanted at.
+        parent_id (str, optional): The ID of the Drive folder of the file,
+            recorded with the path so it can be revalidated by file id.
+    """
+    blob_key = get_download_cache_blob_key(dict_metadata)
+    blob_path = get_download_cache_blob_path(cache_root, dict_metadata)
+
+    with drive_download_cache_lock:
+        is_copy = link_download_cache_blob(blob_path, dest_path)
+
+        dict_manifest = load_download_cache_manifest(cache_root)
+        dict_manifest["files"][dict_metadata["id"]] = {
+            "md5Checksum": dict_metadata.get("md5Checksum"),
+            "modifiedTime": dict_metadata.get("modifiedTime"),
+            "size": os.path.getsize(blob_path),
+            "blob": blob_key,
+        }
+        if parent_id is not None:
+            dict_manifest["paths"][dest_path] = {
+                "id": dict_metadata["id"],
+                "parent_id": parent_id,
+            }
+
+        # a path holds one blob at a time
+        for other_key, dict_blob in dict_manifest["blobs"].items():
+            if other_key != blob_key and dest_path in dict_blob["paths"]:
+                dict_blob["paths"].remove(dest_path)
+                if dest_path in dict_blob.get("copied_paths", []):
+                    dict_blob["copied_paths"].remove(dest_path)
+
+        dict_blob = dict_manifest["blobs"].setdefault(
+            blob_key, {"size": os.path.getsize(blob_path), "paths": []}
+        )
+        dict_blob["mtime"] = os.path.getmtime(blob_path)
+        dict_blob["last_access"] = time.time()
+        if dest_path not in dict_blob["paths"]:
+            dict_blob["paths"].append(dest_path)
+        ls_copied_paths = dict_blob.setdefault("copied_paths", [])
+        if is_copy and dest_path not in ls_copied_paths:
+            ls_copied_paths.append(dest_path)
+        elif not is_copy and dest_path in ls_copied_paths:
+            ls_copied_paths.remove(dest_path)
+
+        evict_download_cache(cache_root, dict_manifest, keep_blob_key=blob_key)
+        save_download_cache_manifest(cache_root, dict_manifest)
+
+
+def evict_download_cache(
+    cache_root,
+    dict_manifest,
+    max_bytes=None,
+    keep_blob_key=None,
+):
+    """
+    Deletes the least recently used blobs until the cache fits in max_bytes.
+    The budget counts every byte the cache wrote, the blobs and the paths
+    that had to be copied because the file system can't hard link them.
+    Blobs no path uses anymore go first. Only blobs inside the cache root are
+    deleted, the paths that used them keep their contents and are no longer
+    counted.
+
+    Args:
+        cache_root (str): The directory the cache lives in.
+        dict_manifest (dict): The manifest to evict from, updated in place.
+        max_bytes (int, optional): The size budget, defaults to
+            DRIVE_DOWNLOAD_CACHE_MAX_BYTES.
+        keep_blob_key (str, optional): A blob that must not be evicted.
+
+    Returns:
+        int: The number of bytes taken out of the budget.
+    """
+    if max_bytes is None:
+        max_bytes = DRIVE_DOWNLOAD_CACHE_MAX_BYTES
+
+    dict_blobs = dict_manifest["blobs"]
+    total_bytes = sum(
+        get_download_cache_blob_bytes(dict_blob) for dict_blob in dict_blobs.values()
+    )
+    evicted_bytes = 0
+
+    ls_blob_keys = sorted(
+        dict_blobs.keys(),
+        key=lambda key: (
+            len(dict_blobs[key]["paths"]) > 0,
+            dict_blobs[key]["last_access"],
+        ),
+    )
+    for blob_key in ls_blob_keys:
+        if total_bytes - evicted_bytes <= max_bytes and dict_blobs[blob_key]["paths"]:
+            break
+        if blob_key == keep_blob_key:
+            continue
+
+        dict_blob = dict_blobs.pop(blob_key)
+        blob_path = os.path.join(cache_root, ".blobs", blob_key)
+        if os.path.exists(blob_path):
+            os.remove(blob_path)
+        dict_manifest["files"] = {
+            file_id: dict_file
+            for file_id, dict_file in dict_manifest["files"].items()
+            if dict_file["blob"] != blob_key
+        }
+        evicted_bytes += get_download_cache_blob_bytes(dict_blob)
+
+    if evicted_bytes:
+        print_logger(
+            f"Evicted {evicted_bytes / 1e6:.1f} MB from the download cache in {cache_root}"
+        )
+    return evicted_bytes
+
+
+# %%
+# Bulk Download Functions #
+
+
+def is_local_copy_current(path, dict_file):
+    """
+    Checks if a local file already matches a Drive file, by size and
+    modifiedTime first and by md5 only if the timestamps differ.
+
+    Args:
+        path (str): The path of the local copy.
+        dict_file (dict): The Drive metadata with size, md5Checksum and modifiedTime.
+
+    Returns:
+        bool: True if the local copy does not need to be downloaded again.
+    """
+    if not os.path.exists(path):
+        return False
+    if "size" in dict_file and os.path.getsize(path) != int(dict_file["size"]):
+        return False
+    if dict_file.get("modifiedTime") and os.path.getmtime(path) == (
+        pd.Timestamp(dict_file["modifiedTime"]).timestamp()
+    ):
+        return True
+    if dict_file.get("md5Checksum"):
+        return get_file_md5(path) == dict_file["md5Checksum"]
+    return False
+
+
+def download_drive_file_if_changed(dict_file, path, chunk_size):
+    """
+    Downloads one Drive file unless the local copy is current, and stamps the
+    local copy with Drive's modifiedTime so later checks can skip hashing.
+
+    Args:
+        dict_file (dict): The Drive metadata of the file.
+        path (str): The path to save the file to.
+        chunk_size (int): How many bytes to request at a time.
+
+    Returns:
+        dict: The id, path, status, bytes and seconds of the download.
+    """
+    start_time = time.time()
+    if is_local_copy_current(path, dict_file):
+        status = "skipped"
+    else:
+        download_file_by_id(
+            dict_file["id"], path, chunk_size=chunk_size, dict_metadata=dict_file
+        )
+        status = "downloaded"
+
+    if dict_file.get("modifiedTime"):
+        modified_timestamp = pd.Timestamp(dict_file["modifiedTime"]).timestamp()
+        os.utime(path, (modified_timestamp, modified_timestamp))
+
+    return {
+        "id": dict_file["id"],
+        "path": path,
+        "status": status,
+        "bytes": os.path.getsize(path) if status == "downloaded" else 0,
+        "seconds": time.time() - start_time,
+    }
+
+
+def clean_drive_path_part(name):
+    """Makes a Drive name safe to use as one local path part."""
+    name = (
+        name.replace("/", " ").replace("\\", " ").replace(":", "").replace("\0", "")
+    ).strip()
+    if name in ["", ".", ".."]:
+        return "_"
+    return name
+
+
+def get_download_path(dest_dir, ls_path):
+    """
+    Joins a file's path parts below dest_dir.
+
+    Args:
+        dest_dir (str): The local directory to download into.
+        ls_path (list): The cleaned path parts of the file below dest_dir.
+
+    Returns:
+        str: The local path of the file.
+
+    Raises:
+        ValueError: If the path resolves to somewhere outside dest_dir.
+    """
+    path = os.path.join(dest_dir, *ls_path)
+    real_dest_dir = os.path.realpath(dest_dir)
+    if os.path.commonpath([real_dest_dir, os.path.realpath(path)]) != real_dest_dir:
+        raise ValueError(f"Download path {path} is outside {dest_dir}")
+    return path
+
+
+def download_drive_file_to_dir(dict_file, dest_dir, chunk_size):
+    """Runs download_drive_file_if_changed for a file's path below dest_dir."""
+    return download_drive_file_if_changed(
+        dict_file, get_download_path(dest_dir, dict_file["ls_path"]), chunk_size
+    )
+
+
+def get_unique_download_paths(ls_files):
+    """
+    Cleans the Drive names in each file's path so they can't leave the
+    download directory. Drive allows several files with the same name in one
+    folder, so when files map to the same local path the file id is added to
+    each of their names, keeping concurrent downloads from writing over each
+    other.
+
+    Args:
+        ls_files (list): Drive metadata dicts with id and ls_path.
+
+    Returns:
+        list: Copies of the dicts with an ls_path that is unique per file.
+    """
+    ls_files = [
+        {
+            **dict_file,
+            "ls_path": [clean_drive_path_part(part) for part in dict_file["ls_path"]],
+        }
+        for dict_file in ls_files
+    ]
+    dict_path_counts = Counter(tuple(dict_file["ls_path"]) for dict_file in ls_files)
+    ls_unique_files = []
+    for dict_file in ls_files:
+        ls_path = dict_file["ls_path"]
+        if dict_path_counts[tuple(ls_path)] > 1:
+            stem, extension = os.path.splitext(ls_path[-1])
+            ls_path = ls_path[:-1] + [f"{stem}_{dict_file['id']}{extension}"]
+        ls_unique_files.append({**dict_file, "ls_path": ls_path})
+    return ls_unique_files
+
+
+def download_drive_files(
+    ls_files, dest_dir, workers=4, chunk_size=DRIVE_DOWNLOAD_CHUNK_BYTES
+):
+    """
+    Downloads Drive files concurrently, skipping those whose local copy is current.
+    Each worker thread uses its own Drive client built on the shared credentials.
+    Names are cleaned so every file stays below dest_dir, and files that share
+    a path get their id added to their name.
+
+    Args:
+        ls_files (list): Drive metadata dicts with id, size, md5Checksum,
+            modifiedTime and ls_path, the path of the file below dest_dir.
+        dest_dir (str): The local directory to download into.
+        workers (int, optional): The max number of concurrent downloads.
+        chunk_size (int, optional): How many bytes to request at a time.
+
+    Returns:
+        pd.DataFrame: One row per file with id, path, status, bytes, seconds and error.
+    """
+    start_time = time.time()
+    ls_results = []
+    ls_files = get_unique_download_paths(ls_files)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        dict_futures = {
+            executor.submit(
+                download_drive_file_to_dir, dict_file, dest_dir, chunk_size
+            ): dict_file
+            for dict_file in ls_files
+        }
+        for future in as_completed(dict_futures):
+            dict_file = dict_futures[future]
+            try:
+                dict_result = future.result()
+                dict_result["error"] = None
+            except Exception as e:
+                print_logger(
+                    f"Failed to download {dict_file['id']}: {e}", level="warning"
+                )
+                dict_result = {
+                    "id": dict_file["id"],
+                    "path": os.path.join(dest_dir, *dict_file["ls_path"]),
+                    "status": "failed",
+                    "bytes": 0,
+                    "seconds": None,
+                    "error": str(e),
+                }
+            ls_results.append(dict_result)
+
+    df_results = pd.DataFrame(
+        ls_results, columns=["id", "path", "status", "bytes", "seconds", "error"]
+    )
+
+    elapsed_seconds = time.time() - start_time
+    total_mb = df_results["bytes"].sum() / 1e6
+    print_logger(
+        f"Downloaded {(df_results['status'] == 'downloaded').sum()}, "
+        f"skipped {(df_results['status'] == 'skipped').sum()}, "
+        f"failed {(df_results['status'] == 'failed').sum()} files, "
+        f"{total_mb:.1f} MB in {elapsed_seconds:.1f}s "
+        f"({total_mb / max(elapsed_seconds, 1e-9):.1f} MB/s)"
+    )
+
+    return df_results
+
+
+def download_folder(
+    folder_id,
+    dest,
+    pattern=None,
+    workers=4,
+    chunk_size=DRIVE_DOWNLOAD_CHUNK_BYTES,
+):
+    """
+    Downloads every file below a Drive folder, keeping the folder structure.
+    The tree is listed once, then files are downloaded concurrently and
+    files whose local copy matches Drive are skipped.
+
+    Args:
+        folder_id (str): The ID of the Drive folder.
+        dest (str): The local directory to download into.
+        pattern (str, optional): A glob like "*.csv", matched against the file
+            name and its path relative to the folder. Defaults to every file.
+        workers (int, optional): The max number of concurrent downloads.
+        chunk_size (int, optional): How many bytes to request at a time.
+
+    Returns:
+        pd.DataFrame: One row per file with id, path, status, bytes, seconds and error.
+    """
+    ls_items = crawl_drive_folder_tree(
+        folder_id,
+        fields="id, name, mimeType, parents, size, md5Checksum, modifiedTime",
+    )
+
+    ls_files = []
+    num_google_files = 0
+    for dict_item in ls_items:
+        if dict_item["mimeType"] == FOLDER_MIME_TYPE:
+            continue
+        if dict_item["mimeType"].startswith("application/vnd.google-apps."):
+            # Docs, Sheets and Slides have no binary content to download
+            num_google_files += 1
+            continue
+        if pattern is not None and not (
+            fnmatch.fnmatch(dict_item["name"], pattern)
+            or fnmatch.fnmatch("/".join(dict_item["ls_path"]), pattern)
+        ):
+            continue
+        ls_files.append(dict_item)
+
+    print_logger(
+        f"Found {len(ls_files)} files to sync from {folder_id} to {dest}, "
+        f"ignoring {num_google_files} Google Docs files",
+        level="info",
+    )
+
+    return download_drive_files(ls_files, dest, workers=workers, chunk_size=chunk_size)
+
+
+# %%
+# Link Functions #
+
+
+def get_drive_file_link(file_id):
+    if (file_id == "") or (file_id is None):
+        return ""
+    return f"https://drive.google.com/file/d/{file_id}/view?usp=drive_link"
+
+
+# %%
+# Rename Functions #
+
+
+def rename_file(file_id, new_name):
     execute_with_retry(
-        drive_service.files().update(fileId=file_id, body={"name": new_name})
+        get_drive_service().files().update(fileId=file_id, body={"name": new_name})
     )
+    invalidate_drive_path_cache(item_id=file_id)
 
 
 # %%
@@ -451,7 +1565,7 @@ def get_file_name(file_id):
 
     # Retrieve file metadata including the name
     file_metadata = execute_with_retry(
-        drive_service.files().get(fileId=file_id, fields="name")
+        get_drive_service().files().get(fileId=file_id, fields="name")
     )
 
     file_name = file_metadata.get("name", "Unknown")
@@ -473,7 +1587,7 @@ def get_parents_of_item(file_id):
 
     # Retrieve the file metadata
     file_metadata = execute_with_retry(
-        drive_service.files().get(fileId=file_id, fields="parents")
+        get_drive_service().files().get(fileId=file_id, fields="parents")
     )
 
     # Get the parent folder IDs
@@ -495,7 +1609,9 @@ def check_file_capabilities(file_id):
     """
 
     file_metadata = execute_with_retry(
-        drive_service.files().get(
+        get_drive_service()
+        .files()
+        .get(
             fileId=file_id,
             fields="capabilities, viewersCanCopyContent, copyRequiresWriterPermission",
         )
@@ -518,9 +1634,9 @@ def get_file_owner_info(file_id):
 
     # Use the files().get() method to retrieve the owner information
     file_metadata = execute_with_retry(
-        drive_service.files().get(
-            fileId=file_id, fields="owners"
-        )  # This limits the response to owner info
+        get_drive_service()
+        .files()
+        .get(fileId=file_id, fields="owners")  # This limits the response to owner info
     )
 
     # Get the owner's information
@@ -547,7 +1663,9 @@ def list_permissions(file_id):
     Returns:
         list: A list of permission objects.
     """
-    permissions = execute_with_retry(drive_service.permissions().list(fileId=file_id))
+    permissions = execute_with_retry(
+        get_drive_service().permissions().list(fileId=file_id)
+    )
     file_permissions = permissions.get("permissions", [])
 
     pprint_dict(file_permissions)
@@ -577,7 +1695,9 @@ def share_folder_with_email(folder_id, email_address, role="reader"):
 
     # Add the new permission without altering existing permissions
     return execute_with_retry(
-        drive_service.permissions().create(
+        get_drive_service()
+        .permissions()
+        .create(
             fileId=folder_id,  # Treat folder like a file in Google Drive
             body=permission,
             fields="id",
@@ -585,6 +1705,292 @@ def share_folder_with_email(folder_id, email_address, role="reader"):
     )
 
 
+# %%
+# Batch Functions #
+
+# the most calls Drive accepts in one batch HTTP request
+DRIVE_BATCH_MAX_REQUESTS = 100
+
+
+def is_retryable_http_error(error):
+    """Checks if a failed request is worth retrying, rate limits and server errors."""
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status in [429, 500, 502, 503, 504]:
+        return True
+    return error.resp.status == 403 and (
+        b"rateLimitExceeded" in error.content
+        or b"userRateLimitExceeded" in error.content
+    )
+
+
+def execute_drive_batch(ls_keys, build_request, max_retries=5):
+    """
+    Sends one Drive call per key through batch HTTP requests of up to
+    DRIVE_BATCH_MAX_REQUESTS calls each. Only the calls that failed with a
+    rate limit or server error are sent again, with exponential backoff.
+
+    Args:
+        ls_keys (list): The unique keys to make a call for, like file ids.
+        build_request (callable): Builds the API request of a key from the
+            thread's Drive service, called as build_request(drive_service, key).
+        max_retries (int, optional): The max number of times a call is retried.
+
+    Returns:
+        dict: Each key mapped to {"result": response or None, "error": exception or None}.
+    """
+    dict_results = {}
+    ls_pending_keys = list(dict.fromkeys(ls_keys))
+
+    for attempt in range(max_retries + 1):
+        ls_retry_keys = []
+
+        def callback(request_id, response, exception):
+            key = ls_pending_keys[int(request_id)]
+            if exception is not None and is_retryable_http_error(exception):
+                ls_retry_keys.append(key)
+            dict_results[key] = {"result": response, "error": exception}
+
+        for i in range(0, len(ls_pending_keys), DRIVE_BATCH_MAX_REQUESTS):
+            ls_batch_keys = ls_pending_keys[i : i + DRIVE_BATCH_MAX_REQUESTS]
+            drive_service = get_drive_service()
+            batch = drive_service.new_batch_http_request(callback=callback)
+            for request_id, key in enumerate(ls_batch_keys, start=i):
+                batch.add(build_request(drive_service, key), request_id=str(request_id))
+            execute_with_retry(batch)
+
+        if not ls_retry_keys or attempt == max_retries:
+            break
+
+        delay = 2**attempt
+        print_logger(
+            f"{len(ls_retry_keys)} batched Drive calls were rate limited or failed, "
+            f"retrying them in {delay} seconds..."
+        )
+        time.sleep(delay)
+        ls_pending_keys = ls_retry_keys
+
+    num_errors = sum(
+        dict_result["error"] is not None for dict_result in dict_results.values()
+    )
+    if num_errors:
+        print_logger(
+            f"{num_errors} of {len(dict_results)} batched Drive calls failed",
+            level="warning",
+        )
+    return dict_results
+
+
+def get_batch_results_df(dict_results, get_rows, ls_columns):
+    """
+    Flattens batch results into a DataFrame, with an error row for failed calls.
+
+    Args:
+        dict_results (dict): The output of execute_drive_batch, keyed by file id.
+        get_rows (callable): Turns one response into a list of row dicts.
+        ls_columns (list): The columns the rows have, besides file_id and error.
+
+    Returns:
+        pd.DataFrame: The rows of every call with file_id and error columns.
+    """
+    ls_rows = []
+    for file_id, dict_result in dict_results.items():
+        if dict_result["error"] is not None:
+            ls_rows.append({"file_id": file_id, "error": str(dict_result["error"])})
+            continue
+        for dict_row in get_rows(dict_result["result"]):
+            ls_rows.append({"file_id": file_id, **dict_row, "error": None})
+    return pd.DataFrame(ls_rows, columns=["file_id"] + ls_columns + ["error"])
+
+
+def list_permissions_bulk(ls_file_ids):
+    """
+    Lists the permissions of many files or folders with batched requests.
+
+    Args:
+        ls_file_ids (list): The IDs of the files or folders.
+
+    Returns:
+        pd.DataFrame: One row per permission with file_id, permission_id,
+            type, role, email_address and error.
+    """
+    dict_results = execute_drive_batch(
+        ls_file_ids,
+        lambda drive_service, file_id: drive_service.permissions().list(
+            fileId=file_id, fields="permissions(id, type, role, emailAddress)"
+        ),
+    )
+    return get_batch_results_df(
+        dict_results,
+        lambda response: [
+            {
+                "permission_id": permission.get("id"),
+                "type": permission.get("type"),
+                "role": permission.get("role"),
+                "email_address": permission.get("emailAddress"),
+            }
+            for permission in response.get("permissions", [])
+        ],
+        ["permission_id", "type", "role", "email_address"],
+    )
+
+
+def get_file_owner_info_bulk(ls_file_ids):
+    """
+    Retrieves the owners of many files or folders with batched requests.
+
+    Args:
+        ls_file_ids (list): The IDs of the files or folders.
+
+    Returns:
+        pd.DataFrame: One row per owner with file_id, email, display_name and error.
+    """
+    dict_results = execute_drive_batch(
+        ls_file_ids,
+        lambda drive_service, file_id: drive_service.files().get(
+            fileId=file_id, fields="owners"
+        ),
+    )
+    return get_batch_results_df(
+        dict_results,
+        lambda response: [
+            {
+                "email": owner.get("emailAddress"),
+                "display_name": owner.get("displayName"),
+            }
+            for owner in response.get("owners", [])
+        ],
+        ["email", "display_name"],
+    )
+
+
+def check_file_capabilities_bulk(ls_file_ids):
+    """
+    Checks the capabilities and restrictions of many files or folders with
+    batched requests.
+
+    Args:
+        ls_file_ids (list): The IDs of the files or folders.
+
+    Returns:
+        pd.DataFrame: One row per file with viewersCanCopyContent,
+            copyRequiresWriterPermission, one capabilities.<name> column per
+            capability, and error.
+    """
+    dict_results = execute_drive_batch(
+        ls_file_ids,
+        lambda drive_service, file_id: drive_service.files().get(
+            fileId=file_id,
+            fields="capabilities, viewersCanCopyContent, copyRequiresWriterPermission",
+        ),
+    )
+    df_capabilities = get_batch_results_df(
+        dict_results, lambda response: [{"metadata": response}], ["metadata"]
+    )
+    df_metadata = pd.json_normalize(
+        df_capabilities["metadata"].map(lambda metadata: metadata or {}).tolist()
+    )
+    df_metadata.index = df_capabilities.index
+    return pd.concat(
+        [df_capabilities[["file_id"]], df_metadata, df_capabilities[["error"]]],
+        axis=1,
+    )
+
+
+def get_parents_of_items_bulk(ls_file_ids):
+    """
+    Retrieves the parent folders of many files or folders with batched requests.
+
+    Args:
+        ls_file_ids (list): The IDs of the files or folders.
+
+    Returns:
+        pd.DataFrame: One row per parent with file_id, parent_id and error.
+    """
+    dict_results = execute_drive_batch(
+        ls_file_ids,
+        lambda drive_service, file_id: drive_service.files().get(
+            fileId=file_id, fields="parents"
+        ),
+    )
+    return get_batch_results_df(
+        dict_results,
+        lambda response: [
+            {"parent_id": parent_id} for parent_id in response.get("parents", [])
+        ],
+        ["parent_id"],
+    )
+
+
+def rename_files_bulk(dict_new_names):
+    """
+    Renames many files or folders with batched requests.
+
+    Args:
+        dict_new_names (dict): File IDs mapped to their new names.
+
+    Returns:
+        pd.DataFrame: One row per file with file_id, name and error.
+    """
+    dict_results = execute_drive_batch(
+        list(dict_new_names.keys()),
+        lambda drive_service, file_id: drive_service.files().update(
+            fileId=file_id, body={"name": dict_new_names[file_id]}, fields="name"
+        ),
+    )
+    invalidate_drive_path_cache(item_id=list(dict_results.keys()))
+    return get_batch_results_df(
+        dict_results, lambda response: [{"name": response.get("name")}], ["name"]
+    )
+
+
+def delete_files_bulk(ls_file_ids):
+    """
+    Deletes many files or folders with batched requests.
+
+    Args:
+        ls_file_ids (list): The IDs of the files or folders.
+
+    Returns:
+        pd.DataFrame: One row per file with file_id, deleted and error.
+    """
+    dict_results = execute_drive_batch(
+        ls_file_ids,
+        lambda drive_service, file_id: drive_service.files().delete(fileId=file_id),
+    )
+    invalidate_drive_path_cache(item_id=list(dict_results.keys()))
+    return get_batch_results_df(
+        dict_results, lambda response: [{"deleted": True}], ["deleted"]
+    )
+
+
+def share_with_email_bulk(ls_file_ids, email_address, role="reader"):
+    """
+    Shares many files or folders with an email address with batched requests,
+    without removing existing permissions.
+
+    Args:
+        ls_file_ids (list): The IDs of the files or folders.
+        email_address (str): The email address to share with.
+        role (str): The role to grant, "reader", "writer" or "commenter".
+
+    Returns:
+        pd.DataFrame: One row per file with file_id, permission_id and error.
+    """
+    permission = {"type": "user", "role": role, "emailAddress": email_address}
+    dict_results = execute_drive_batch(
+        ls_file_ids,
+        lambda drive_service, file_id: drive_service.permissions().create(
+            fileId=file_id, body=permission, fields="id"
+        ),
+    )
+    return get_batch_results_df(
+        dict_results,
+        lambda response: [{"permission_id": response.get("id")}],
+        ["permission_id"],
+    )
+
+
 # %%
 # Upload Functions #
 
@@ -616,19 +2022,227 @@ def create_folder_in_drive(drive_service, parent_id, folder_name):
     return parent_id
 
 
-def upload_file_to_drive(initial_folder_id, file_path, ls_folder_path=[]):
+def execute_resumable_upload(
+    request, upload_name, total_bytes, progress_callback=None, max_retries=5
+):
     """
-    Uploads a file to Google Drive within the specified folder path.
+    Sends a resumable upload chunk by chunk. A failed chunk is retried with
+    exponential backoff and the upload resumes from the last chunk Drive
+    acknowledged instead of starting over.
+
+    Args:
+        request: The create or update request with a resumable media body.
+        upload_name (str): The file path or name being uploaded, passed to the callback.
+        total_bytes (int): The size of the upload.
+        progress_callback (callable, optional): Called as
+            progress_callback(upload_name, bytes_uploaded, total_bytes) after each chunk.
+        max_retries (int, optional): The max number of retries of a single chunk.
+
+    Returns:
+        dict: The response of the finished upload.
+    """
+    response = None
+    retries = 0
+    while response is None:
+        try:
+            status, response = request.next_chunk()
+        except (HttpError, TimeoutError, ConnectionError) as e:
+            if (
+                isinstance(e, HttpError)
+                and e.resp.status < 500
+                and e.resp.status != 429
+            ):
+                raise
+            retries += 1
+            if retries > max_retries:
+                print_logger(
+                    f"Max retries ({max_retries}) reached uploading {upload_name}"
+                )
+                raise
+            delay = 2**retries
+            print_logger(
+                f"Upload chunk of {upload_name} failed (attempt {retries}/{max_retries}): {e}. "
+                f"Resuming in {delay} seconds..."
+            )
+            time.sleep(delay)
+            continue
+
+        retries = 0
+        if status is not None and progress_callback is not None:
+            progress_callback(upload_name, status.resumable_progress, total_bytes)
+
+    if progress_callback is not None:
+        progress_callback(upload_name, total_bytes, total_bytes)
+    return response
+
+
+def upload_stream_to_folder_id(
+    parent_id,
+    stream,
+    file_name,
+    mimetype="application/octet-stream",
+    skip_if_unchanged=True,
+    progress_callback=None,
+    use_cache=True,
+    chunk_size=DRIVE_UPLOAD_CHUNK_BYTES,
+    upload_name=None,
+):
+    """
+    Uploads the contents of a binary stream into a Drive folder with a
+    resumable chunked upload, replacing the contents of a file of the same
+    name if there is one. A trashed file of the same name counts as missing,
+    get_drive_child_id never returns one.
+
+    Args:
+        parent_id (str): The ID of the folder to upload into.
+        stream (io.IOBase): A seekable binary stream with the contents.
+        file_name (str): The name of the file in Drive.
+        mimetype (str, optional): The mime type of the contents.
+        skip_if_unchanged (bool, optional): Whether to skip the transfer when
+            the existing file's md5Checksum matches the contents.
+        progress_callback (callable, optional): Called as
+            progress_callback(upload_name, bytes_uploaded, total_bytes).
+        use_cache (bool, optional): Whether to read from the path cache.
+        chunk_size (int, optional): How many bytes to send per request.
+        upload_name (str, optional): The name used in logs and progress
+            callbacks, defaults to file_name.
+
+    Returns:
+        dict: The "id" of the Drive file and the "status", one of
+            "uploaded", "replaced" or "unchanged".
+    """
+    upload_name = upload_name or file_name
+    total_bytes = stream.seek(0, os.SEEK_END)
+    stream.seek(0)
+
+    # Check if a file with the same name exists in the folder
+    existing_file_id = get_drive_child_id(
+        parent_id, file_name, is_folder=False, use_cache=use_cache
+    )
+
+    # the lookup only returns files that are not trashed, a cached id is
+    # checked for that once per process
+    if existing_file_id is not None and skip_if_unchanged:
+        dict_existing = get_drive_file_metadata(
+            existing_file_id, fields="id, md5Checksum"
+        )
+        if dict_existing.get("md5Checksum") == get_stream_md5(stream):
+            print_logger(
+                f"File unchanged, skipping upload of {upload_name} to ID: {existing_file_id}"
+            )
+            return {"id": existing_file_id, "status": "unchanged"}
+
+    media = MediaIoBaseUpload(
+        stream,
+        mimetype=mimetype,
+        chunksize=chunk_size,
+        resumable=True,
+    )
+
+    if existing_file_id is not None:
+        # replace contents of existing file
+        execute_resumable_upload(
+            get_drive_service()
+            .files()
+            .update(fileId=existing_file_id, media_body=media, fields="id"),
+            upload_name,
+            total_bytes,
+            progress_callback=progress_callback,
+        )
+        print_logger(f"Replaced existing file with ID: {existing_file_id}")
+        return {"id": existing_file_id, "status": "replaced"}
+
+    # Upload the new file to Google Drive within the specified folder
+    file_metadata = {"name": file_name, "parents": [parent_id]}
+    uploaded_file = execute_resumable_upload(
+        get_drive_service()
+        .files()
+        .create(body=file_metadata, media_body=media, fields="id"),
+        upload_name,
+        total_bytes,
+        progress_callback=progress_callback,
+    )
+    file_id = uploaded_file["id"]
+    set_cached_drive_id(parent_id, file_name, False, file_id)
+
+    print_logger(f"File uploaded with ID: {file_id}")
+    return {"id": file_id, "status": "uploaded"}
+
+
+def upload_file_to_folder_id(
+    parent_id,
+    file_path,
+    skip_if_unchanged=True,
+    progress_callback=None,
+    use_cache=True,
+    chunk_size=DRIVE_UPLOAD_CHUNK_BYTES,
+):
+    """
+    Uploads a file into a Drive folder with a resumable chunked upload,
+    replacing the contents of a file of the same name if there is one.
+
+    Args:
+        parent_id (str): The ID of the folder to upload into.
+        file_path (str): The path of the file to be uploaded.
+        skip_if_unchanged (bool, optional): Whether to skip the transfer when
+            the existing file's md5Checksum matches the local file.
+        progress_callback (callable, optional): Called as
+            progress_callback(file_path, bytes_uploaded, total_bytes).
+        use_cache (bool, optional): Whether to read from the path cache.
+        chunk_size (int, optional): How many bytes to send per request.
+
+    Returns:
+        dict: The "id" of the Drive file and the "status", one of
+            "uploaded", "replaced" or "unchanged".
+    """
+    with open(file_path, "rb") as f:
+        return upload_stream_to_folder_id(
+            parent_id,
+            f,
+            os.path.basename(file_path),
+            skip_if_unchanged=skip_if_unchanged,
+            progress_callback=progress_callback,
+            use_cache=use_cache,
+            chunk_size=chunk_size,
+            upload_name=file_path,
+        )
+
+
+def upload_stream_to_drive(
+    initial_folder_id,
+    stream,
+    file_name,
+    ls_folder_path=[],
+    mimetype="application/octet-stream",
+    use_cache=True,
+    skip_if_unchanged=True,
+    progress_callback=None,
+    upload_name=None,
+):
+    """
+    Uploads the contents of a binary stream to Google Drive within the
+    specified folder path, creating missing folders.
+    Folder and file ids along the path come from the path cache when possible,
+    a stale cached id is dropped and the upload retried with fresh lookups.
 
     Args:
         initial_folder_id (str): The ID of the initial folder
             where the file will be uploaded.
-        file_path (str): The path of the file to be uploaded.
+        stream (io.IOBase): A seekable binary stream with the contents.
+        file_name (str): The name of the file in Drive.
         ls_folder_path (list, optional): The list of folder names
             representing the folder path. Defaults to [].
+        mimetype (str, optional): The mime type of the contents.
+        use_cache (bool, optional): Whether to read from the path cache.
+        skip_if_unchanged (bool, optional): Whether to skip the transfer when
+            the existing file's md5Checksum matches. Defaults to True.
+        progress_callback (callable, optional): Called as
+            progress_callback(upload_name, bytes_uploaded, total_bytes).
+        upload_name (str, optional): The name used in logs and progress
+            callbacks, defaults to file_name.
 
     Returns:
-        None
+        str: The ID of the uploaded file.
     """
 
     # raise if initial_folder_id is None
@@ -637,84 +2251,221 @@ def upload_file_to_drive(initial_folder_id, file_path, ls_folder_path=[]):
             "initial_folder_id is None, please keep files in a folder so they can be shared correctly"
         )
 
-    # Start with the root folder ID
-    parent_id = initial_folder_id
+    try:
+        parent_id = resolve_drive_folder_path(
+            initial_folder_id, ls_folder_path, create=True, use_cache=use_cache
+        )
+        dict_upload = upload_stream_to_folder_id(
+            parent_id,
+            stream,
+            file_name,
+            mimetype=mimetype,
+            skip_if_unchanged=skip_if_unchanged,
+            progress_callback=progress_callback,
+            use_cache=use_cache,
+            upload_name=upload_name,
+        )
+    except HttpError as e:
+        if not use_cache or e.resp.status != 404:
+            raise
+        print_logger(
+            f"Cached drive path for {upload_name or file_name} is stale, retrying without cache",
+            level="warning",
+        )
+        invalidate_drive_path_cache(parent_id=initial_folder_id)
+        return upload_stream_to_drive(
+            initial_folder_id,
+            stream,
+            file_name,
+            ls_folder_path,
+            mimetype=mimetype,
+            use_cache=False,
+            skip_if_unchanged=skip_if_unchanged,
+            progress_callback=progress_callback,
+            upload_name=upload_name,
+        )
+
+    return dict_upload["id"]
+
+
+def upload_file_to_drive(
+    initial_folder_id,
+    file_path,
+    ls_folder_path=[],
+    use_cache=True,
+    skip_if_unchanged=True,
+    progress_callback=None,
+):
+    """
+    Uploads a file to Google Drive within the specified folder path.
+    The transfer is resumable and skipped when Drive already has the same
+    contents, see upload_stream_to_drive.
+
+    Args:
+        initial_folder_id (str): The ID of the initial folder
+            where the file will be uploaded.
+        file_path (str): The path of the file to be uploaded.
+        ls_folder_path (list, optional): The list of folder names
+            representing the folder path. Defaults to [].
+        use_cache (bool, optional): Whether to read from the path cache.
+            Defaults to True.
+        skip_if_unchanged (bool, optional): Whether to skip the transfer when
+            the existing file's md5Checksum matches. Defaults to True.
+        progress_callback (callable, optional): Called as
+            progress_callback(file_path, bytes_uploaded, total_bytes).
+
+    Returns:
+        str: The ID of the uploaded file.
+    """
+    with open(file_path, "rb") as f:
+        return upload_stream_to_drive(
+            initial_folder_id,
+            f,
+            os.path.basename(file_path),
+            ls_folder_path,
+            use_cache=use_cache,
+            skip_if_unchanged=skip_if_unchanged,
+            progress_callback=progress_callback,
+            upload_name=file_path,
+        )
+
+
+def upload_directory_to_drive(
+    local_dir,
+    initial_folder_id,
+    ls_folder_path=[],
+    pattern=None,
+    workers=4,
+    skip_if_unchanged=True,
+    progress_callback=None,
+):
+    """
+    Uploads a local directory tree to Drive, keeping its folder structure.
+    Folders are resolved or created first, one at a time so no folder is
+    created twice, then the files are uploaded concurrently.
+
+    Args:
+        local_dir (str): The local directory to upload.
+        initial_folder_id (str): The ID of the Drive folder to upload into.
+        ls_folder_path (list, optional): Folder names below initial_folder_id
+            to put the tree in. Defaults to [].
+        pattern (str, optional): A glob like "*.csv" matched against file names.
+        workers (int, optional): The max number of concurrent uploads.
+        skip_if_unchanged (bool, optional): Whether to skip files whose
+            contents Drive already has.
+        progress_callback (callable, optional): Called as
+            progress_callback(file_path, bytes_uploaded, total_bytes).
+
+    Returns:
+        pd.DataFrame: One row per file with path, id, status, bytes and error.
+    """
+    dict_file_folders = {}
+    for dir_path, _, ls_file_names in os.walk(local_dir):
+        relative_dir = os.path.relpath(dir_path, local_dir)
+        ls_relative_parts = [] if relative_dir == "." else relative_dir.split(os.sep)
+        for file_name in sorted(ls_file_names):
+            if pattern is not None and not fnmatch.fnmatch(file_name, pattern):
+                continue
+            dict_file_folders[os.path.join(dir_path, file_name)] = tuple(
+                ls_folder_path + ls_relative_parts
+            )
+
+    dict_folder_ids = {
+        ls_folder: resolve_drive_folder_path(
+            initial_folder_id, list(ls_folder), create=True
+        )
+        for ls_folder in sorted(set(dict_file_folders.values()))
+    }
+
+    start_time = time.time()
+    ls_results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        dict_futures = {
+            executor.submit(
+                upload_file_to_folder_id,
+                dict_folder_ids[ls_folder],
+                file_path,
+                skip_if_unchanged=skip_if_unchanged,
+                progress_callback=progress_callback,
+            ): file_path
+            for file_path, ls_folder in dict_file_folders.items()
+        }
+        for future in as_completed(dict_futures):
+            file_path = dict_futures[future]
+            dict_result = {"path": file_path, "bytes": os.path.getsize(file_path)}
+            try:
+                dict_result.update(future.result(), error=None)
+            except Exception as e:
+                print_logger(f"Failed to upload {file_path}: {e}", level="warning")
+                dict_result.update(id=None, status="failed", error=str(e))
+            ls_results.append(dict_result)
+
+    df_results = pd.DataFrame(
+        ls_results, columns=["path", "id", "status", "bytes", "error"]
+    )
+    print_logger(
+        f"Uploaded {df_results['status'].isin(['uploaded', 'replaced']).sum()}, "
+        f"unchanged {(df_results['status'] == 'unchanged').sum()}, "
+        f"failed {(df_results['status'] == 'failed').sum()} files "
+        f"from {local_dir} in {time.time() - start_time:.1f}s"
+    )
+    return df_results
+
+
+def get_report_buffer():
+    """
+    Returns a binary buffer for serializing a report in memory. Reports over
+    REPORT_SPOOL_MAX_BYTES spill to an anonymous temp file that is removed
+    as soon as the buffer is closed.
 
-    for folder_name in ls_folder_path:
-        print_logger(f"Looking for folder: {folder_name}", level="info")
-        folder_exists = False
-        page_token = None
-
-        while True:
-            # Retrieve a list of files in the specified folder
-            results = execute_with_retry(
-                drive_service.files().list(
-                    q=f"'{parent_id}' in parents and trashed=false",
-                    fields="nextPageToken, files(id, name)",
-                    pageToken=page_token,
-                )
-            )
-            for file in results.get("files", []):
-                if file.get("name") == folder_name:
-                    folder_exists = True
-                    parent_id = file["id"]
-                    break
+    Returns:
+        tempfile.SpooledTemporaryFile: An empty binary buffer.
+    """
+    return tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_BYTES, mode="w+b")
 
-            page_token = results.get("nextPageToken", None)
-            if page_token is None or folder_exists:
-                break
 
-        if not folder_exists:
-            print_logger(
-                f"Folder doesn't exist, creating folder: {folder_name}", level="info"
-            )
-            parent_id = create_folder_in_drive(drive_service, parent_id, folder_name)
-            print_logger(f"Folder: {folder_name} created with ID: {parent_id}")
-        else:
-            print_logger(
-                f"Folder: {folder_name} exists, navigating to folder id {parent_id}",
-                level="info",
-            )
+def upload_report_buffer(buffer, ls_folder_file_path, mimetype):
+    """
+    Uploads a serialized report from a buffer to the report folder in Drive.
 
-    # Check if a file with the same name exists in the folder
-    file_name = os.path.basename(file_path)
-    existing_files = execute_with_retry(
-        drive_service.files().list(
-            q=f"'{parent_id}' in parents and name='{file_name}' and trashed=false",
-            fields="files(id)",
-        )
-    )
+    Args:
+        buffer (io.IOBase): A seekable binary buffer with the report.
+        ls_folder_file_path (List[str] or str): A list of folder and
+            file names that make up the path to the desired file.
+            The final item in the list should be the name of the desired file.
+        mimetype (str): The mime type of the report.
 
-    if existing_files.get("files"):
-        # replace contents of existing file
-        existing_file_id = existing_files["files"][0]["id"]
-        media = MediaFileUpload(file_path, mimetype="application/octet-stream")
-        execute_with_retry(
-            drive_service.files().update(
-                fileId=existing_file_id, media_body=media, fields="id"
-            )
-        )
-        print_logger(f"Replaced existing file with ID: {existing_file_id}")
-        return existing_file_id
+    Raises:
+        ValueError: If `GOOGLE_DRIVE_FOLDER_ID_REPORT` is None. Configure
+            it in the environment or env file.
 
-    else:
-        # Upload the new file to Google Drive within the specified folder
-        file_metadata = {"name": file_name, "parents": [parent_id]}
-        media = MediaFileUpload(file_path, mimetype="application/octet-stream")
-        uploaded_file = execute_with_retry(
-            drive_service.files().create(
-                body=file_metadata, media_body=media, fields="id"
-            )
+    Returns:
+        str: The ID of the uploaded file.
+    """
+    if GOOGLE_DRIVE_FOLDER_ID_REPORT is None:
+        raise ValueError(
+            "GOOGLE_DRIVE_FOLDER_ID_REPORT is None, configure in .env file"
         )
-        file_id = uploaded_file["id"]
 
-        print_logger(f"File uploaded with ID: {file_id}")
-        return file_id
+    # if ls_folder_file_path is a string, convert to list
+    if isinstance(ls_folder_file_path, str):
+        ls_folder_file_path = [ls_folder_file_path]
+
+    drive_file_path = ls_folder_file_path[:-1]
+    print_logger(f"drive file path: {drive_file_path}")
+    return upload_stream_to_drive(
+        GOOGLE_DRIVE_FOLDER_ID_REPORT,
+        buffer,
+        ls_folder_file_path[-1],
+        drive_file_path,
+        mimetype=mimetype,
+    )
 
 
-def upload_report_csv(df, ls_folder_file_path):
+def upload_report_csv(df, ls_folder_file_path, compression=None):
     """
     Uploads a Pandas DataFrame to Google Drive.
+    The csv is serialized in memory and streamed to Drive without a temp file.
 
     Args:
         df (pd.DataFrame): The DataFrame to upload.
@@ -723,6 +2474,8 @@ def upload_report_csv(df, ls_folder_file_path):
             The final item in the list should be the name of the desired file.
             If a single string is provided, it will be
             treated as the file name. Default is an empty list.
+        compression (str, optional): "gzip" to upload a gzipped csv, ".gz" is
+            added to the file name if missing. Defaults to None.
 
     Raises:
         ValueError: If `GOOGLE_DRIVE_FOLDER_ID_REPORT` is None. Configure
@@ -732,51 +2485,72 @@ def upload_report_csv(df, ls_folder_file_path):
         - If the `ls_folder_file_path` is a string, it will be converted
             to a list with one element.
         - If the list `ls_folder_file_path` is longer than just a filename,
-            the necessary folders will be created in the temporary
-          upload directory.
+            the necessary folders will be created in Drive.
 
     Example:
         To upload a DataFrame to a specific folder on Google Drive:
 
         >>> df = pd.DataFrame({'Column1': [1, 2, 3], 'Column2': ['A', 'B', 'C']})
-        >>> upload_report(df, ['FolderName', 'FileName.csv'])
+        >>> upload_report_csv(df, ['FolderName', 'FileName.csv'])
 
         This will upload the DataFrame as 'FileName.csv' inside
             the 'FolderName' folder on Google Drive.
 
+    Returns:
+        str: The ID of the uploaded file.
     """
-    if GOOGLE_DRIVE_FOLDER_ID_REPORT is None:
-        raise ValueError(
-            "GOOGLE_DRIVE_FOLDER_ID_REPORT is None, configure in .env file"
-        )
+    if compression not in [None, "gzip"]:
+        raise ValueError(f"compression must be None or gzip, got {compression}")
 
-    # if ls_folder_file_path is a string, convert to list
     if isinstance(ls_folder_file_path, str):
         ls_folder_file_path = [ls_folder_file_path]
+    mimetype = "text/csv"
+    if compression == "gzip":
+        mimetype = "application/gzip"
+        if not ls_folder_file_path[-1].endswith(".gz"):
+            ls_folder_file_path = ls_folder_file_path[:-1] + [
+                f"{ls_folder_file_path[-1]}.gz"
+            ]
 
-    # if list longer than just filename, makedirs
-    if len(ls_folder_file_path) > 1:
-        folder_path = os.path.join(temp_upload_dir, *ls_folder_file_path[:-1])
-        os.makedirs(folder_path, exist_ok=True)
-        file_path = os.path.join(folder_path, ls_folder_file_path[-1])
-        drive_file_path = ls_folder_file_path[:-1]
-    else:
-        file_path = os.path.join(temp_upload_dir, *ls_folder_file_path)
-        drive_file_path = []
+    if compression == "gzip":
+        # a fixed header mtime keeps the md5 of unchanged data the same, so
+        # the upload of an unchanged report is skipped
+        compression = {"method": "gzip", "mtime": 0}
 
-    print_logger(f"temp save file path: {file_path}")
-    print_logger(f"drive file path: {drive_file_path}")
-    df.to_csv(
-        file_path,
-        index=False,
-    )
+    with get_report_buffer() as buffer:
+        df.to_csv(buffer, index=False, compression=compression)
+        return upload_report_buffer(buffer, ls_folder_file_path, mimetype)
+
+
+def upload_report_parquet(df, ls_folder_file_path):
+    """
+    Uploads a Pandas DataFrame to Google Drive as a Parquet file, typically a
+    fraction of the size of the same csv.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to upload.
+        ls_folder_file_path (List[str] or str): A list of folder and
+            file names that make up the path to the desired file.
+            The final item in the list should be the name of the desired file.
+
+    Raises:
+        ValueError: If `GOOGLE_DRIVE_FOLDER_ID_REPORT` is None. Configure
+            it in the environment or env file.
 
-    upload_file_to_drive(GOOGLE_DRIVE_FOLDER_ID_REPORT, file_path, drive_file_path)
+    Returns:
+        str: The ID of the uploaded file.
+    """
+    with get_report_buffer() as buffer:
+        df.to_parquet(buffer, index=False)
+        return upload_report_buffer(
+            buffer, ls_folder_file_path, "application/vnd.apache.parquet"
+        )
 
 
 def upload_report_html(df, ls_folder_file_path):
     """
     Uploads a Pandas DataFrame to Google Drive.
+    The html is serialized in memory and streamed to Drive without a temp file.
 
     Args:
         df (pd.DataFrame): The DataFrame to upload.
@@ -794,40 +2568,20 @@ def upload_report_html(df, ls_folder_file_path):
         - If the `ls_folder_file_path` is a string, it will be converted
             to a list with one element.
         - If the list `ls_folder_file_path` is longer than just a filename,
-            the necessary folders will be created in the temporary
-          upload directory.
+            the necessary folders will be created in Drive.
 
     Example:
         To upload a DataFrame to a specific folder on Google Drive:
 
         >>> df = pd.DataFrame({'Column1': [1, 2, 3], 'Column2': ['A', 'B', 'C']})
-        >>> upload_report(df, ['FolderName', 'FileName.html'])
+        >>> upload_report_html(df, ['FolderName', 'FileName.html'])
 
         This will upload the DataFrame as 'FileName.html' inside the
             'FolderName' folder on Google Drive.
 
+    Returns:
+        str: The ID of the uploaded file.
     """
-    if GOOGLE_DRIVE_FOLDER_ID_REPORT is None:
-        raise ValueError(
-            "GOOGLE_DRIVE_FOLDER_ID_REPORT is None, configure in .env file"
-        )
-
-    # if ls_folder_file_path is a string, convert to list
-    if isinstance(ls_folder_file_path, str):
-        ls_folder_file_path = [ls_folder_file_path]
-
-    # if list longer than just filename, makedirs
-    if len(ls_folder_file_path) > 1:
-        folder_path = os.path.join(temp_upload_dir, *ls_folder_file_path[:-1])
-        os.makedirs(folder_path, exist_ok=True)
-        file_path = os.path.join(folder_path, ls_folder_file_path[-1])
-        drive_file_path = ls_folder_file_path[:-1]
-    else:
-        file_path = os.path.join(temp_upload_dir, *ls_folder_file_path)
-        drive_file_path = []
-
-    print_logger(f"temp save file path: {file_path}")
-    print_logger(f"drive file path: {drive_file_path}")
     html_style = """
     <style>
         table {
@@ -855,16 +2609,116 @@ def upload_report_html(df, ls_folder_file_path):
         f"<!DOCTYPE html><html><head>{html_style}"
         f"</head><body>{html_table}</body></html>"
     )
-    # write to file path file_path
-    with open(file_path, "w") as f:
-        f.write(html)
 
-    upload_file_to_drive(GOOGLE_DRIVE_FOLDER_ID_REPORT, file_path, drive_file_path)
+    with get_report_buffer() as buffer:
+        buffer.write(html.encode("utf-8"))
+        return upload_report_buffer(buffer, ls_folder_file_path, "text/html")
+
+
+def iter_excel_rows(df, chunk_rows=10000):
+    """
+    Yields the rows of a DataFrame as tuples Excel writers accept, converting
+    one chunk of rows at a time so the whole frame is never copied.
+    Missing values become None and timezones are dropped.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to iterate.
+        chunk_rows (int, optional): How many rows to convert at a time.
+
+    Yields:
+        tuple: The values of one row.
+    """
+    for start in range(0, len(df), chunk_rows):
+        df_chunk = df.iloc[start : start + chunk_rows]
+        ls_tz_columns = df_chunk.select_dtypes(include="datetimetz").columns
+        if len(ls_tz_columns) > 0:
+            df_chunk = df_chunk.copy()
+            for column in ls_tz_columns:
+                df_chunk[column] = df_chunk[column].dt.tz_localize(None)
+        df_chunk = df_chunk.astype(object).where(df_chunk.notna(), None)
+        yield from df_chunk.itertuples(index=False, name=None)
+
+
+def write_excel_constant_memory(buffer, ls_dfs, ls_tab_names):
+    """
+    Writes DataFrames to an xlsx workbook row by row, keeping only the
+    current row in memory. Uses xlsxwriter's constant_memory mode when it is
+    installed, otherwise openpyxl's write only mode.
+
+    Args:
+        buffer (io.IOBase): The binary buffer to write the workbook to.
+        ls_dfs (List[pd.DataFrame]): The DataFrames to write.
+        ls_tab_names (List[str]): The tab name of each DataFrame.
+    """
+    if xlsxwriter is not None:
+        workbook = xlsxwriter.Workbook(
+            buffer,
+            {
+                "constant_memory": True,
+                "default_date_format": "yyyy-mm-dd hh:mm:ss",
+                "nan_inf_to_errors": True,
+            },
+        )
+        for df, tab_name in zip(ls_dfs, ls_tab_names):
+            worksheet = workbook.add_worksheet(tab_name)
+            worksheet.write_row(0, 0, [str(column) for column in df.columns])
+            for row_number, row in enumerate(iter_excel_rows(df), start=1):
+                worksheet.write_row(row_number, 0, row)
+        workbook.close()
+    else:
+        workbook = openpyxl.Workbook(write_only=True)
+        for df, tab_name in zip(ls_dfs, ls_tab_names):
+            worksheet = workbook.create_sheet(tab_name)
+            worksheet.append([str(column) for column in df.columns])
+            for row in iter_excel_rows(df):
+                worksheet.append(row)
+        workbook.save(buffer)
+
 
+def write_excel_with_fixed_timestamps(workbook_buffer, buffer):
+    """
+    Copies an xlsx workbook entry by entry, replacing the timestamps of the
+    zip entries and the created and modified document properties with fixed
+    values. Entries are streamed so large sheets are never held in memory.
+
+    Args:
+        workbook_buffer (io.IOBase): The binary buffer the workbook was written to.
+        buffer (io.IOBase): The binary buffer to write the copy to.
+    """
+    workbook_buffer.seek(0)
+    with (
+        zipfile.ZipFile(workbook_buffer) as source,
+        zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as target,
+    ):
+        for source_info in source.infolist():
+            target_info = zipfile.ZipInfo(
+                source_info.filename, EXCEL_FIXED_ZIP_DATE_TIME
+            )
+            target_info.compress_type = zipfile.ZIP_DEFLATED
+            if source_info.filename == EXCEL_CORE_PROPERTIES_PATH:
+                target.writestr(
+                    target_info,
+                    EXCEL_PROPERTY_DATE_PATTERN.sub(
+                        rb"\g<1>" + EXCEL_FIXED_PROPERTY_DATE + rb"\g<2>",
+                        source.read(source_info),
+                    ),
+                )
+                continue
+            with (
+                source.open(source_info) as f_source,
+                target.open(target_info, "w", force_zip64=True) as f_target,
+            ):
+                shutil.copyfileobj(f_source, f_target, DRIVE_DOWNLOAD_CHUNK_BYTES)
 
-def upload_report_excel(ls_dfs, ls_tab_names, ls_folder_file_path):
+
+def upload_report_excel(
+    ls_dfs, ls_tab_names, ls_folder_file_path, constant_memory=None
+):
     """
     Uploads a list of Pandas DataFrames to Google Drive as an Excel file.
+    The workbook is serialized in memory and streamed to Drive without a temp file.
+    Timestamps in the workbook are fixed, so an unchanged report has the same
+    md5 as the uploaded one.
 
     Args:
         ls_dfs (List[pd.DataFrame]): A list of DataFrames to upload.
@@ -875,6 +2729,9 @@ def upload_report_excel(ls_dfs, ls_tab_names, ls_folder_file_path):
             The final item in the list should be the name of the desired file.
                 If a single string is provided, it will be
             treated as the file name. Default is an empty list.
+        constant_memory (bool, optional): Whether to write the workbook row by
+            row without pandas' cell formatting. Defaults to True when the
+            DataFrames have more than EXCEL_CONSTANT_MEMORY_MIN_CELLS cells.
 
     Raises:
         ValueError: If `GOOGLE_DRIVE_FOLDER_ID_REPORT` is None. Configure it
@@ -884,45 +2741,378 @@ def upload_report_excel(ls_dfs, ls_tab_names, ls_folder_file_path):
         - If the `ls_folder_file_path` is a string, it will be converted to
             a list with one element.
         - If the list `ls_folder_file_path` is longer than just a filename,
-            the necessary folders will be created in the temporary
-          upload directory.
+            the necessary folders will be created in Drive.
 
     Example:
         To upload a DataFrame to a specific folder on Google Drive:
 
         >>> df = pd.DataFrame({'Column1': [1, 2, 3], 'Column2': ['A', 'B', 'C']})
-        >>> upload_report(df, ['FolderName', 'FileName.xlsx'])
+        >>> upload_report_excel([df], ['Tab1'], ['FolderName', 'FileName.xlsx'])
 
         This will upload the DataFrame as 'FileName.xlsx' inside the
             'FolderName' folder on Google Drive.
 
+    Returns:
+        str: The ID of the uploaded file.
     """
-    if GOOGLE_DRIVE_FOLDER_ID_REPORT is None:
-        raise ValueError(
-            "GOOGLE_DRIVE_FOLDER_ID_REPORT is None, configure in .env file"
+    if constant_memory is None:
+        constant_memory = (
+            sum(df.size for df in ls_dfs) > EXCEL_CONSTANT_MEMORY_MIN_CELLS
         )
 
-    # if ls_folder_file_path is a string, convert to list
-    if isinstance(ls_folder_file_path, str):
-        ls_folder_file_path = [ls_folder_file_path]
+    with get_report_buffer() as workbook_buffer, get_report_buffer() as buffer:
+        if constant_memory:
+            write_excel_constant_memory(workbook_buffer, ls_dfs, ls_tab_names)
+        else:
+            with pd.ExcelWriter(workbook_buffer) as writer:
+                for df, tab_name in zip(ls_dfs, ls_tab_names):
+                    df.to_excel(writer, sheet_name=tab_name, index=False)
+        write_excel_with_fixed_timestamps(workbook_buffer, buffer)
+        return upload_report_buffer(
+            buffer,
+            ls_folder_file_path,
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
 
-    # if list longer than just filename, makedirs
-    if len(ls_folder_file_path) > 1:
-        folder_path = os.path.join(temp_upload_dir, *ls_folder_file_path[:-1])
-        os.makedirs(folder_path, exist_ok=True)
-        file_path = os.path.join(folder_path, ls_folder_file_path[-1])
-        drive_file_path = ls_folder_file_path[:-1]
-    else:
-        file_path = os.path.join(temp_upload_dir, *ls_folder_file_path)
-        drive_file_path = []
 
-    print_logger(f"temp save file path: {file_path}")
-    print_logger(f"drive file path: {drive_file_path}")
-    with pd.ExcelWriter(file_path) as writer:
-        for df, tab_name in zip(ls_dfs, ls_tab_names):
-            df.to_excel(writer, sheet_name=tab_name, index=False)
+# %%
+# Metadata Index #
+
+DRIVE_INDEX_FIELDS = (
+    "id, name, mimeType, parents, size, quotaBytesUsed, md5Checksum, "
+    "modifiedTime, trashed, ownedByMe"
+)
+DRIVE_INDEX_DEFAULT_QUERY = "'me' in owners and trashed=false"
+drive_index_path = os.path.join(data_dir, "drive_index.parquet")
+drive_index_state_path = os.path.join(data_dir, "drive_index_state.json")
+
+
+def get_drive_index_df(ls_files):
+    """
+    Converts Drive file resources to the rows of the metadata index.
+
+    Args:
+        ls_files (list): File resources with the DRIVE_INDEX_FIELDS.
+
+    Returns:
+        pd.DataFrame: One row per file, with parent_id the first parent.
+    """
+    df_index = pd.DataFrame(
+        ls_files,
+        columns=[
+            "id",
+            "name",
+            "mimeType",
+            "parents",
+            "size",
+            "quotaBytesUsed",
+            "md5Checksum",
+            "modifiedTime",
+        ],
+    )
+    df_index["parent_id"] = df_index["parents"].map(
+        lambda parents: parents[0] if isinstance(parents, list) and parents else None
+    )
+    df_index["size"] = pd.to_numeric(df_index["size"]).fillna(0).astype("int64")
+    df_index["quotaBytesUsed"] = (
+        pd.to_numeric(df_index["quotaBytesUsed"]).fillna(0).astype("int64")
+    )
+    df_index["modifiedTime"] = pd.to_datetime(df_index["modifiedTime"], utc=True)
+    df_index["parents"] = df_index["parents"].map(
+        lambda parents: ",".join(parents) if isinstance(parents, list) else ""
+    )
+    return df_index
+
+
+def save_drive_index(df_index, page_token, query=DRIVE_INDEX_DEFAULT_QUERY):
+    """Writes the index, its query and the changes page token it is current as of."""
+    df_index.to_parquet(drive_index_path + ".tmp", index=False)
+    os.replace(drive_index_path + ".tmp", drive_index_path)
+    with open(drive_index_state_path + ".tmp", "w") as f:
+        json.dump(
+            {"page_token": page_token, "query": query, "saved_at": time.time()}, f
+        )
+    os.replace(drive_index_state_path + ".tmp", drive_index_state_path)
+
+
+def load_drive_index():
+    """
+    Reads the saved metadata index.
+
+    Returns:
+        tuple: (pd.DataFrame index, str changes page token, str query), or
+            (None, None, None) if no index has been built.
+    """
+    if not (
+        os.path.exists(drive_index_path) and os.path.exists(drive_index_state_path)
+    ):
+        return None, None, None
+    with open(drive_index_state_path, "r") as f:
+        dict_state = json.load(f)
+    return (
+        pd.read_parquet(drive_index_path),
+        dict_state["page_token"],
+        dict_state.get("query", DRIVE_INDEX_DEFAULT_QUERY),
+    )
+
+
+def list_drive_index_files(query):
+    """
+    Lists the files matching a Drive query with the index field mask.
+
+    Args:
+        query (str): The Drive query.
+
+    Returns:
+        list: File resources with the DRIVE_INDEX_FIELDS.
+    """
+    ls_files = []
+    next_page_token = None
+    while True:
+        results = execute_with_retry(
+            get_drive_service()
+            .files()
+            .list(
+                q=query,
+                fields=f"nextPageToken, files({DRIVE_INDEX_FIELDS})",
+                pageSize=1000,
+                pageToken=next_page_token,
+            )
+        )
+        ls_files.extend(results.get("files", []))
+        next_page_token = results.get("nextPageToken", None)
+        if next_page_token is None:
+            break
+    return ls_files
+
+
+def build_drive_index(query=DRIVE_INDEX_DEFAULT_QUERY):
+    """
+    Crawls every file the service account owns into a local metadata index,
+    paging through a single files.list with one field mask.
+
+    Args:
+        query (str, optional): The Drive query of the files to index, saved
+            with the index so refresh_drive_index keeps to it.
+
+    Returns:
+        pd.DataFrame: The metadata index, also saved to drive_index_path.
+    """
+    # taken first so changes made during the crawl are picked up by the next refresh
+    page_token = execute_with_retry(get_drive_service().changes().getStartPageToken())[
+        "startPageToken"
+    ]
+
+    df_index = get_drive_index_df(list_drive_index_files(query))
+    save_drive_index(df_index, page_token, query=query)
+    print_logger(f"Built drive index with {len(df_index)} files")
+    return df_index
+
+
+def get_changed_files_matching_query(query, dict_changed_files):
+    """
+    Drops the changed files that don't match the query of the index. Drive
+    can't filter changes by a query, so the query is listed again, only over
+    files modified since the earliest change.
+
+    Args:
+        query (str): The Drive query of the index.
+        dict_changed_files (dict): File ids mapped to their changed resource,
+            or None for files that were removed.
+
+    Returns:
+        dict: The changed files, with None for those that don't match.
+    """
+    ls_modified_times = [
+        dict_file["modifiedTime"]
+        for dict_file in dict_changed_files.values()
+        if dict_file and dict_file.get("modifiedTime")
+    ]
+    if not ls_modified_times:
+        return dict_changed_files
+
+    set_matching_ids = {
+        dict_file["id"]
+        for dict_file in list_drive_index_files(
+            f"({query}) and modifiedTime >= '{min(ls_modified_times)}'"
+        )
+    }
+    return {
+        file_id: dict_file if file_id in set_matching_ids else None
+        for file_id, dict_file in dict_changed_files.items()
+    }
+
+
+def refresh_drive_index():
+    """
+    Brings the saved metadata index up to date through the Drive changes API,
+    building it from scratch the first time. Changed files are only added if
+    they match the query the index was built with.
+
+    Returns:
+        pd.DataFrame: The up to date metadata index.
+    """
+    df_index, page_token, query = load_drive_index()
+    if df_index is None:
+        return build_drive_index()
+
+    dict_changed_files = {}
+    while True:
+        results = execute_with_retry(
+            get_drive_service()
+            .changes()
+            .list(
+                pageToken=page_token,
+                spaces="drive",
+                includeRemoved=True,
+                pageSize=1000,
+                fields=(
+                    "nextPageToken, newStartPageToken, "
+                    f"changes(fileId, removed, file({DRIVE_INDEX_FIELDS}))"
+                ),
+            )
+        )
+        for dict_change in results.get("changes", []):
+            dict_file = dict_change.get("file")
+            # the default query is checked here, others are listed again below
+            keep = (
+                not dict_change.get("removed")
+                and dict_file is not None
+                and (
+                    query != DRIVE_INDEX_DEFAULT_QUERY
+                    or (not dict_file.get("trashed") and dict_file.get("ownedByMe"))
+                )
+            )
+            # later changes to the same file replace earlier ones
+            dict_changed_files[dict_change["fileId"]] = dict_file if keep else None
+
+        if "newStartPageToken" in results:
+            page_token = results["newStartPageToken"]
+            break
+        page_token = results["nextPageToken"]
+
+    if query != DRIVE_INDEX_DEFAULT_QUERY:
+        dict_changed_files = get_changed_files_matching_query(query, dict_changed_files)
+
+    df_index = df_index[~df_index["id"].isin(dict_changed_files.keys())]
+    ls_upserts = [dict_file for dict_file in dict_changed_files.values() if dict_file]
+    if ls_upserts:
+        df_index = pd.concat(
+            [df_index, get_drive_index_df(ls_upserts)], ignore_index=True
+        )
+
+    save_drive_index(df_index, page_token, query=query)
+    print_logger(
+        f"Refreshed drive index with {len(dict_changed_files)} changed files, "
+        f"{len(df_index)} files indexed"
+    )
+    return df_index
+
+
+def get_index_top_storage_files(df_index, num_files=20, parent_folder_id=None):
+    """
+    Ranks the files of the index by the storage quota they use.
+
+    Args:
+        df_index (pd.DataFrame): The metadata index.
+        num_files (int, optional): The number of files to return.
+        parent_folder_id (str, optional): Only rank files directly in this folder.
+
+    Returns:
+        pd.DataFrame: The largest files, largest first.
+    """
+    df_files = df_index[df_index["mimeType"] != FOLDER_MIME_TYPE]
+    if parent_folder_id is not None:
+        df_files = df_files[df_files["parent_id"] == parent_folder_id]
+    return df_files.nlargest(num_files, "quotaBytesUsed")
+
+
+def get_index_duplicates(df_index, by="md5Checksum"):
+    """
+    Finds files of the index that share content or a name.
+
+    Args:
+        df_index (pd.DataFrame): The metadata index.
+        by (str, optional): "md5Checksum" for identical content or "name"
+            for files of the same name in different folders.
+
+    Returns:
+        pd.DataFrame: The duplicated files sorted by group, with the
+            group's num_copies and wasted_bytes, largest waste first.
+    """
+    if by not in ["md5Checksum", "name"]:
+        raise ValueError(f"by must be md5Checksum or name, got {by}")
+
+    df_files = df_index[
+        (df_index["mimeType"] != FOLDER_MIME_TYPE) & df_index[by].notna()
+    ]
+    if by == "name":
+        df_files = df_files.drop_duplicates(subset=["name", "parent_id"])
+
+    df_groups = df_files.groupby(by).agg(
+        num_copies=("id", "size"), file_bytes=("size", "max")
+    )
+    df_groups = df_groups[df_groups["num_copies"] > 1]
+    df_groups["wasted_bytes"] = df_groups["file_bytes"] * (df_groups["num_copies"] - 1)
+
+    return (
+        df_files.merge(
+            df_groups[["num_copies", "wasted_bytes"]], left_on=by, right_index=True
+        )
+        .sort_values(["wasted_bytes", by], ascending=[False, True])
+        .reset_index(drop=True)
+    )
+
+
+def get_index_folder_sizes(df_index, max_depth=100):
+    """
+    Rolls the size of every file of the index up into all of its ancestor folders.
+
+    Args:
+        df_index (pd.DataFrame): The metadata index.
+        max_depth (int, optional): The deepest folder nesting to follow.
+
+    Returns:
+        pd.DataFrame: One row per folder with its name, total_bytes and
+            num_files including subfolders, largest first.
+    """
+    is_folder = df_index["mimeType"] == FOLDER_MIME_TYPE
+    dict_folder_parents = (
+        df_index[is_folder].set_index("id")["parent_id"].dropna().to_dict()
+    )
+    df_files = df_index[~is_folder]
+
+    ls_levels = []
+    sr_folder_ids = df_files["parent_id"]
+    for _ in range(max_depth):
+        sr_has_folder = sr_folder_ids.notna()
+        if not sr_has_folder.any():
+            break
+        ls_levels.append(
+            pd.DataFrame(
+                {
+                    "folder_id": sr_folder_ids[sr_has_folder],
+                    "size": df_files["size"][sr_has_folder],
+                }
+            )
+        )
+        sr_folder_ids = sr_folder_ids.map(dict_folder_parents)
+
+    if not ls_levels:
+        return pd.DataFrame(columns=["folder_id", "name", "total_bytes", "num_files"])
 
-    upload_file_to_drive(GOOGLE_DRIVE_FOLDER_ID_REPORT, file_path, drive_file_path)
+    df_folder_sizes = (
+        pd.concat(ls_levels)
+        .groupby("folder_id")
+        .agg(total_bytes=("size", "sum"), num_files=("size", "size"))
+        .reset_index()
+    )
+    df_folder_sizes["name"] = df_folder_sizes["folder_id"].map(
+        df_index[is_folder].set_index("id")["name"]
+    )
+    return df_folder_sizes[
+        ["folder_id", "name", "total_bytes", "num_files"]
+    ].sort_values("total_bytes", ascending=False, ignore_index=True)
 
 
 # %%
@@ -939,14 +3129,13 @@ def check_storage_space_service_account():
     and prints the storage quota, used storage, total storage,
     and the percentage of storage used.
 
-    Note: This function assumes that the `drive_service`
-    object has already been initialized.
+    Note: The Drive service is created on first use if needed.
 
     Example usage:
     check_storage_space_service_account()
     """
     # Get the about resource, which includes storage quota information
-    about = execute_with_retry(drive_service.about().get(fields="storageQuota"))
+    about = execute_with_retry(get_drive_service().about().get(fields="storageQuota"))
     print(f"Storage quota: {about['storageQuota']}")
     used_storage = int(about["storageQuota"]["usage"])
     total_storage = int(about["storageQuota"]["limit"])
@@ -973,12 +3162,14 @@ def get_top_storage_use_files(num_files=20, parent_folder_id=None):
     if parent_folder_id:
         query += f" and '{parent_folder_id}' in parents"
 
-    # List files
+    # List files, parents come back in the same call
     results = execute_with_retry(
-        drive_service.files().list(
+        get_drive_service()
+        .files()
+        .list(
             q=query,
             pageSize=num_files,
-            fields="nextPageToken, files(id, name, mimeType, size)",
+            fields="nextPageToken, files(id, name, mimeType, size, md5Checksum, modifiedTime, parents)",
             orderBy="quotaBytesUsed desc",  # Order by size, descending
         )
     )
@@ -989,12 +3180,7 @@ def get_top_storage_use_files(num_files=20, parent_folder_id=None):
     else:
         print("Highest Storage Files:")
         for item in items:
-            # get parent folder id
-            file_id = item["id"]
-            file = execute_with_retry(
-                drive_service.files().get(fileId=file_id, fields="parents")
-            )
-            parent_id = file.get("parents")[0] if "parents" in file else "No parent"
+            parent_id = item["parents"][0] if item.get("parents") else "No parent"
             file_size = item.get("size", 0)
             file_size_MB = int(file_size) / 1e6 if file_size else 0
             # Print files name and size
@@ -1011,6 +3197,8 @@ def get_top_storage_use_files(num_files=20, parent_folder_id=None):
 def list_files_with_same_name_in_different_locations(file_name):
     """
     Lists all files with the same name that are stored in different locations (parent folders).
+    For many names at once, build the index with refresh_drive_index and use
+    get_index_duplicates(df_index, by="name") instead.
 
     Args:
         file_name (str): The name of the file to search for.
@@ -1020,17 +3208,28 @@ def list_files_with_same_name_in_different_locations(file_name):
     """
 
     # Query to find files with the specific name
-    query = f"name = '{file_name}' and trashed = false"
+    query = f"name = '{escape_drive_query_value(file_name)}' and trashed = false"
 
-    results = execute_with_retry(
-        drive_service.files().list(
-            q=query, fields="files(id, name, parents, size)", spaces="drive"
+    files = []
+    page_token = None
+    while True:
+        results = execute_with_retry(
+            get_drive_service()
+            .files()
+            .list(
+                q=query,
+                fields="nextPageToken, files(id, name, parents, size)",
+                spaces="drive",
+                pageSize=1000,
+                pageToken=page_token,
+            )
         )
-    )
-
-    pprint_dict(results)
+        files.extend(results.get("files", []))
+        page_token = results.get("nextPageToken", None)
+        if page_token is None:
+            break
 
-    files = results.get("files", [])
+    pprint_dict({"files": files})
 
     if not files:
         print(f"No files with the name '{file_name}' were found.")
@@ -1089,12 +3288,13 @@ def delete_file_by_id(file_id):
     """
 
     # Delete the file
-    execute_with_retry(drive_service.files().delete(fileId=file_id))
+    execute_with_retry(get_drive_service().files().delete(fileId=file_id))
+    invalidate_drive_path_cache(item_id=file_id)
     print(f"File with ID {file_id} deleted")
 
 
 def download_top_used_files_for_reupload_as_user(
-    num_files=30, parent_folder_id=None, actually_delete_files=False
+    num_files=30, parent_folder_id=None, actually_delete_files=False, workers=4
 ):
     initial_percent_used = check_storage_space_service_account()
     print(f"Initial percent used: {initial_percent_used}")
@@ -1117,19 +3317,26 @@ def download_top_used_files_for_reupload_as_user(
     os.makedirs(base_path, exist_ok=True)
     print(base_path)
 
-    for dict_item in dict_items:
-        file_id = dict_item["id"]
-        file_name = dict_item["name"]
-        print(f"Downloading filename: {file_name}")
-        if not os.path.exists(os.path.join(base_path, file_name)):
-            # download the file to the base path
-            download_file_by_id(file_id, os.path.join(base_path, file_name))
-        else:
-            print("Skipping download already exists")
+    # download the files to the base path, skipping ones already there,
+    # same named files are saved with their id added to the name
+    df_downloads = download_drive_files(
+        [{**dict_item, "ls_path": [dict_item["name"]]} for dict_item in dict_items],
+        base_path,
+        workers=workers,
+    )
+    ls_failed_ids = df_downloads.loc[df_downloads["status"] == "failed", "id"].tolist()
+    if ls_failed_ids:
+        print_logger(
+            f"Some downloads failed, keeping them in Drive: {ls_failed_ids}",
+            level="warning",
+        )
 
     if actually_delete_files:
         for dict_item in dict_items:
             file_id = dict_item["id"]
+            # only delete files whose own local copy is there
+            if file_id in ls_failed_ids:
+                continue
             file_name = dict_item["name"]
             print(f"Deleting filename: {file_name}")
             delete_file_by_id(file_id)
@@ -5,22 +5,42 @@ import datetime
 import json
 import os
 import sys
+import threading
 import time
+import warnings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional
 
+import numpy as np
 import pandas as pd
 import pygsheets
 import yaml
 from dotenv import load_dotenv
 from google.auth.exceptions import TransportError
 from googleapiclient.errors import HttpError
+from pygsheets.utils import format_addr
 
 # append grandparent
 if __name__ == "__main__":
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.config_utils import data_dir, file_dir, grandparent_dir
+from utils.cache_tools import (
+    clear_df_cache,
+    get_cache_key,
+    is_cache_expired,
+    read_df_cache,
+    write_df_cache,
+)
+from utils.config_utils import (
+    data_dir,
+    file_dir,
+    grandparent_dir,
+    sheet_cache_dir,
+    sheet_write_progress_dir,
+)
 from utils.display_tools import pprint_df, pprint_ls, print_logger
+from utils.google_auth_tools import get_google_credentials, get_service_account_email
 
 # %%
 # Load Environment #
@@ -33,77 +53,259 @@ if os.path.exists(dotenv_path):
 email_address_for_testing = os.getenv("EMAIL_ADDRESS_FOR_TESTING")
 
 # %%
-# Google Credentials #
+# Google Clients #
 
-SERVICE_ACCOUNT_ENV_KEY = "GOOGLE_SERVICE_ACCOUNT"
-json_file_path = os.path.join(
-    grandparent_dir,
-    "service_account_credentials.json",
-)
-service_account_env_data = os.getenv(SERVICE_ACCOUNT_ENV_KEY)
-service_account_env_data_json = None
-service_account_email = None
+# httplib2 connections are not thread safe, so every thread gets its own client
+thread_local_clients = threading.local()
 
-if service_account_env_data is not None:
-    print_logger(
-        f"Found environment variable for service account with key: {SERVICE_ACCOUNT_ENV_KEY}"
-    )
 
-    try:
-        if service_account_env_data:
-            service_account_env_data_json = json.loads(service_account_env_data)
+def get_gc():
+    """
+    Returns the pygsheets client to use from the current thread, authorizing
+    it on first use with the credentials shared with Drive and Docs.
+    The main thread keeps the module level connection caches, every other
+    thread gets its own connection caches along with its own client.
+
+    Returns:
+        pygsheets.Client: The client for the current thread.
+    """
+    if getattr(thread_local_clients, "gc", None) is None:
+        gc = pygsheets.authorize(
+            custom_credentials=get_google_credentials(),
+        )
+        thread_local_clients.gc = gc
+        if threading.current_thread() is threading.main_thread():
+            thread_local_clients.dict_connected_books = dict_connected_books
+            thread_local_clients.dict_connected_sheets = dict_connected_sheets
         else:
-            raise ValueError(
-                f"Environment variable {SERVICE_ACCOUNT_ENV_KEY} is not set or empty"
-            )
-    except json.JSONDecodeError as e:
+            thread_local_clients.dict_connected_books = {}
+            thread_local_clients.dict_connected_sheets = {}
+    return thread_local_clients.gc
+
+
+def get_connected_books():
+    """Returns the book connection cache belonging to the current thread's client."""
+    get_gc()
+    return thread_local_clients.dict_connected_books
+
+
+def get_connected_sheets():
+    """Returns the sheet connection cache belonging to the current thread's client."""
+    get_gc()
+    return thread_local_clients.dict_connected_sheets
+
+
+# %%
+# Rate Limiting #
+
+# shared by every concurrent sheet task in this process, charged once per task,
+# serial calls outside run_sheet_tasks_concurrently are not throttled
+SHEETS_MAX_REQUESTS_PER_MINUTE = int(
+    os.getenv("GOOGLE_SHEETS_MAX_REQUESTS_PER_MINUTE", "60")
+)
+sheets_rate_limit_lock = threading.Lock()
+sheets_request_times = deque()
+
+
+def wait_for_sheets_rate_limit():
+    """
+    Blocks until another Sheets request can be sent without going over
+    SHEETS_MAX_REQUESTS_PER_MINUTE in a rolling 60 second window.
+    """
+    while True:
+        with sheets_rate_limit_lock:
+            now = time.monotonic()
+            while sheets_request_times and now - sheets_request_times[0] >= 60:
+                sheets_request_times.popleft()
+
+            if len(sheets_request_times) < SHEETS_MAX_REQUESTS_PER_MINUTE:
+                sheets_request_times.append(now)
+                return
+
+            wait_seconds = 60 - (now - sheets_request_times[0])
+
         print_logger(
-            f"JSONDecodeError: {e} with reading json from environment variable, trying to repair and reload"
+            f"Sheets rate limit reached, waiting {wait_seconds:.1f} seconds",
+            level="debug",
         )
-        if service_account_env_data is not None:
-            service_account_env_data = service_account_env_data.replace("\n", "\\n")
-            service_account_env_data_json = json.loads(service_account_env_data)
+        time.sleep(wait_seconds)
+
+
+def run_rate_limited_sheet_task(func, *args, **kwargs):
+    """
+    Waits for the shared rate limiter, then runs one sheet task.
+
+    Args:
+        func (callable): The sheet function to run.
+        *args: The positional arguments for func.
+        **kwargs: The keyword arguments for func.
+
+    Returns:
+        The result of func.
+    """
+    wait_for_sheets_rate_limit()
+    return func(*args, **kwargs)
+
+
+# %%
+# Sheet Variables #
+
+# preconfigured sheet ids, loaded from sheet_ids.yaml on first use
+dict_loaded_book_ids = {}
+
+
+def get_hardcoded_book_ids():
+    """
+    Returns the preconfigured book ids from sheet_ids.yaml, loading them on
+    first use. Books created at runtime are added to the same dict.
+
+    Returns:
+        dict: Book names mapped to book ids.
+    """
+    if "book_ids" not in dict_loaded_book_ids:
+        sheet_ids_path = os.path.join(file_dir, "sheet_ids.yaml")
+        if os.path.exists(sheet_ids_path):
+            with open(sheet_ids_path, "r") as outfile:
+                dict_loaded_book_ids["book_ids"] = (
+                    yaml.load(outfile, Loader=yaml.FullLoader) or {}
+                )
         else:
-            raise ValueError(
-                f"Environment variable {SERVICE_ACCOUNT_ENV_KEY} is not set or empty"
-            )
+            dict_loaded_book_ids["book_ids"] = {}
+    return dict_loaded_book_ids["book_ids"]
 
-        # fix environment variable without modifying the .env file
-        os.environ[SERVICE_ACCOUNT_ENV_KEY] = service_account_env_data
 
-elif os.path.exists(json_file_path):
-    print_logger(
-        f"No environment varible with key: {SERVICE_ACCOUNT_ENV_KEY}, Found json credentails at: {json_file_path}"
+def __getattr__(name):
+    """Keeps the names that used to be created at import time importable."""
+    if name == "gc":
+        return get_gc()
+    if name == "service_account_email":
+        return get_service_account_email()
+    if name == "dict_hardcoded_book_ids":
+        return get_hardcoded_book_ids()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# %%
+# Sheet Cache #
+
+# none: always download, revision: reuse the cache while the book's Drive
+# revision is unchanged, ttl: reuse the cache until it is older than the ttl,
+# refresh: always download and overwrite the cache
+SHEET_CACHE_POLICIES = ["none", "revision", "ttl", "refresh"]
+SHEET_CACHE_DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+
+def get_book_revision(book_id):
+    """
+    Gets the Drive revision of a book with a single cheap metadata call,
+    without downloading any cells.
+
+    Args:
+        book_id (str): The ID of the Google spreadsheet.
+
+    Returns:
+        dict: The modifiedTime and version of the book.
+    """
+    file_metadata = (
+        get_gc()
+        .drive.service.files()
+        .get(fileId=book_id, fields="modifiedTime,version", supportsAllDrives=True)
+        .execute()
     )
-    service_account_env_data = open(json_file_path).read()
-    service_account_env_data_json = json.loads(service_account_env_data)
+    return {
+        "modifiedTime": file_metadata.get("modifiedTime"),
+        "version": file_metadata.get("version"),
+    }
+
+
+def read_through_sheet_cache(
+    book_id,
+    sheet_name,
+    dict_read_options,
+    fetch_df,
+    cache_policy="revision",
+    cache_ttl_seconds=SHEET_CACHE_DEFAULT_TTL_SECONDS,
+):
+    """
+    Returns a sheet DataFrame from the local cache when it is still valid
+    under the cache policy, otherwise downloads it with fetch_df and caches it.
+
+    Args:
+        book_id (str): The ID of the Google spreadsheet.
+        sheet_name (str): The name of the sheet within the Google spreadsheet.
+        dict_read_options (dict): The range and render options of the read,
+            part of the cache key.
+        fetch_df (callable): Downloads the DataFrame when the cache can't be used.
+        cache_policy (str): One of SHEET_CACHE_POLICIES (default is "revision").
+        cache_ttl_seconds (int): Max age of a cache entry for the "ttl" policy.
+
+    Returns:
+        pandas.DataFrame: The sheet data.
+    """
+    if cache_policy not in SHEET_CACHE_POLICIES:
+        raise ValueError(
+            f"cache_policy must be one of {SHEET_CACHE_POLICIES}, got {cache_policy}"
+        )
+    if cache_policy == "none":
+        return fetch_df()
 
-    # add environment variable without modifying the .env file
-    os.environ[SERVICE_ACCOUNT_ENV_KEY] = service_account_env_data
+    cache_key = get_cache_key(book_id, sheet_name, dict_read_options)
+    dict_revision = {}
 
-else:
-    raise ValueError(
-        f"No environment varible with key: {SERVICE_ACCOUNT_ENV_KEY}, and no json credentails at: {json_file_path}"
+    if cache_policy != "refresh":
+        df, dict_metadata = read_df_cache(sheet_cache_dir, cache_key)
+        if df is not None and cache_policy == "ttl":
+            if not is_cache_expired(dict_metadata, cache_ttl_seconds):
+                print_logger(
+                    f"Using cached sheet {book_id} : {sheet_name}", level="debug"
+                )
+                return df
+        elif cache_policy == "revision":
+            # check the revision before downloading so a change made mid download
+            # is picked up next time instead of being cached as current
+            dict_revision = get_book_revision(book_id)
+            if (
+                df is not None
+                and dict_metadata.get("modifiedTime") == dict_revision["modifiedTime"]
+                and dict_metadata.get("version") == dict_revision["version"]
+            ):
+                print_logger(
+                    f"Using cached sheet {book_id} : {sheet_name}, "
+                    f"unchanged since {dict_revision['modifiedTime']}",
+                    level="debug",
+                )
+                return df
+    else:
+        dict_revision = get_book_revision(book_id)
+
+    print_logger(
+        f"Sheet cache miss for {book_id} : {sheet_name}, downloading", level="debug"
+    )
+    df = fetch_df()
+    write_df_cache(
+        sheet_cache_dir,
+        cache_key,
+        df,
+        {"book_id": book_id, "sheet_name": sheet_name, **dict_revision},
     )
 
-service_account_email = service_account_env_data_json["client_email"]
-print_logger(f"google_service_account email: {service_account_email}")
+    return df
 
-# Create a connection to Google Sheets
-gc = pygsheets.authorize(
-    service_account_env_var=SERVICE_ACCOUNT_ENV_KEY,
-)
 
+def clear_sheet_cache(book_id=None):
+    """
+    Deletes cached sheets from the local cache.
 
-# %%
-# Sheet Variables #
+    Args:
+        book_id (str, optional): Only delete sheets of this book,
+            deletes every cached sheet when None.
 
-# load preconfigured sheet ids
-if os.path.exists(os.path.join(file_dir, "sheet_ids.yaml")):
-    with open(os.path.join(file_dir, "sheet_ids.yaml"), "r") as outfile:
-        dict_hardcoded_book_ids = yaml.load(outfile, Loader=yaml.FullLoader)
-else:
-    dict_hardcoded_book_ids = {}
+    Returns:
+        int: The number of cached sheets deleted.
+    """
+    if book_id is None:
+        return clear_df_cache(sheet_cache_dir)
+    return clear_df_cache(sheet_cache_dir, {"book_id": book_id})
 
 
 # %%
@@ -112,18 +314,26 @@ else:
 dict_connected_books = {}
 dict_connected_sheets = {}
 
+# keep request payloads well under the Sheets API request size limit
+SHEETS_MAX_CHUNK_BYTES = 2 * 1024 * 1024
+
+# committed chunks of unfinished chunked writes are kept on disk this long,
+# so a retried or restarted write resumes after the last committed chunk
+SHEETS_CHUNKED_WRITE_PROGRESS_TTL_SECONDS = 24 * 60 * 60
+chunked_write_progress_lock = threading.Lock()
+
 
 def get_book_from_id(id, retry=True):
-    global dict_connected_books
+    connected_books = get_connected_books()
 
-    if id in dict_connected_books.keys():
-        Workbook = dict_connected_books[id]
+    if id in connected_books.keys():
+        Workbook = connected_books[id]
         print_logger(f"Using cached connection to {id}", level="debug")
         return Workbook
 
     try:
-        book_from_id = gc.open_by_key(id)
-        dict_connected_books[id] = book_from_id
+        book_from_id = get_gc().open_by_key(id)
+        connected_books[id] = book_from_id
         print_logger(f"Opening new connection to {id}", level="debug")
         return book_from_id
     except TransportError as e:
@@ -242,7 +452,8 @@ def get_book_from_id(id, retry=True):
 
 
 def get_book(bookName, retry=True):
-    global dict_connected_books
+    connected_books = get_connected_books()
+    dict_hardcoded_book_ids = get_hardcoded_book_ids()
 
     if bookName in dict_hardcoded_book_ids.keys():
         print_logger(
@@ -257,14 +468,14 @@ def get_book(bookName, retry=True):
             level="warning",
         )
 
-    if bookName in dict_connected_books.keys():
-        Workbook = dict_connected_books[bookName]
+    if bookName in connected_books.keys():
+        Workbook = connected_books[bookName]
         print_logger(f"Using cached connection to {bookName}", level="debug")
         return Workbook
     else:
         try:
             print_logger(f"Opening new connection to {bookName}", level="debug")
-            Workbook = gc.open(bookName)
+            Workbook = get_gc().open(bookName)
 
             # print out what should add
             workbook_id_to_add_to_dict = Workbook.id
@@ -279,7 +490,7 @@ def get_book(bookName, retry=True):
             ) as f:
                 f.write(f'"{bookName}": "{workbook_id_to_add_to_dict}"\n')
 
-            dict_connected_books[bookName] = Workbook
+            connected_books[bookName] = Workbook
             return Workbook
         except TransportError as e:
             print_logger(
@@ -336,7 +547,8 @@ def get_book_with_create(bookName, parent_folder_id=None, template_id=None):
     a Workbook object.
 
     """
-    global dict_connected_books
+    connected_books = get_connected_books()
+    dict_hardcoded_book_ids = get_hardcoded_book_ids()
 
     # if already in dict_hardcoded_book_ids[bookName], then just get from there
     if bookName in dict_hardcoded_book_ids.keys():
@@ -353,7 +565,7 @@ def get_book_with_create(bookName, parent_folder_id=None, template_id=None):
                 f"Book {bookName} not in hardcoded book ids, trying to open by name",
                 level="info",
             )
-            Workbook = gc.open(bookName)
+            Workbook = get_gc().open(bookName)
             print_logger(
                 f"Book {bookName} already exists, using existing connection",
                 level="info",
@@ -363,10 +575,10 @@ def get_book_with_create(bookName, parent_folder_id=None, template_id=None):
             pass
 
     print_logger(f"Creating book: {bookName}", level="info")
-    Workbook = gc.create(bookName, template=template_id, folder=parent_folder_id)
+    Workbook = get_gc().create(bookName, template=template_id, folder=parent_folder_id)
     if template_id is not None and email_address_for_testing is not None:
         Workbook.share(email_address_for_testing, role="writer")
-    dict_connected_books[bookName] = Workbook
+    connected_books[bookName] = Workbook
     dict_hardcoded_book_ids[bookName] = Workbook.id
     # append new sheet id to yaml
     with open(os.path.join(file_dir, "sheet_ids.yaml"), "a") as outfile:
@@ -392,12 +604,12 @@ def get_book_sheet(bookName, sheetName, retries=3) -> pygsheets.Worksheet:
         Exception: If the maximum number of retries is exceeded.
     """
 
-    global dict_connected_sheets
+    connected_sheets = get_connected_sheets()
 
     while retries > 0:
         # Check if the connection is already cached
-        if f"{bookName} : {sheetName}" in dict_connected_sheets:
-            Worksheet = dict_connected_sheets[f"{bookName} : {sheetName}"]
+        if f"{bookName} : {sheetName}" in connected_sheets:
+            Worksheet = connected_sheets[f"{bookName} : {sheetName}"]
             print_logger(
                 f"Using cached connection to {bookName} : {sheetName}", level="debug"
             )
@@ -407,7 +619,7 @@ def get_book_sheet(bookName, sheetName, retries=3) -> pygsheets.Worksheet:
             # Open a new connection and cache it
             Workbook = get_book(bookName)
             Worksheet = Workbook.worksheet_by_title(sheetName)
-            dict_connected_sheets[f"{bookName} : {sheetName}"] = Worksheet
+            connected_sheets[f"{bookName} : {sheetName}"] = Worksheet
             print_logger(
                 f"Opening new connection to {bookName} : {sheetName}", level="debug"
             )
@@ -436,10 +648,13 @@ def get_book_sheet_df(
     value_render: pygsheets.ValueRenderOption = pygsheets.ValueRenderOption.FORMATTED_VALUE,
     numerize: bool = True,
     max_retries: int = 3,
+    cache_policy: str = "none",
+    cache_ttl_seconds: int = SHEET_CACHE_DEFAULT_TTL_SECONDS,
 ) -> pd.DataFrame:
     """
     Returns a pandas DataFrame object from a Google Sheet using the sheet name and the spreadsheet name.
     If a cached connection exists, it will be used instead of creating a new one.
+    With a cache_policy other than "none" the DataFrame is read through the local sheet cache.
 
     Args:
         bookName (str): The name of the Google Sheet.
@@ -450,6 +665,8 @@ def get_book_sheet_df(
         value_render (ValueRenderOption): The value render option to use (default is FORMATTED_VALUE).
         numerize (bool): Whether to convert numeric values to float (default is True).
         max_retries (int): The maximum number of retries in case of failure (default is 3).
+        cache_policy (str): One of SHEET_CACHE_POLICIES (default is "none").
+        cache_ttl_seconds (int): Max age of a cache entry for the "ttl" policy (default is 1 day).
 
     Returns:
         pandas.DataFrame: A DataFrame object with data from the Google Sheet.
@@ -458,6 +675,32 @@ def get_book_sheet_df(
         Exception: If the maximum number of retries is exceeded.
     """
 
+    if cache_policy != "none":
+        book_id = get_hardcoded_book_ids().get(bookName) or get_book(bookName).id
+        return read_through_sheet_cache(
+            book_id,
+            sheetName,
+            {
+                "start": start,
+                "end": end,
+                "index_column": index_column,
+                "value_render": value_render,
+                "numerize": numerize,
+            },
+            lambda: get_book_sheet_df(
+                bookName,
+                sheetName,
+                start=start,
+                end=end,
+                index_column=index_column,
+                value_render=value_render,
+                numerize=numerize,
+                max_retries=max_retries,
+            ),
+            cache_policy=cache_policy,
+            cache_ttl_seconds=cache_ttl_seconds,
+        )
+
     while max_retries > 0:
         try:
             worksheet = get_book_sheet(bookName, sheetName, max_retries)
@@ -487,6 +730,227 @@ def get_book_sheet_df(
     )
 
 
+def get_sheet_obj_range_values(
+    sheet_obj,
+    start=None,
+    end=None,
+    value_render=pygsheets.ValueRenderOption.UNFORMATTED_VALUE,
+):
+    """
+    Fetches the raw JSON values of a range with a single values.get call,
+    skipping the per cell processing that pygsheets does.
+    Dates are returned as formatted strings so they can be detected per column.
+
+    Args:
+        sheet_obj: The sheet object to read from.
+        start (str or tuple): The top left cell of the range (default is None for the whole sheet).
+        end (str or tuple): The bottom right cell of the range (default is None for the sheet end).
+        value_render (ValueRenderOption): The value render option to use (default is UNFORMATTED_VALUE).
+
+    Returns:
+        list: A list of rows, each a list of cell values. Trailing empty cells are omitted.
+    """
+    sheet_title = sheet_obj.title.replace("'", "''")
+    value_range = f"'{sheet_title}'"
+    if start is not None or end is not None:
+        start = start or "A1"
+        end = end or (sheet_obj.rows, sheet_obj.cols)
+        start = format_addr(start, "label") if isinstance(start, tuple) else start
+        end = format_addr(end, "label") if isinstance(end, tuple) else end
+        value_range = f"{value_range}!{start}:{end}"
+
+    response = sheet_obj.client.sheet.values_get(
+        sheet_obj.spreadsheet.id,
+        value_range,
+        value_render_option=value_render,
+        date_time_render_option="FORMATTED_STRING",
+    )
+    return response.get("values", [])
+
+
+def convert_values_to_series(series, numerize=True, parse_dates=True, empty_value=""):
+    """
+    Converts one column of raw sheet values to a typed series. The column type
+    is inferred once for the whole column instead of converting cell by cell.
+
+    Args:
+        series (pd.Series): The raw values of the column.
+        numerize (bool): Whether to convert text that looks numeric to numbers.
+        parse_dates (bool): Whether to convert text columns that are all dates to datetimes.
+        empty_value: The value to use for blank cells in non numeric columns.
+
+    Returns:
+        pd.Series: The converted column.
+    """
+    is_blank = series.isna() | (series == "")
+    if is_blank.all():
+        return series.where(~is_blank, empty_value).astype(object)
+
+    non_blank = series[~is_blank]
+    inferred_type = pd.api.types.infer_dtype(non_blank, skipna=True)
+
+    if inferred_type in ["integer", "floating", "mixed-integer-float"]:
+        numeric = pd.Series(
+            series.where(~is_blank, np.nan).to_numpy(dtype="float64"),
+            index=series.index,
+            name=series.name,
+        )
+        if not is_blank.any() and (numeric % 1 == 0).all():
+            return numeric.astype("int64")
+        return numeric
+
+    if inferred_type == "boolean":
+        if not is_blank.any():
+            return series.astype(bool)
+        return series.where(~is_blank, empty_value)
+
+    if inferred_type == "string":
+        # check a sample first so text columns fail fast
+        if (
+            numerize
+            and pd.to_numeric(non_blank.head(100), errors="coerce").notna().all()
+        ):
+            numeric = pd.to_numeric(non_blank, errors="coerce")
+            if numeric.notna().all():
+                return convert_values_to_series(
+                    pd.to_numeric(series.where(~is_blank), errors="coerce"),
+                    numerize=False,
+                    parse_dates=False,
+                    empty_value=empty_value,
+                )
+
+        if parse_dates:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                sample_dates = pd.to_datetime(non_blank.head(100), errors="coerce")
+                if sample_dates.notna().all():
+                    dates = pd.to_datetime(non_blank, errors="coerce")
+                    if dates.notna().all():
+                        return pd.to_datetime(series.where(~is_blank), errors="coerce")
+
+    return series.where(~is_blank, empty_value)
+
+
+def convert_values_to_df(
+    values,
+    has_header=True,
+    index_column=None,
+    numerize=True,
+    parse_dates=True,
+    empty_value="",
+):
+    """
+    Builds a typed DataFrame from raw sheet values, detecting numeric and date
+    columns per column with vectorized pandas operations.
+
+    Args:
+        values (list): A list of rows as returned by the Sheets API, rows may be ragged.
+        has_header (bool): Whether the first row holds the column names (default is True).
+        index_column (Optional[int]): The 1 based index of the column to use as the index (default is None).
+        numerize (bool): Whether to convert text that looks numeric to numbers (default is True).
+        parse_dates (bool): Whether to convert text columns that are all dates to datetimes (default is True).
+        empty_value: The value to use for blank cells in non numeric columns (default is "").
+
+    Returns:
+        pandas.DataFrame: The typed DataFrame.
+    """
+    if not values:
+        return pd.DataFrame()
+
+    if has_header:
+        ls_header = ["" if value is None else str(value) for value in values[0]]
+        values = values[1:]
+    else:
+        ls_header = []
+
+    df = pd.DataFrame(values, dtype=object)
+    num_cols = max(len(ls_header), df.shape[1])
+    df = df.reindex(columns=range(num_cols))
+
+    df = pd.DataFrame(
+        {
+            col: convert_values_to_series(
+                df[col],
+                numerize=numerize,
+                parse_dates=parse_dates,
+                empty_value=empty_value,
+            )
+            for col in df.columns
+        },
+        index=df.index,
+    )
+
+    if has_header:
+        df.columns = ls_header + [""] * (num_cols - len(ls_header))
+
+    if index_column:
+        if index_column < 1 or index_column > len(df.columns):
+            raise ValueError(f"index_column {index_column} not found")
+        df.index = df[df.columns[index_column - 1]]
+        del df[df.columns[index_column - 1]]
+
+    return df
+
+
+def get_book_sheet_df_raw(
+    bookName: str,
+    sheetName: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    index_column: Optional[int] = None,
+    value_render: pygsheets.ValueRenderOption = pygsheets.ValueRenderOption.UNFORMATTED_VALUE,
+    numerize: bool = True,
+    parse_dates: bool = True,
+    max_retries: int = 3,
+) -> pd.DataFrame:
+    """
+    Returns a pandas DataFrame from a Google Sheet like get_book_sheet_df, but
+    fetches the range as raw JSON values and types whole columns at once, which
+    is much faster than get_as_df on large sheets.
+
+    Args:
+        bookName (str): The name of the Google Sheet.
+        sheetName (str): The name of the sheet within the Google Sheet.
+        start (Optional[str]): The top left cell of the range to retrieve data from (default is None).
+        end (Optional[str]): The bottom right cell of the range to retrieve data from (default is None).
+        index_column (Optional[int]): The index of the column to use as the DataFrame index (default is None).
+        value_render (ValueRenderOption): The value render option to use (default is UNFORMATTED_VALUE).
+        numerize (bool): Whether to convert text that looks numeric to numbers (default is True).
+        parse_dates (bool): Whether to convert date columns to datetimes (default is True).
+        max_retries (int): The maximum number of retries in case of failure (default is 3).
+
+    Returns:
+        pandas.DataFrame: A DataFrame object with data from the Google Sheet.
+
+    Raises:
+        Exception: If the maximum number of retries is exceeded.
+    """
+
+    while max_retries > 0:
+        try:
+            worksheet = get_book_sheet(bookName, sheetName, max_retries)
+            values = get_sheet_obj_range_values(
+                worksheet, start=start, end=end, value_render=value_render
+            )
+
+            return convert_values_to_df(
+                values,
+                index_column=index_column,
+                numerize=numerize,
+                parse_dates=parse_dates,
+            )
+        except Exception as e:
+            max_retries -= 1
+            if max_retries > 0:
+                print_logger(
+                    f"Error: {e}. Retrying {max_retries} more time(s).", level="error"
+                )
+
+    raise Exception(
+        f"Failed to get the sheet {sheetName} from book {bookName} after {max_retries} retries."
+    )
+
+
 def get_book_sheet_values(
     bookName,
     sheetName,
@@ -532,13 +996,13 @@ def get_book_sheet_from_id_name(id, sheetName, retries=3):
     Returns:
         Worksheet: A Worksheet object from the specified Google Sheet.
     """
-    global dict_connected_sheets
+    connected_sheets = get_connected_sheets()
 
     retries_left = retries
 
     while retries_left > 0:
-        if f"{id} : {sheetName}" in dict_connected_sheets.keys():
-            Worksheet = dict_connected_sheets[f"{id} : {sheetName}"]
+        if f"{id} : {sheetName}" in connected_sheets.keys():
+            Worksheet = connected_sheets[f"{id} : {sheetName}"]
             print_logger(
                 f"Using cached connection to {id} : {sheetName}", level="debug"
             )
@@ -547,7 +1011,7 @@ def get_book_sheet_from_id_name(id, sheetName, retries=3):
             try:
                 Workbook = get_book_from_id(id)
                 Worksheet = Workbook.worksheet_by_title(sheetName)
-                dict_connected_sheets[f"{id} : {sheetName}"] = Worksheet
+                connected_sheets[f"{id} : {sheetName}"] = Worksheet
                 print_logger(
                     f"Opening new connection to {id} : {sheetName}", level="debug"
                 )
@@ -641,10 +1105,14 @@ def WriteToSheets(  # noqa: C901
     indexes=False,
     set_note=None,
     retries=3,
+    max_chunk_bytes=SHEETS_MAX_CHUNK_BYTES,
+    max_workers=1,
 ):
     """
     Writes a dataframe to a Google Sheet, creating the sheet if it does not exist.
     Optionally sets a note on the sheet.
+    Dataframes larger than max_chunk_bytes are uploaded in row chunks, and a
+    retry resumes from the last committed chunk instead of starting over.
 
     Args:
         bookName (str): The name of the Google spreadsheet.
@@ -654,6 +1122,8 @@ def WriteToSheets(  # noqa: C901
         set_note (str or None): The note to set on the sheet. Use None for no note, "DT"
             for date/time, or a string for a custom note.
         retries (int): The number of times to retry if the connection fails.
+        max_chunk_bytes (int): The max estimated payload of a single upload request.
+        max_workers (int): The number of chunks to upload at once (default is 1, in order).
 
     Returns:
         None
@@ -674,6 +1144,8 @@ def WriteToSheets(  # noqa: C901
         )
         df = df.reset_index()
 
+    ls_row_chunks = get_df_row_chunks(df, max_chunk_bytes)
+
     for i in range(retries):
         try:
             Workbook = get_book(bookName)
@@ -696,13 +1168,37 @@ def WriteToSheets(  # noqa: C901
                 Workbook.add_worksheet(sheetName)
                 Worksheet = get_book_sheet(bookName, sheetName)
 
-            # clear the worksheet
-            Worksheet.clear(start="A1", end=None)
-
-            if not indexes:
-                Worksheet.set_dataframe(df, (1, 1), fit=True, nan="")
+            if len(ls_row_chunks) > 1:
+                print_logger(
+                    f"Writing {df.shape} in {len(ls_row_chunks)} chunks to "
+                    f"{bookName} - {sheetName}"
+                )
+                write_df_to_range_of_sheet_obj_chunked(
+                    Worksheet,
+                    df,
+                    (1, 1),
+                    fit=True,
+                    nan="",
+                    copy_head=True,
+                    copy_index=indexes,
+                    clear_sheet=True,
+                    max_chunk_bytes=max_chunk_bytes,
+                    max_workers=max_workers,
+                    # this loop is the only retry layer, a retry resumes
+                    # after the chunks committed by the failed attempt
+                    retries=1,
+                    ls_row_chunks=ls_row_chunks,
+                )
             else:
-                Worksheet.set_dataframe(df, (1, 1), fit=True, nan="", copy_index=True)
+                # clear the worksheet
+                Worksheet.clear(start="A1", end=None)
+
+                if not indexes:
+                    Worksheet.set_dataframe(df, (1, 1), fit=True, nan="")
+                else:
+                    Worksheet.set_dataframe(
+                        df, (1, 1), fit=True, nan="", copy_index=True
+                    )
             try:
                 if set_note is not None:
                     if set_note == "DT":
@@ -871,9 +1367,11 @@ def write_df_to_range_of_sheet_obj(
     nan="",
     copy_head=False,
     retries=3,
+    copy_index=False,
 ):
     """
     Writes a DataFrame to a specified range on a sheet.
+    For very large DataFrames use write_df_to_range_of_sheet_obj_chunked.
 
     Args:
         sheet_obj: The sheet object to write to.
@@ -882,6 +1380,7 @@ def write_df_to_range_of_sheet_obj(
         fit (bool): Whether to fit the DataFrame to the range specified.
         nan: The value to use for NaN values in the DataFrame.
         copy_head (bool): Whether to copy the header of the DataFrame to the sheet.
+        copy_index (bool): Whether to copy the index of the DataFrame to the sheet.
 
     Returns:
         None
@@ -890,7 +1389,12 @@ def write_df_to_range_of_sheet_obj(
     for i in range(retries):
         try:
             sheet_obj.set_dataframe(
-                df=df, start=start, fit=fit, nan=nan, copy_head=copy_head
+                df=df,
+                start=start,
+                fit=fit,
+                nan=nan,
+                copy_head=copy_head,
+                copy_index=copy_index,
             )
             return
         except Exception as e:
@@ -908,30 +1412,366 @@ def write_df_to_range_of_sheet_obj(
     raise Exception("Failed to write to range")
 
 
+def get_df_row_chunks(df, max_chunk_bytes=SHEETS_MAX_CHUNK_BYTES):
+    """
+    Splits the rows of a DataFrame into consecutive chunks whose estimated
+    request payload stays under max_chunk_bytes.
+
+    Args:
+        df (DataFrame): The DataFrame to split.
+        max_chunk_bytes (int): The max estimated payload of a chunk in bytes.
+
+    Returns:
+        list: A list of (start, end) row positions, end exclusive.
+    """
+    if len(df) == 0:
+        return [(0, 0)]
+
+    # each cell is sent as a quoted json string followed by a comma
+    row_bytes = np.zeros(len(df), dtype="int64")
+    for col in range(df.shape[1]):
+        row_bytes += df.iloc[:, col].astype(str).str.len().to_numpy() + 3
+    cumulative_bytes = np.cumsum(row_bytes)
+
+    ls_chunks = []
+    chunk_start = 0
+    while chunk_start < len(df):
+        bytes_before_chunk = cumulative_bytes[chunk_start - 1] if chunk_start else 0
+        chunk_end = int(
+            np.searchsorted(
+                cumulative_bytes, bytes_before_chunk + max_chunk_bytes, side="right"
+            )
+        )
+        # always make progress even if a single row is over the limit
+        chunk_end = max(chunk_end, chunk_start + 1)
+        ls_chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end
+
+    return ls_chunks
+
+
+def get_chunked_write_progress_path(
+    sheet_obj, df, start, copy_head, copy_index, ls_row_chunks
+):
+    """
+    Identifies a chunked write by its book, sheet, placement, chunks and a hash
+    of the DataFrame, so the same write resumes even from a new process.
+
+    Returns:
+        str: The path of the progress file of the write.
+    """
+    try:
+        df_fingerprint = int(pd.util.hash_pandas_object(df, index=True).sum())
+    except TypeError:
+        # unhashable cells like lists are hashed by their text
+        df_fingerprint = int(
+            pd.util.hash_pandas_object(df.astype(str), index=True).sum()
+        )
+    progress_key = get_cache_key(
+        sheet_obj.spreadsheet.id,
+        sheet_obj.id,
+        start,
+        [str(column) for column in df.columns],
+        df_fingerprint,
+        copy_head,
+        copy_index,
+        ls_row_chunks,
+    )
+    return os.path.join(sheet_write_progress_dir, f"{progress_key}.json")
+
+
+def read_chunked_write_progress(progress_path):
+    """
+    Reads the chunk indexes committed by an earlier attempt at the same write,
+    ignoring progress older than SHEETS_CHUNKED_WRITE_PROGRESS_TTL_SECONDS.
+
+    Returns:
+        set: The committed chunk indexes.
+    """
+    if not os.path.exists(progress_path):
+        return set()
+    try:
+        if (
+            time.time() - os.path.getmtime(progress_path)
+            > SHEETS_CHUNKED_WRITE_PROGRESS_TTL_SECONDS
+        ):
+            os.remove(progress_path)
+            return set()
+        with open(progress_path, "r") as f:
+            return set(json.load(f)["committed_chunks"])
+    except (OSError, ValueError, KeyError) as e:
+        print_logger(
+            f"Could not read chunked write progress {progress_path}, starting over, error: {e}",
+            level="warning",
+        )
+        return set()
+
+
+def mark_chunk_committed(progress_path, set_committed_chunks, chunk_index):
+    """Records a committed chunk in memory and on disk, safe to call from worker threads."""
+    with chunked_write_progress_lock:
+        set_committed_chunks.add(chunk_index)
+        os.makedirs(os.path.dirname(progress_path), exist_ok=True)
+        with open(progress_path + ".tmp", "w") as f:
+            json.dump({"committed_chunks": sorted(set_committed_chunks)}, f)
+        os.replace(progress_path + ".tmp", progress_path)
+
+
+def write_df_chunk_to_sheet_id(
+    spreadsheet_id,
+    sheet_title,
+    df_chunk,
+    start,
+    nan,
+    copy_head,
+    copy_index,
+    retries,
+    progress_path,
+    set_committed_chunks,
+    chunk_index,
+):
+    """
+    Writes one chunk of a DataFrame from a worker thread, opening the sheet with
+    the worker's own client, and records it as committed.
+    """
+    sheet_obj = get_book_sheet_from_id_name(spreadsheet_id, sheet_title)
+    write_df_to_range_of_sheet_obj(
+        sheet_obj,
+        df_chunk,
+        start,
+        fit=False,
+        nan=nan,
+        copy_head=copy_head,
+        copy_index=copy_index,
+        retries=retries,
+    )
+    mark_chunk_committed(progress_path, set_committed_chunks, chunk_index)
+
+
+def write_df_to_range_of_sheet_obj_chunked(  # noqa: C901
+    sheet_obj,
+    df,
+    start="A1",
+    fit=False,
+    nan="",
+    copy_head=False,
+    copy_index=False,
+    clear_sheet=False,
+    max_chunk_bytes=SHEETS_MAX_CHUNK_BYTES,
+    max_workers=1,
+    retries=3,
+    ls_row_chunks=None,
+):
+    """
+    Writes a DataFrame to a sheet in row chunks that each stay under a payload
+    size, so very large frames don't hit request size limits or time out.
+    Every chunk retries on its own, and committed chunks are saved on disk so
+    calling it again with the same arguments, even after a restart, resumes
+    after them.
+
+    Args:
+        sheet_obj: The sheet object to write to.
+        df (DataFrame): The DataFrame to write to the sheet.
+        start (str or tuple): The top left cell to write to (default is "A1").
+        fit (bool): Whether to resize the sheet to exactly fit the DataFrame,
+            otherwise the sheet is only grown when needed.
+        nan: The value to use for NaN values in the DataFrame.
+        copy_head (bool): Whether to write the header of the DataFrame above the first chunk.
+        copy_index (bool): Whether to write the index of the DataFrame as the first columns.
+        clear_sheet (bool): Whether to clear the sheet before the first chunk is written.
+        max_chunk_bytes (int): The max estimated payload of a chunk in bytes.
+        max_workers (int): Chunks written at once, chunks cover separate rows
+            so they can safely be written in parallel (default is 1, in order).
+        retries (int): The number of times to try each chunk.
+        ls_row_chunks (list, optional): The chunks from get_df_row_chunks, computed
+            from max_chunk_bytes when not given.
+
+    Returns:
+        None
+    """
+    start = format_addr(start, "tuple") if isinstance(start, str) else start
+    start_row, start_col = start
+    if ls_row_chunks is None:
+        ls_row_chunks = get_df_row_chunks(df, max_chunk_bytes)
+
+    progress_path = get_chunked_write_progress_path(
+        sheet_obj, df, start, copy_head, copy_index, ls_row_chunks
+    )
+    set_committed_chunks = read_chunked_write_progress(progress_path)
+
+    if set_committed_chunks:
+        print_logger(
+            f"Resuming chunked write to {sheet_obj.title} after "
+            f"{len(set_committed_chunks)} of {len(ls_row_chunks)} committed chunks",
+            level="warning",
+        )
+    else:
+        if clear_sheet:
+            clear_range_of_sheet_obj(sheet_obj, "A1", None, retries=retries)
+
+        num_head_rows = df.columns.nlevels if copy_head else 0
+        num_index_cols = df.index.nlevels if copy_index else 0
+        needed_rows = start_row - 1 + num_head_rows + len(df)
+        needed_cols = start_col - 1 + num_index_cols + df.shape[1]
+        if fit:
+            sheet_obj.resize(rows=max(needed_rows, 1), cols=max(needed_cols, 1))
+        elif sheet_obj.rows < needed_rows or sheet_obj.cols < needed_cols:
+            sheet_obj.resize(
+                rows=max(sheet_obj.rows, needed_rows),
+                cols=max(sheet_obj.cols, needed_cols),
+            )
+
+    dict_chunk_args = {}
+    for chunk_index, (chunk_start, chunk_end) in enumerate(ls_row_chunks):
+        if chunk_index in set_committed_chunks:
+            continue
+        is_head_chunk = copy_head and chunk_index == 0
+        chunk_start_row = start_row + chunk_start
+        if copy_head and not is_head_chunk:
+            chunk_start_row += df.columns.nlevels
+        dict_chunk_args[chunk_index] = (
+            df.iloc[chunk_start:chunk_end],
+            (chunk_start_row, start_col),
+            is_head_chunk,
+        )
+
+    if max_workers > 1:
+        dict_results = run_sheet_tasks_concurrently(
+            {
+                chunk_index: (
+                    write_df_chunk_to_sheet_id,
+                    (
+                        sheet_obj.spreadsheet.id,
+                        sheet_obj.title,
+                        df_chunk,
+                        chunk_start_cell,
+                        nan,
+                        is_head_chunk,
+                        copy_index,
+                        retries,
+                        progress_path,
+                        set_committed_chunks,
+                        chunk_index,
+                    ),
+                    {},
+                )
+                for chunk_index, (
+                    df_chunk,
+                    chunk_start_cell,
+                    is_head_chunk,
+                ) in dict_chunk_args.items()
+            },
+            max_workers=max_workers,
+        )
+        ls_failed_chunks = [
+            chunk_index
+            for chunk_index, dict_result in dict_results.items()
+            if dict_result["error"] is not None
+        ]
+        if ls_failed_chunks:
+            raise Exception(
+                f"Failed to write chunks {ls_failed_chunks} of {len(ls_row_chunks)} "
+                f"to {sheet_obj.title}"
+            )
+    else:
+        for chunk_index, (
+            df_chunk,
+            chunk_start_cell,
+            is_head_chunk,
+        ) in dict_chunk_args.items():
+            write_df_to_range_of_sheet_obj(
+                sheet_obj,
+                df_chunk,
+                chunk_start_cell,
+                fit=False,
+                nan=nan,
+                copy_head=is_head_chunk,
+                copy_index=copy_index,
+                retries=retries,
+            )
+            mark_chunk_committed(progress_path, set_committed_chunks, chunk_index)
+            print_logger(
+                f"Wrote chunk {chunk_index + 1} of {len(ls_row_chunks)} "
+                f"with {len(df_chunk)} rows to {sheet_obj.title}",
+                level="debug",
+            )
+
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+
+
 # %%
 # Entire Sheet Operations #
 
 
-def copy_sheet_book_to_book(source_book, ls_source_sheets, ls_dest_books):
-    Workbook_src = gc.open(source_book)
-    src_book_id = Workbook_src.id
+def copy_sheets_to_book(src_book_id, dict_source_sheet_ids, dest_book):
+    """
+    Copies sheets from a source book into a destination book,
+    replacing any sheets with the same names.
 
-    for dest_book in ls_dest_books:
-        for source_sheet in ls_source_sheets:
-            sheet_src = Workbook_src.worksheet_by_title(source_sheet)
-            src_sheet_id = sheet_src.id
-            src_tup = (src_book_id, src_sheet_id)
+    Args:
+        src_book_id (str): The ID of the source Google spreadsheet.
+        dict_source_sheet_ids (dict): Maps source sheet names to their sheet IDs.
+        dest_book (str): The name of the destination Google spreadsheet.
 
-            Workbook_dest = gc.open(dest_book)
+    Returns:
+        None
+    """
+    Workbook_dest = get_gc().open(dest_book)
 
-            try:
-                Workbook_dest.del_worksheet(
-                    Workbook_dest.worksheet_by_title(source_sheet)
-                )
-            except Exception:
-                pass
+    for source_sheet, src_sheet_id in dict_source_sheet_ids.items():
+        try:
+            Workbook_dest.del_worksheet(Workbook_dest.worksheet_by_title(source_sheet))
+        except Exception:
+            pass
 
-            Workbook_dest.add_worksheet(source_sheet, src_tuple=src_tup)
+        Workbook_dest.add_worksheet(source_sheet, src_tuple=(src_book_id, src_sheet_id))
+
+
+def copy_sheet_book_to_book(
+    source_book, ls_source_sheets, ls_dest_books, max_workers=4
+):
+    """
+    Copies sheets from a source book into each of the destination books,
+    working on the destination books in parallel.
+
+    Args:
+        source_book (str): The name of the source Google spreadsheet.
+        ls_source_sheets (list): The names of the sheets to copy.
+        ls_dest_books (list): The names of the destination Google spreadsheets.
+        max_workers (int): The maximum number of books to copy into at once.
+
+    Returns:
+        dict: Maps each destination book to its result and error.
+    """
+    Workbook_src = get_gc().open(source_book)
+    src_book_id = Workbook_src.id
+    dict_source_sheet_ids = {
+        source_sheet: Workbook_src.worksheet_by_title(source_sheet).id
+        for source_sheet in ls_source_sheets
+    }
+
+    dict_results = run_sheet_tasks_concurrently(
+        {
+            dest_book: (
+                copy_sheets_to_book,
+                (src_book_id, dict_source_sheet_ids, dest_book),
+                {},
+            )
+            for dest_book in ls_dest_books
+        },
+        max_workers=max_workers,
+    )
+
+    for dest_book, dict_result in dict_results.items():
+        if dict_result["error"] is not None:
+            print_logger(
+                f"Failed to copy sheets from {source_book} to {dest_book}, "
+                f"error: {dict_result['error']}",
+                level="warning",
+            )
+
+    return dict_results
 
 
 def remove_sheet_from_book(book_name, sheet_name):
@@ -955,8 +1795,36 @@ def get_book_from_file_name(file_name):  # need to remove, aliased to new one fo
 
 
 def get_df_from_sheet_id(
-    id, sheet_name, start_range, end_range, include_tailing_empty=False, retry=True
+    id,
+    sheet_name,
+    start_range,
+    end_range,
+    include_tailing_empty=False,
+    retry=True,
+    cache_policy="none",
+    cache_ttl_seconds=SHEET_CACHE_DEFAULT_TTL_SECONDS,
 ):
+    if cache_policy != "none":
+        return read_through_sheet_cache(
+            id,
+            sheet_name,
+            {
+                "start": start_range,
+                "end": end_range,
+                "include_tailing_empty": include_tailing_empty,
+            },
+            lambda: get_df_from_sheet_id(
+                id,
+                sheet_name,
+                start_range,
+                end_range,
+                include_tailing_empty=include_tailing_empty,
+                retry=retry,
+            ),
+            cache_policy=cache_policy,
+            cache_ttl_seconds=cache_ttl_seconds,
+        )
+
     try:
         data_from_book = get_book_sheet_from_id_name(id, sheet_name).get_as_df(
             start=start_range,
@@ -1090,38 +1958,191 @@ def share_to_email(sheet_id, email, role="writer"):
     )
 
 
-def share_list_sheets_to_email(sheet_id_list, email, role="writer", test_mode=True):
-    df_statuses = pd.DataFrame(columns=["sheet_id", "sheet_name", "status"])
-    for sheet_id in sheet_id_list:
-        # get sheet name from dict_hardcoded_book_ids values
-        sheet_name = list(dict_hardcoded_book_ids.keys())[
-            list(dict_hardcoded_book_ids.values()).index(sheet_id)
-        ]
-        status = ""
-        try:
-            if check_for_editor(sheet_id, email):
-                status = "Already Editor"
-            elif test_mode:
-                status = "Would Have Shared"
-            else:
-                share_to_email(sheet_id, email, role=role)
-                status = "Shared"
-        except Exception as e:
+def get_share_status(sheet_id, email, role="writer", test_mode=True):
+    """
+    Shares a sheet to an email unless they are already an editor.
+
+    Args:
+        sheet_id (str): The ID of the Google spreadsheet.
+        email (str): The email address to share to.
+        role (str): The role to grant (default is "writer").
+        test_mode (bool): If True, only report what would have been shared.
+
+    Returns:
+        str: The status of the share.
+    """
+    if check_for_editor(sheet_id, email):
+        return "Already Editor"
+    if test_mode:
+        return "Would Have Shared"
+
+    share_to_email(sheet_id, email, role=role)
+    return "Shared"
+
+
+def share_list_sheets_to_email(
+    sheet_id_list, email, role="writer", test_mode=True, max_workers=4
+):
+    # get sheet names from dict_hardcoded_book_ids values
+    dict_sheet_names = {
+        book_id: book_name for book_name, book_id in get_hardcoded_book_ids().items()
+    }
+
+    dict_results = run_sheet_tasks_concurrently(
+        {
+            sheet_id: (
+                get_share_status,
+                (sheet_id, email),
+                {"role": role, "test_mode": test_mode},
+            )
+            for sheet_id in sheet_id_list
+        },
+        max_workers=max_workers,
+    )
+
+    ls_statuses = []
+    for sheet_id, dict_result in dict_results.items():
+        if dict_result["error"] is not None:
             print_logger(f"Failed to share {sheet_id} to {email}.", level="error")
-            print_logger(e)
+            print_logger(dict_result["error"])
             status = "Failed"
-        df_statuses = df_statuses.append(
+        else:
+            status = dict_result["result"]
+
+        ls_statuses.append(
             {
                 "sheet_id": sheet_id,
-                "sheet_name": sheet_name,
+                "sheet_name": dict_sheet_names.get(sheet_id, ""),
                 "status": status,
-            },
-            ignore_index=True,
+            }
         )
+    df_statuses = pd.DataFrame(
+        ls_statuses, columns=["sheet_id", "sheet_name", "status"]
+    )
 
     pprint_df(df_statuses)
     print_logger("Failed Sheets:", level="error")
     pprint_df(df_statuses[df_statuses["status"] == "Failed"])
 
+    return df_statuses
+
+
+# %%
+# Concurrent Operations #
+
+
+def run_sheet_tasks_concurrently(dict_tasks, max_workers=8):
+    """
+    Runs many Google Sheets reads, writes or permission changes in parallel.
+    Each worker thread uses its own client and every task waits on the
+    shared rate limiter before it starts. Errors are captured per task
+    instead of being raised.
+
+    Args:
+        dict_tasks (dict): Maps a key of the caller's choosing to a tuple of
+            (function, args, kwargs), for example
+            {("Book", "Tab"): (get_book_sheet_df, ("Book", "Tab"), {})}.
+        max_workers (int): The maximum number of tasks to run at once (default is 8).
+
+    Returns:
+        dict: Maps each key to {"result": ..., "error": None} when the task
+            succeeded or {"result": None, "error": Exception} when it failed,
+            in the same order as dict_tasks.
+    """
+    start_time = datetime.datetime.now()
+    dict_results = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        dict_futures = {
+            executor.submit(run_rate_limited_sheet_task, func, *args, **kwargs): key
+            for key, (func, args, kwargs) in dict_tasks.items()
+        }
+        for future in as_completed(dict_futures):
+            key = dict_futures[future]
+            try:
+                dict_results[key] = {"result": future.result(), "error": None}
+            except Exception as e:
+                print_logger(
+                    f"Sheet task {key} failed, error: {e}",
+                    level="warning",
+                )
+                dict_results[key] = {"result": None, "error": e}
+
+    num_failed = sum(
+        1 for dict_result in dict_results.values() if dict_result["error"] is not None
+    )
+    print_logger(
+        f"Finished {len(dict_tasks)} sheet tasks with {num_failed} failures "
+        f"after {datetime.datetime.now() - start_time}"
+    )
+
+    return {key: dict_results[key] for key in dict_tasks}
+
+
+def get_book_sheet_dfs_concurrently(ls_book_sheet_names, max_workers=8, **kwargs):
+    """
+    Reads many sheets in parallel with get_book_sheet_df.
+
+    Args:
+        ls_book_sheet_names (list): A list of (bookName, sheetName) tuples.
+        max_workers (int): The maximum number of sheets to read at once (default is 8).
+        **kwargs: Passed through to get_book_sheet_df.
+
+    Returns:
+        dict: Maps each (bookName, sheetName) to its result and error.
+    """
+    return run_sheet_tasks_concurrently(
+        {
+            (bookName, sheetName): (get_book_sheet_df, (bookName, sheetName), kwargs)
+            for bookName, sheetName in ls_book_sheet_names
+        },
+        max_workers=max_workers,
+    )
+
+
+def get_book_sheet_dfs_from_ids_concurrently(
+    ls_id_sheet_names, max_workers=8, **kwargs
+):
+    """
+    Reads many sheets in parallel with get_book_sheet_df_from_id_name.
+
+    Args:
+        ls_id_sheet_names (list): A list of (id, sheetName) tuples.
+        max_workers (int): The maximum number of sheets to read at once (default is 8).
+        **kwargs: Passed through to get_book_sheet_df_from_id_name.
+
+    Returns:
+        dict: Maps each (id, sheetName) to its result and error.
+    """
+    return run_sheet_tasks_concurrently(
+        {
+            (id, sheetName): (get_book_sheet_df_from_id_name, (id, sheetName), kwargs)
+            for id, sheetName in ls_id_sheet_names
+        },
+        max_workers=max_workers,
+    )
+
+
+def write_dfs_to_sheets_concurrently(dict_book_sheet_dfs, max_workers=4, **kwargs):
+    """
+    Writes many dataframes in parallel with WriteToSheets.
+
+    Args:
+        dict_book_sheet_dfs (dict): Maps (bookName, sheetName) tuples to the
+            dataframe to write there.
+        max_workers (int): The maximum number of sheets to write at once (default is 4).
+        **kwargs: Passed through to WriteToSheets.
+
+    Returns:
+        dict: Maps each (bookName, sheetName) to its result and error.
+    """
+    return run_sheet_tasks_concurrently(
+        {
+            (bookName, sheetName): (WriteToSheets, (bookName, sheetName, df), kwargs)
+            for (bookName, sheetName), df in dict_book_sheet_dfs.items()
+        },
+        max_workers=max_workers,
+    )
+
 
 # %%
@@ -1,12 +1,17 @@
 # %%
 # Imports #
 
+import json
 import os
 import socket
 import sys
+import tempfile
+import uuid
 
 import pandas as pd
 import psycopg2
+import pyarrow as pa
+import pyarrow.parquet as pq
 from dotenv import load_dotenv
 from psycopg2 import pool, sql
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
@@ -15,7 +20,8 @@ from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 if __name__ == "__main__":
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.display_tools import pprint_df
+from utils.cache_tools import QUERY_CACHE_DEFAULT_TTL_SECONDS, read_through_query_cache
+from utils.display_tools import pprint_df, print_logger
 
 # %%
 # Variables #
@@ -34,6 +40,37 @@ POSTGRES_USER = os.getenv("POSTGRES_USER")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT")
 
+# rows fetched per round trip by the streaming queries
+POSTGRES_FETCH_BATCH_ROWS = 50000
+
+# COPY exports stay in memory up to this size, then spill to a temp file
+POSTGRES_COPY_SPOOL_MAX_BYTES = 256 * 1024 * 1024
+
+# arrow types of postgres type oids, for Parquet columns that are all null in
+# the first batch, numeric columns get a decimal of their declared size and
+# other types are written as text
+POSTGRES_ARROW_TYPES = {
+    16: pa.bool_(),  # bool
+    17: pa.binary(),  # bytea
+    18: pa.string(),  # char
+    19: pa.string(),  # name
+    20: pa.int64(),  # int8
+    21: pa.int16(),  # int2
+    23: pa.int32(),  # int4
+    25: pa.string(),  # text
+    26: pa.int64(),  # oid
+    700: pa.float32(),  # float4
+    701: pa.float64(),  # float8
+    1042: pa.string(),  # bpchar
+    1043: pa.string(),  # varchar
+    1082: pa.date32(),  # date
+    1083: pa.time64("us"),  # time
+    1114: pa.timestamp("us"),  # timestamp
+    1184: pa.timestamp("us", tz="UTC"),  # timestamptz
+    2950: pa.string(),  # uuid
+}
+POSTGRES_NUMERIC_TYPE_CODE = 1700
+
 
 # %%
 # Connect To Postgres #
@@ -106,15 +143,51 @@ def list_all_databases():
         conn.close()
 
 
-def query_postgres(postgres_pool, query):
-    """Executes a given SQL query and returns a Pandas DataFrame."""
+def get_pool_identity(postgres_pool):
+    """Returns the server, database and user a pool connects to."""
+    dict_kwargs = getattr(postgres_pool, "_kwargs", {})
+    return [dict_kwargs.get(key) for key in ["host", "port", "dbname", "user"]]
+
+
+def query_postgres(
+    postgres_pool,
+    query,
+    params=None,
+    cache=False,
+    cache_ttl_seconds=QUERY_CACHE_DEFAULT_TTL_SECONDS,
+):
+    """
+    Executes a given SQL query and returns a Pandas DataFrame.
+
+    Args:
+        postgres_pool (psycopg2.pool.AbstractConnectionPool): The pool to use.
+        query (str): The SQL query.
+        params (optional): Parameters bound to the query by psycopg2.
+        cache (bool or str, optional): True reuses a cached result younger than
+            cache_ttl_seconds, "refresh" runs the query and overwrites the cache.
+        cache_ttl_seconds (int, optional): Max age of a cached result.
+
+    Returns:
+        pd.DataFrame: The query results.
+    """
+    if cache is not False:
+        return read_through_query_cache(
+            "postgres",
+            get_pool_identity(postgres_pool),
+            query,
+            lambda: query_postgres(postgres_pool, query, params=params),
+            params=params,
+            cache=cache,
+            cache_ttl_seconds=cache_ttl_seconds,
+        )
+
     pg_conn = None
     pg_cursor = None
     try:
         pg_conn = get_connection(postgres_pool)
         pg_cursor = pg_conn.cursor()
 
-        pg_cursor.execute(query)
+        pg_cursor.execute(query, params)
 
         if not pg_cursor.description:
             raise ValueError("No data found or invalid query.")
@@ -129,27 +202,281 @@ def query_postgres(postgres_pool, query):
     finally:
         if pg_cursor:
             pg_cursor.close()
+        if pg_conn:
+            release_connection(postgres_pool, pg_conn)
+
+
+def query_postgres_row_batches(
+    postgres_pool,
+    query,
+    params=None,
+    batch_size=POSTGRES_FETCH_BATCH_ROWS,
+):
+    """
+    Executes a query with a named server side cursor and yields the result
+    rows in batches of batch_size, so only one batch is held in memory. The
+    connection goes back to the pool when the generator is exhausted or
+    closed.
+
+    Args:
+        postgres_pool (psycopg2.pool.AbstractConnectionPool): The pool to use.
+        query (str): The SQL query.
+        params (optional): Parameters bound to the query by psycopg2.
+        batch_size (int, optional): The number of rows per batch.
+
+    Yields:
+        tuple: (cursor description, list of row tuples), one empty list of
+            rows when there are no rows.
+
+    Raises:
+        ValueError: If the query does not return rows.
+    """
+    pg_conn = get_connection(postgres_pool)
+    pg_cursor = None
+    try:
+        pg_cursor = pg_conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+        pg_cursor.itersize = batch_size
+        pg_cursor.execute(query, params)
+
+        rows = pg_cursor.fetchmany(batch_size)
+        # a named cursor only has a description after the first fetch
+        if not pg_cursor.description:
+            raise ValueError("No data found or invalid query.")
+        description = pg_cursor.description
+        if not rows:
+            yield description, rows
+        while rows:
+            yield description, rows
+            rows = pg_cursor.fetchmany(batch_size)
+    finally:
+        if pg_cursor:
+            pg_cursor.close()
+        # putconn rolls back the transaction the named cursor needed
+        release_connection(postgres_pool, pg_conn)
+
+
+def query_postgres_batches(
+    postgres_pool,
+    query,
+    params=None,
+    batch_size=POSTGRES_FETCH_BATCH_ROWS,
+):
+    """
+    Executes a query with a named server side cursor and yields the results
+    as DataFrames of batch_size rows, so only one batch is held in memory.
+    The connection goes back to the pool when the generator is exhausted or
+    closed.
+
+    Args:
+        postgres_pool (psycopg2.pool.AbstractConnectionPool): The pool to use.
+        query (str): The SQL query.
+        params (optional): Parameters bound to the query by psycopg2.
+        batch_size (int, optional): The number of rows per batch.
+
+    Yields:
+        pd.DataFrame: The next batch of results, an empty DataFrame with the
+            result columns when there are no rows.
+
+    Raises:
+        ValueError: If the query does not return rows.
+    """
+    for description, rows in query_postgres_row_batches(
+        postgres_pool, query, params=params, batch_size=batch_size
+    ):
+        yield pd.DataFrame(rows, columns=[desc[0] for desc in description])
+
+
+def get_postgres_arrow_type(column):
+    """
+    Returns the arrow type for a postgres result column.
+
+    Args:
+        column (psycopg2.extensions.Column): An item of a cursor description.
+
+    Returns:
+        pa.DataType: The arrow type, or None if the column is written as text.
+    """
+    if column.type_code == POSTGRES_NUMERIC_TYPE_CODE:
+        if column.precision and 0 < column.precision <= 38:
+            return pa.decimal128(column.precision, column.scale or 0)
+        return None
+    return POSTGRES_ARROW_TYPES.get(column.type_code)
+
+
+def get_postgres_text_value(value):
+    """Returns a value as text for a Parquet text column, keeping None."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def get_postgres_parquet_schema(description, df):
+    """
+    Returns the Parquet schema of a query result from its first batch. Column
+    types are inferred from the batch, except for numeric columns, which are
+    sized by their declared precision and scale so wider values in later
+    batches fit, and columns that are all null in the batch. Both get their
+    type from the postgres column type instead.
+
+    Args:
+        description (tuple): The cursor description of the result.
+        df (pd.DataFrame): The first batch of the result.
+
+    Returns:
+        tuple: (pa.Schema, list of columns that are written as text)
+    """
+    schema = pa.Table.from_pandas(df, preserve_index=False).schema
+    ls_text_columns = []
+    for column in description:
+        index = schema.get_field_index(column.name)
+        if column.type_code != POSTGRES_NUMERIC_TYPE_CODE and not (
+            pa.types.is_null(schema.field(index).type)
+        ):
+            continue
+        arrow_type = get_postgres_arrow_type(column)
+        if arrow_type is None:
+            arrow_type = pa.string()
+            ls_text_columns.append(column.name)
+        schema = schema.set(index, schema.field(index).with_type(arrow_type))
+    return schema, ls_text_columns
+
+
+def get_postgres_parquet_table(df, schema, ls_text_columns):
+    """
+    Converts a batch of a query result to an arrow table of its Parquet schema.
+
+    Args:
+        df (pd.DataFrame): The batch of the result.
+        schema (pa.Schema): The schema from get_postgres_parquet_schema.
+        ls_text_columns (list): The columns that are written as text.
+
+    Returns:
+        pa.Table: The batch as a table.
+    """
+    df = df.copy()
+    for column in ls_text_columns:
+        df[column] = df[column].map(get_postgres_text_value)
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def query_postgres_to_parquet(
+    postgres_pool,
+    query,
+    path,
+    params=None,
+    batch_size=POSTGRES_FETCH_BATCH_ROWS,
+):
+    """
+    Streams the results of a query into a Parquet file, one row group per
+    batch. The file is written to a temp path first and only replaces path
+    once complete.
+
+    Args:
+        postgres_pool (psycopg2.pool.AbstractConnectionPool): The pool to use.
+        query (str): The SQL query.
+        path (str): The path of the Parquet file to write.
+        params (optional): Parameters bound to the query by psycopg2.
+        batch_size (int, optional): The number of rows per batch.
+
+    Returns:
+        int: The number of rows written.
+    """
+    temp_path = path + ".tmp"
+    writer = None
+    num_rows = 0
+    try:
+        for description, rows in query_postgres_row_batches(
+            postgres_pool, query, params=params, batch_size=batch_size
+        ):
+            df = pd.DataFrame(rows, columns=[desc[0] for desc in description])
+            if writer is None:
+                schema, ls_text_columns = get_postgres_parquet_schema(description, df)
+                writer = pq.ParquetWriter(temp_path, schema)
+            writer.write_table(
+                get_postgres_parquet_table(df, writer.schema, ls_text_columns)
+            )
+            num_rows += len(df)
+        writer.close()
+        writer = None
+        os.replace(temp_path, path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    print_logger(f"Wrote {num_rows} rows to {path}")
+    return num_rows
+
+
+def export_postgres_query(postgres_pool, query, params=None, path=None):
+    """
+    Exports the results of a query with COPY ... TO STDOUT as CSV, which the
+    server produces much faster than rows are fetched through a cursor, and
+    parses it with the pyarrow CSV reader. Column types are inferred from the
+    CSV, so they can differ from query_postgres, like dates read as text.
+
+    Args:
+        postgres_pool (psycopg2.pool.AbstractConnectionPool): The pool to use.
+        query (str): The SQL query, without a trailing semicolon.
+        params (optional): Parameters bound to the query by psycopg2.
+        path (str, optional): Write the CSV to this path instead of parsing it.
+
+    Returns:
+        pd.DataFrame or str: The query results, or the path when one is given.
+    """
+    temp_path = None if path is None else path + ".tmp"
+    pg_conn = get_connection(postgres_pool)
+    pg_cursor = None
+    try:
+        pg_cursor = pg_conn.cursor()
+        if params is not None:
+            query = pg_cursor.mogrify(query, params).decode()
+        copy_query = f"COPY ({query.strip().rstrip(';')}) TO STDOUT WITH CSV HEADER"
+
+        if path is not None:
+            with open(temp_path, "wb") as f:
+                pg_cursor.copy_expert(copy_query, f)
+            os.replace(temp_path, path)
+            return path
+
+        with tempfile.SpooledTemporaryFile(
+            max_size=POSTGRES_COPY_SPOOL_MAX_BYTES
+        ) as buffer:
+            pg_cursor.copy_expert(copy_query, buffer)
+            buffer.seek(0)
+            return pd.read_csv(buffer, engine="pyarrow")
+    finally:
+        if pg_cursor:
+            pg_cursor.close()
+        release_connection(postgres_pool, pg_conn)
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
 
 
 def ensure_postgres_heartbeat_table(postgres_pool):
     pg_conn = get_connection(postgres_pool)
-    pg_cursor = pg_conn.cursor()
-
-    # Create test table
-    pg_cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS heartbeat (
-            id SERIAL PRIMARY KEY,
-            device_hostname TEXT NOT NULL,
-            message TEXT NOT NULL DEFAULT 'active',
-            date_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-        );
-        """
-    )
+    try:
+        pg_cursor = pg_conn.cursor()
+
+        # Create test table
+        pg_cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS heartbeat (
+                id SERIAL PRIMARY KEY,
+                device_hostname TEXT NOT NULL,
+                message TEXT NOT NULL DEFAULT 'active',
+                date_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
 
-    pg_conn.commit()
-    pg_cursor.close()
-    pg_conn.close()
+        pg_conn.commit()
+        pg_cursor.close()
+    finally:
+        release_connection(postgres_pool, pg_conn)
 
     print("Tables ensured.")
 
@@ -1,21 +1,40 @@
 # %%
 # Imports #
 
+import atexit
 import json
 import os
+import random
+import re
 import sys
+import threading
 import time
+import uuid
+from contextlib import contextmanager
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import snowflake.connector
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import serialization
 from dotenv import load_dotenv
+from snowflake.connector.constants import QueryStatus
+from snowflake.connector.errors import (
+    DatabaseError,
+    ForbiddenError,
+    InternalError,
+    NotSupportedError,
+    OperationalError,
+    ReauthenticationRequest,
+)
+from snowflake.connector.pandas_tools import write_pandas
 
 # append grandparent
 if __name__ == "__main__":
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from utils.cache_tools import QUERY_CACHE_DEFAULT_TTL_SECONDS, read_through_query_cache
 from utils.config_utils import grandparent_dir, query_dir
 from utils.display_tools import print_logger
 
@@ -31,11 +50,121 @@ if os.path.exists(user_dotenv_path):
     load_dotenv(user_dotenv_path)
 
 
+# %%
+# Variables #
+
+# idle sessions older than this are closed instead of reused
+SNOWFLAKE_SESSION_MAX_IDLE_SECONDS = int(
+    os.getenv("SNOWFLAKE_SESSION_MAX_IDLE_SECONDS", 30 * 60)
+)
+
+# idle sessions older than this run a cheap query before being reused
+SNOWFLAKE_SESSION_HEALTH_CHECK_SECONDS = 5 * 60
+
+# idle sessions kept per (cred_env_key, role, warehouse), extras are closed
+SNOWFLAKE_SESSION_MAX_IDLE_PER_KEY = 8
+
+# how often running async queries are polled for their status
+SNOWFLAKE_ASYNC_POLL_SECONDS = 1.0
+
+# failed query attempts wait a random time up to base * 2 ** attempt, capped
+SNOWFLAKE_RETRY_BASE_SECONDS = 10
+SNOWFLAKE_RETRY_MAX_SECONDS = 300
+
+# error codes that are fixed by a new session, like an expired session token
+SNOWFLAKE_RETRYABLE_ERRNOS = {390112, 390114}
+
+# a query whose attempt failed is only fetched by its query id when it
+# succeeded or is still running, in any other state it is run again
+SNOWFLAKE_RECOVER_QUERY_STATUSES = {QueryStatus.SUCCESS}
+
+# rows per staged Parquet file are picked to make files of about this size
+SNOWFLAKE_WRITE_CHUNK_BYTES = 100 * 1024 * 1024
+
+# write modes of write_df_to_snowflake
+SNOWFLAKE_WRITE_MODES = ["append", "replace", "merge"]
+
+# statements that leave state behind in their session, like USE, ALTER SESSION,
+# an open transaction or a temporary table, after optional leading comments
+SNOWFLAKE_SESSION_STATE_PATTERN = re.compile(
+    r"\A(?:\s+|--[^\n]*|/\*.*?\*/)*"
+    r"(?:USE|ALTER\s+SESSION|SET|UNSET|BEGIN|START\s+TRANSACTION|CALL"
+    r"|EXECUTE\s+IMMEDIATE"
+    r"|CREATE\s+(?:OR\s+REPLACE\s+)?(?:LOCAL\s+|GLOBAL\s+)?(?:TEMP|TEMPORARY|VOLATILE))\b",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# idle sessions per key as dicts of ctx and returned_at, see borrow_snowflake_session
+dict_snowflake_sessions = {}
+snowflake_sessions_lock = threading.Lock()
+
+# ids of borrowed sessions that ran a statement changing their state,
+# they are closed when returned instead of going back to the pool
+set_changed_snowflake_session_ids = set()
+
+dict_snowflake_session_stats = {
+    "logins": 0,
+    "login_seconds": 0.0,
+    "reuses": 0,
+    "evictions": 0,
+    "discarded": 0,
+    "query_retries": 0,
+    "query_recoveries": 0,
+    "retry_wasted_seconds": 0.0,
+}
+
 # %%
 # User Password Auth #
 
 
-def get_snowflake_credentials(cred_env_key, role, warehouse=""):
+def read_snowflake_creds(cred_env_key):
+    """
+    Reads the Snowflake credentials JSON from an environment variable.
+
+    Args:
+        cred_env_key (str): The environment variable holding the credentials.
+
+    Returns:
+        dict: The credentials, like user, account and warehouse.
+
+    Raises:
+        ValueError: If the environment variable is not set.
+    """
+    cred_env_value = os.getenv(cred_env_key)
+    if cred_env_value is None:
+        raise ValueError(f"Environment variable {cred_env_key} is not set.")
+    return json.loads(cred_env_value, strict=False)
+
+
+def get_snowflake_cache_identity(cred_env_key, role, warehouse=""):
+    """
+    Returns what a Snowflake query result depends on besides the query: the
+    account and user the credentials point to, the database and schema
+    unqualified names resolve against, the role and the warehouse.
+
+    Args:
+        cred_env_key (str): The environment variable holding the credentials.
+        role (str): The role the query runs as.
+        warehouse (str, optional): The warehouse, the credentials' warehouse
+            when empty. Defaults to an empty string.
+
+    Returns:
+        list: The connection identity for read_through_query_cache.
+    """
+    creds = read_snowflake_creds(cred_env_key)
+    return [
+        creds["account"].lower(),
+        creds["user"].lower(),
+        creds.get("database"),
+        creds.get("schema"),
+        role,
+        warehouse or creds.get("warehouse"),
+    ]
+
+
+def get_snowflake_credentials(
+    cred_env_key, role, warehouse="", client_session_keep_alive=False
+):
     """
     Retrieves Snowflake credentials and establishes a connection based on
         the account type, role type, and optional warehouse.
@@ -44,6 +173,8 @@ def get_snowflake_credentials(cred_env_key, role, warehouse=""):
         cred_env_key (str): The type of Snowflake account.
         role (str): The role type to use for the connection.
         warehouse (str, optional): The Snowflake warehouse to use. Defaults to an empty string.
+        client_session_keep_alive (bool, optional): Whether the connector keeps
+            the session alive with heartbeats while it is idle. Defaults to False.
 
     Returns:
         snowflake.connector.SnowflakeConnection: A Snowflake connection object.
@@ -52,10 +183,7 @@ def get_snowflake_credentials(cred_env_key, role, warehouse=""):
         KeyError: If the provided account type or role type does not exist in the predefined dictionaries.
         ValueError: If the Snowflake connection fails due to invalid credentials or other connection issues.
     """
-    cred_env_value = os.getenv(cred_env_key)
-    if cred_env_value is None:
-        raise ValueError(f"Environment variable {cred_env_key} is not set.")
-    creds = json.loads(cred_env_value, strict=False)
+    creds = read_snowflake_creds(cred_env_key)
 
     if warehouse == "":
         warehouse = creds["warehouse"]
@@ -76,6 +204,7 @@ def get_snowflake_credentials(cred_env_key, role, warehouse=""):
             warehouse=warehouse,
             role=role,
             authenticator="externalbrowser",
+            client_session_keep_alive=client_session_keep_alive,
         )
     elif "private_key" in creds.keys():
         print("Using private key")
@@ -101,6 +230,7 @@ def get_snowflake_credentials(cred_env_key, role, warehouse=""):
             warehouse=warehouse,
             role=role,
             private_key=der_private_key,
+            client_session_keep_alive=client_session_keep_alive,
         )
     else:
         ctx = snowflake.connector.connect(
@@ -109,6 +239,7 @@ def get_snowflake_credentials(cred_env_key, role, warehouse=""):
             account=creds["account"],
             warehouse=warehouse,
             role=role,
+            client_session_keep_alive=client_session_keep_alive,
         )
 
     print_logger(
@@ -123,6 +254,294 @@ def get_snowflake_credentials(cred_env_key, role, warehouse=""):
     return ctx
 
 
+# %%
+# Errors #
+
+
+def is_retryable_snowflake_error(error):
+    """
+    Checks if a failed query is worth retrying. SQL, permission, data and
+    login errors fail the same way every time, connection and server errors
+    usually pass on a later attempt. Errors that are not from Snowflake or
+    the network, like missing credentials, are not retried.
+
+    Args:
+        error (Exception): The error the query failed with.
+
+    Returns:
+        bool: True if the query should be retried.
+    """
+    if isinstance(error, ReauthenticationRequest):
+        return True
+    if getattr(error, "errno", None) in SNOWFLAKE_RETRYABLE_ERRNOS:
+        return True
+    if isinstance(error, (OperationalError, InternalError)):
+        return True
+    if isinstance(error, (DatabaseError, ForbiddenError)):
+        return False
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def is_recoverable_query(ctx, sfqid):
+    """
+    Checks if the results of a query from a failed attempt can be fetched by
+    its query id, which is only the case when it succeeded or is still running.
+    A query that failed, was aborted or is in any other end state has to be
+    run again.
+
+    Args:
+        ctx (snowflake.connector.SnowflakeConnection): The Snowflake connection.
+        sfqid (str): The query id of the earlier attempt.
+
+    Returns:
+        bool: True if the results should be fetched by query id.
+    """
+    status = ctx.get_query_status(sfqid)
+    return status in SNOWFLAKE_RECOVER_QUERY_STATUSES or ctx.is_still_running(status)
+
+
+def get_retry_delay(attempt):
+    """
+    Returns a random delay up to an exponentially growing cap, so retries
+    from many jobs do not hit Snowflake at the same moment.
+
+    Args:
+        attempt (int): The number of attempts that failed so far, from 1.
+
+    Returns:
+        float: The seconds to wait before the next attempt.
+    """
+    return random.uniform(
+        0,
+        min(
+            SNOWFLAKE_RETRY_MAX_SECONDS,
+            SNOWFLAKE_RETRY_BASE_SECONDS * 2 ** (attempt - 1),
+        ),
+    )
+
+
+# %%
+# Session Pool #
+
+
+def add_snowflake_session_stat(name, value=1):
+    """Adds to one of the pool counters, borrowers can run on several threads."""
+    with snowflake_sessions_lock:
+        dict_snowflake_session_stats[name] += value
+
+
+def is_snowflake_session_healthy(ctx, idle_seconds):
+    """
+    Checks if an idle session can be reused, running a cheap query when it
+    has been idle long enough that the server may have dropped it.
+
+    Args:
+        ctx (snowflake.connector.SnowflakeConnection): The idle session.
+        idle_seconds (float): How long the session has been idle.
+
+    Returns:
+        bool: True if the session can be reused.
+    """
+    if ctx.is_closed():
+        return False
+    if idle_seconds < SNOWFLAKE_SESSION_HEALTH_CHECK_SECONDS:
+        return True
+    try:
+        cs = ctx.cursor()
+        try:
+            cs.execute("SELECT 1")
+        finally:
+            cs.close()
+        return True
+    except Exception as e:
+        print_logger(f"Snowflake session failed its health check: {e}", level="debug")
+        return False
+
+
+def close_snowflake_session(ctx):
+    """Closes a session, ignoring errors from sessions the server already dropped."""
+    try:
+        ctx.close()
+    except Exception as e:
+        print_logger(f"Error closing Snowflake session: {e}", level="debug")
+
+
+def borrow_snowflake_session(cred_env_key, role, warehouse=""):
+    """
+    Takes an idle session for the credentials, role and warehouse from the
+    pool, or logs in when there is no healthy one. The session must be given
+    back with return_snowflake_session, or use the snowflake_session context
+    manager which does both.
+
+    Args:
+        cred_env_key (str): The type of Snowflake account.
+        role (str): The role type to use for the connection.
+        warehouse (str, optional): The Snowflake warehouse to use. Defaults to an empty string.
+
+    Returns:
+        snowflake.connector.SnowflakeConnection: A Snowflake connection object.
+    """
+    key = (cred_env_key, role, warehouse)
+
+    while True:
+        with snowflake_sessions_lock:
+            ls_idle_sessions = dict_snowflake_sessions.get(key, [])
+            dict_session = ls_idle_sessions.pop() if ls_idle_sessions else None
+        if dict_session is None:
+            break
+
+        idle_seconds = time.time() - dict_session["returned_at"]
+        if idle_seconds > SNOWFLAKE_SESSION_MAX_IDLE_SECONDS:
+            add_snowflake_session_stat("evictions")
+            close_snowflake_session(dict_session["ctx"])
+            continue
+        if not is_snowflake_session_healthy(dict_session["ctx"], idle_seconds):
+            add_snowflake_session_stat("discarded")
+            close_snowflake_session(dict_session["ctx"])
+            continue
+
+        add_snowflake_session_stat("reuses")
+        return dict_session["ctx"]
+
+    start_time = time.time()
+    ctx = get_snowflake_credentials(
+        cred_env_key, role, warehouse=warehouse, client_session_keep_alive=True
+    )
+    if ctx is None:
+        raise Exception("Failed to establish Snowflake connection.")
+    add_snowflake_session_stat("logins")
+    add_snowflake_session_stat("login_seconds", time.time() - start_time)
+    return ctx
+
+
+def track_snowflake_session_state(ctx, query):
+    """
+    Marks a borrowed session to be closed instead of pooled when it runs a
+    statement that changes its state, so the next borrower of the pool entry
+    never gets another role, warehouse, schema, session parameter, open
+    transaction or temporary table.
+
+    Args:
+        ctx (snowflake.connector.SnowflakeConnection): The borrowed session.
+        query (str): The statement about to run on it.
+    """
+    if SNOWFLAKE_SESSION_STATE_PATTERN.match(query):
+        with snowflake_sessions_lock:
+            set_changed_snowflake_session_ids.add(id(ctx))
+
+
+def return_snowflake_session(cred_env_key, role, warehouse, ctx, discard=False):
+    """
+    Gives a borrowed session back to the pool. Sessions whose state was
+    changed, see track_snowflake_session_state, are closed instead.
+
+    Args:
+        cred_env_key (str): The type of Snowflake account.
+        role (str): The role type the session was borrowed with.
+        warehouse (str): The warehouse the session was borrowed with.
+        ctx (snowflake.connector.SnowflakeConnection): The borrowed session.
+        discard (bool, optional): Whether to close the session instead, for
+            sessions that may be broken. Defaults to False.
+    """
+    key = (cred_env_key, role, warehouse)
+    with snowflake_sessions_lock:
+        if id(ctx) in set_changed_snowflake_session_ids:
+            set_changed_snowflake_session_ids.remove(id(ctx))
+            discard = True
+    if not discard and not ctx.is_closed():
+        with snowflake_sessions_lock:
+            ls_idle_sessions = dict_snowflake_sessions.setdefault(key, [])
+            if len(ls_idle_sessions) < SNOWFLAKE_SESSION_MAX_IDLE_PER_KEY:
+                ls_idle_sessions.append({"ctx": ctx, "returned_at": time.time()})
+                return
+    add_snowflake_session_stat("discarded")
+    close_snowflake_session(ctx)
+
+
+@contextmanager
+def snowflake_session(cred_env_key, role, warehouse=""):
+    """
+    Borrows a pooled session for the duration of a with block. The session
+    goes back to the pool afterwards, unless the block failed, in which case
+    it may be broken or left mid way through a change and is closed.
+    A streaming generator that is closed early gives its session back.
+
+    Args:
+        cred_env_key (str): The type of Snowflake account.
+        role (str): The role type to use for the connection.
+        warehouse (str, optional): The Snowflake warehouse to use. Defaults to an empty string.
+
+    Yields:
+        snowflake.connector.SnowflakeConnection: A Snowflake connection object.
+    """
+    ctx = borrow_snowflake_session(cred_env_key, role, warehouse=warehouse)
+    try:
+        yield ctx
+    except GeneratorExit:
+        return_snowflake_session(cred_env_key, role, warehouse, ctx)
+        raise
+    except BaseException:
+        return_snowflake_session(cred_env_key, role, warehouse, ctx, discard=True)
+        raise
+    else:
+        return_snowflake_session(cred_env_key, role, warehouse, ctx)
+
+
+def close_snowflake_sessions():
+    """
+    Closes every idle session in the pool.
+
+    Returns:
+        int: The number of sessions closed.
+    """
+    with snowflake_sessions_lock:
+        ls_sessions = [
+            dict_session
+            for ls_idle_sessions in dict_snowflake_sessions.values()
+            for dict_session in ls_idle_sessions
+        ]
+        dict_snowflake_sessions.clear()
+    for dict_session in ls_sessions:
+        close_snowflake_session(dict_session["ctx"])
+    return len(ls_sessions)
+
+
+def get_snowflake_session_stats():
+    """
+    Returns how many logins the pool made, the time they took, how often a
+    session was reused instead and how much time query retries cost.
+
+    Returns:
+        dict: A copy of the pool counters.
+    """
+    return dict(dict_snowflake_session_stats)
+
+
+def print_snowflake_session_summary():
+    """Logs the login overhead of the process, if it used Snowflake at all."""
+    dict_stats = get_snowflake_session_stats()
+    if not dict_stats["logins"]:
+        return
+    print_logger(
+        f"Snowflake sessions: {dict_stats['logins']} logins took "
+        f"{dict_stats['login_seconds']:.1f}s, {dict_stats['reuses']} reuses, "
+        f"{dict_stats['evictions']} idle evictions, {dict_stats['discarded']} discarded, "
+        f"{dict_stats['query_retries']} query retries wasting "
+        f"{dict_stats['retry_wasted_seconds']:.1f}s, "
+        f"{dict_stats['query_recoveries']} results recovered by query id",
+        level="info",
+    )
+
+
+def shutdown_snowflake_sessions():
+    """Reports the pool summary and closes the pooled sessions at exit."""
+    print_snowflake_session_summary()
+    close_snowflake_sessions()
+
+
+atexit.register(shutdown_snowflake_sessions)
+
+
 # %%
 # Get Raw Data from Snowflake #
 
@@ -142,16 +561,13 @@ def list_tables(cred_env_key, role, limit=10000):
         KeyError: If the provided account type or role type does not exist in the predefined dictionaries.
         ValueError: If the Snowflake connection fails due to invalid credentials or other connection issues.
     """
-    ctx = get_snowflake_credentials(cred_env_key, role)
-
-    cs = ctx.cursor()
-
-    try:
-        cs.execute(f"SHOW TABLES LIMIT {limit}")
-        tables = cs.fetchall()
-    finally:
-        cs.close()
-    ctx.close()
+    with snowflake_session(cred_env_key, role) as ctx:
+        cs = ctx.cursor()
+        try:
+            cs.execute(f"SHOW TABLES LIMIT {limit}")
+            tables = cs.fetchall()
+        finally:
+            cs.close()
 
     for table in tables:
         print(table)
@@ -163,9 +579,15 @@ def query_snowflake(
     query_to_run: str,
     warehouse: str = "",
     max_retries: int = 5,
+    params=None,
+    cache=False,
+    cache_ttl_seconds: int = QUERY_CACHE_DEFAULT_TTL_SECONDS,
 ) -> pd.DataFrame:
     """
     Executes a query on Snowflake and retrieves the results, with retry logic for handling failures.
+    Only connection and server errors are retried, with jittered backoff. When a
+    failed attempt has a query id, the next attempt fetches its results instead
+    of running the query again.
 
     Args:
         cred_env_key (str): The type of Snowflake account.
@@ -173,28 +595,69 @@ def query_snowflake(
         query_to_run (str): The SQL query to execute.
         warehouse (str, optional): The Snowflake warehouse to use. Defaults to an empty string.
         max_retries (int, optional): The maximum number of retries in case of query failure. Defaults to 5.
+        params (optional): Parameters bound to the query by the connector.
+        cache (bool or str, optional): True reuses a cached result younger than
+            cache_ttl_seconds, "refresh" runs the query and overwrites the cache.
+            Defaults to False.
+        cache_ttl_seconds (int, optional): Max age of a cached result. Defaults to a day.
 
     Returns:
         pd.DataFrame: A DataFrame containing the query results.
         If the query returns no data, an empty DataFrame is returned.
 
     Raises:
-        Exception: If all retries fail or if the connection cannot be established.
+        Exception: If all retries fail, the error is not retryable or the
+            connection cannot be established.
     """
+    if cache is not False:
+        return read_through_query_cache(
+            "snowflake",
+            get_snowflake_cache_identity(cred_env_key, role, warehouse),
+            query_to_run,
+            lambda: query_snowflake(
+                cred_env_key,
+                role,
+                query_to_run,
+                warehouse=warehouse,
+                max_retries=max_retries,
+                params=params,
+            ),
+            params=params,
+            cache=cache,
+            cache_ttl_seconds=cache_ttl_seconds,
+        )
+
     print_logger(f"Running query: {query_to_run}", level="info")
 
     attempt = 0
-    delay = 60  # Start with a 1-minute delay
+    sfqid = None
+    start_time = time.time()
 
     while attempt <= max_retries:
-        ctx = get_snowflake_credentials(cred_env_key, role, warehouse=warehouse)
-        if ctx is None:
-            raise Exception("Failed to establish Snowflake connection.")
-
-        cs = ctx.cursor()
+        attempt_start_time = time.time()
+        cs = None
         try:
-            cs.execute(query_to_run)
-            query_output = cs.fetch_pandas_all()
+            with snowflake_session(cred_env_key, role, warehouse=warehouse) as ctx:
+                cs = ctx.cursor()
+                try:
+                    if sfqid is not None and not is_recoverable_query(ctx, sfqid):
+                        print_logger(
+                            f"Query {sfqid} did not succeed, running it again",
+                            level="warning",
+                        )
+                        sfqid = None
+
+                    if sfqid is None:
+                        track_snowflake_session_state(ctx, query_to_run)
+                        cs.execute(query_to_run, params)
+                    else:
+                        # the query may have finished server side, fetch it instead
+                        print_logger(f"Fetching results of query {sfqid}")
+                        cs.get_results_from_sfqid(sfqid)
+                        add_snowflake_session_stat("query_recoveries")
+                    query_output = cs.fetch_pandas_all()
+                finally:
+                    cs.close()
 
             if query_output is None:
                 raise Exception("Snowflake returned None instead of a DataFrame.")
@@ -204,23 +667,32 @@ def query_snowflake(
                     f"Unexpected return type from Snowflake: {type(query_output)}"
                 )
 
+            if attempt:
+                print_logger(
+                    f"Query succeeded after {attempt + 1} attempts and "
+                    f"{time.time() - start_time:.1f}s",
+                    level="info",
+                )
             return query_output
 
         except Exception as e:
+            sfqid = getattr(e, "sfqid", None) or getattr(cs, "sfqid", None) or sfqid
             attempt += 1
+            if not is_retryable_snowflake_error(e):
+                raise Exception(f"Query failed with a non retryable error: {e}") from e
             if attempt > max_retries:
                 raise Exception(f"Query failed after {max_retries} retries: {e}") from e
 
+            delay = get_retry_delay(attempt)
             print_logger(
-                f"Snowflake query attempt {attempt} failed: {e}. Retrying in {delay / 60:.2f} minutes...",
+                f"Snowflake query attempt {attempt} failed: {e}. Retrying in {delay:.0f} seconds...",
                 level="warning",
             )
             time.sleep(delay)
-            delay = min(600, delay * 2)
-
-        finally:
-            cs.close()
-            ctx.close()
+            add_snowflake_session_stat("query_retries")
+            add_snowflake_session_stat(
+                "retry_wasted_seconds", time.time() - attempt_start_time
+            )
 
     raise Exception("Unexpected exit from retry loop. This should never happen.")
 
@@ -232,7 +704,9 @@ def executeScriptsFromFile(
     multi_part=False,
 ):
     """
-    Executes SQL commands from a file on Snowflake.
+    Executes SQL commands from a file on Snowflake, in order on one session so
+    statements like USE or BEGIN apply to the ones after them. The commands
+    are not retried, a retry on a new session would lose that state.
 
     Args:
         cred_env_key (str): The type of Snowflake account.
@@ -258,11 +732,488 @@ def executeScriptsFromFile(
     else:
         sqlCommands = [sqlFile]
 
-    # Execute every command from the input file
-    for command in sqlCommands:
-        result = query_snowflake(cred_env_key, role, command)
+    # Execute every command from the input file on one borrowed session
+    result = None
+    with snowflake_session(cred_env_key, role) as ctx:
+        cs = ctx.cursor()
+        try:
+            for command in sqlCommands:
+                if not command.strip():
+                    continue
+                print_logger(f"Running query: {command}", level="info")
+                track_snowflake_session_state(ctx, command)
+                cs.execute(command)
+                try:
+                    result = cs.fetch_pandas_all()
+                except NotSupportedError:
+                    # statements like DDL return their status as json, not arrow
+                    result = pd.DataFrame(
+                        cs.fetchall(), columns=[column[0] for column in cs.description]
+                    )
+        finally:
+            cs.close()
 
     return result
 
 
+# %%
+# Write Data to Snowflake #
+
+
+def quote_snowflake_identifier(name):
+    """Quotes an identifier the way write_pandas does, keeping its case."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def get_snowflake_table_path(table_name, database=None, schema=None):
+    """
+    Builds the quoted, optionally qualified name of a table.
+
+    Args:
+        table_name (str): The name of the table.
+        database (str, optional): The database of the table.
+        schema (str, optional): The schema of the table.
+
+    Returns:
+        str: The name to use in SQL, like "DB"."SCHEMA"."TABLE".
+    """
+    return ".".join(
+        quote_snowflake_identifier(name)
+        for name in [database, schema, table_name]
+        if name
+    )
+
+
+def get_write_chunk_rows(df, chunk_bytes=SNOWFLAKE_WRITE_CHUNK_BYTES):
+    """
+    Estimates how many rows of a DataFrame make a chunk of about chunk_bytes
+    in memory, from a sample so wide string frames are not scanned in full.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to write.
+        chunk_bytes (int): The target size of a chunk.
+
+    Returns:
+        int: The number of rows per chunk.
+    """
+    df_sample = df.head(10000)
+    if df_sample.empty:
+        return 1
+    bytes_per_row = df_sample.memory_usage(deep=True, index=False).sum() / len(
+        df_sample
+    )
+    return max(1, int(chunk_bytes / max(bytes_per_row, 1)))
+
+
+def get_merge_query(target_path, source_path, ls_columns, ls_key_columns):
+    """
+    Builds a MERGE that updates the rows of the target matching the source on
+    the key columns and inserts the rest.
+
+    Args:
+        target_path (str): The quoted name of the table to merge into.
+        source_path (str): The quoted name of the table with the new rows.
+        ls_columns (list): Every column of the source.
+        ls_key_columns (list): The columns that identify a row.
+
+    Returns:
+        str: The MERGE statement.
+    """
+    ls_quoted_columns = [quote_snowflake_identifier(col) for col in ls_columns]
+    ls_update_columns = [
+        quote_snowflake_identifier(col)
+        for col in ls_columns
+        if col not in ls_key_columns
+    ]
+    on_clause = " AND ".join(
+        f"t.{quote_snowflake_identifier(col)} = s.{quote_snowflake_identifier(col)}"
+        for col in ls_key_columns
+    )
+
+    query = f"MERGE INTO {target_path} t USING {source_path} s ON {on_clause}"
+    if ls_update_columns:
+        query += " WHEN MATCHED THEN UPDATE SET " + ", ".join(
+            f"t.{col} = s.{col}" for col in ls_update_columns
+        )
+    query += (
+        f" WHEN NOT MATCHED THEN INSERT ({', '.join(ls_quoted_columns)})"
+        f" VALUES ({', '.join('s.' + col for col in ls_quoted_columns)})"
+    )
+    return query
+
+
+def write_df_to_snowflake(
+    cred_env_key: str,
+    role: str,
+    df: pd.DataFrame,
+    table_name: str,
+    mode: str = "append",
+    key_columns: list = None,
+    database: str = None,
+    schema: str = None,
+    warehouse: str = "",
+    chunk_bytes: int = SNOWFLAKE_WRITE_CHUNK_BYTES,
+    parallel: int = 8,
+) -> int:
+    """
+    Bulk loads a DataFrame into a Snowflake table with write_pandas, which
+    writes the DataFrame as Parquet files, PUTs them to the table stage in
+    parallel and loads them with one COPY INTO. The table is created when it
+    does not exist, column names are used as they are, case sensitive.
+
+    Args:
+        cred_env_key (str): The type of Snowflake account.
+        role (str): The role type to use for the connection.
+        df (pd.DataFrame): The DataFrame to write.
+        table_name (str): The name of the table to write to.
+        mode (str, optional): "append" adds the rows, "replace" swaps the table
+            for one with only these rows, "merge" updates the rows matching on
+            key_columns and inserts the rest. Defaults to "append".
+        key_columns (list, optional): The columns that identify a row, required
+            for "merge".
+        database (str, optional): The database of the table, defaults to the
+            session's database.
+        schema (str, optional): The schema of the table, defaults to the
+            session's schema.
+        warehouse (str, optional): The Snowflake warehouse to use. Defaults to an empty string.
+        chunk_bytes (int, optional): The approximate in memory size of each
+            staged file. Defaults to 100MB.
+        parallel (int, optional): The number of threads uploading files. Defaults to 8.
+
+    Returns:
+        int: The number of rows written.
+    """
+    if mode not in SNOWFLAKE_WRITE_MODES:
+        raise ValueError(f"mode must be one of {SNOWFLAKE_WRITE_MODES}, got {mode}")
+    if mode == "merge":
+        if not key_columns:
+            raise ValueError("key_columns are required to merge")
+        ls_missing_columns = [col for col in key_columns if col not in df.columns]
+        if ls_missing_columns:
+            raise ValueError(f"key_columns {ls_missing_columns} are not in the df")
+
+    start_time = time.time()
+    dict_write_options = {
+        "database": database,
+        "schema": schema,
+        "chunk_size": get_write_chunk_rows(df, chunk_bytes),
+        "parallel": parallel,
+        "auto_create_table": True,
+        "use_logical_type": True,
+    }
+
+    with snowflake_session(cred_env_key, role, warehouse=warehouse) as ctx:
+        if mode != "merge":
+            success, num_chunks, num_rows, _ = write_pandas(
+                ctx,
+                df,
+                table_name,
+                overwrite=mode == "replace",
+                **dict_write_options,
+            )
+        else:
+            # a temporary table lives only in this session and is dropped with it
+            stage_table_name = f"{table_name}_MERGE_{uuid.uuid4().hex[:8].upper()}"
+            stage_table_path = get_snowflake_table_path(
+                stage_table_name, database, schema
+            )
+            cs = ctx.cursor()
+            try:
+                success, num_chunks, num_rows, _ = write_pandas(
+                    ctx,
+                    df,
+                    stage_table_name,
+                    table_type="temporary",
+                    **dict_write_options,
+                )
+                if success:
+                    # creates the target with the staged columns on the first merge
+                    cs.execute(
+                        "CREATE TABLE IF NOT EXISTS "
+                        f"{get_snowflake_table_path(table_name, database, schema)} "
+                        f"LIKE {stage_table_path}"
+                    )
+                    cs.execute(
+                        get_merge_query(
+                            get_snowflake_table_path(table_name, database, schema),
+                            stage_table_path,
+                            list(df.columns),
+                            list(key_columns),
+                        )
+                    )
+            finally:
+                cs.execute(f"DROP TABLE IF EXISTS {stage_table_path}")
+                cs.close()
+
+    if not success:
+        raise Exception(f"Writing {len(df)} rows to {table_name} failed")
+
+    print_logger(
+        f"Wrote {num_rows} rows to {table_name} with mode {mode} in {num_chunks} "
+        f"files and {time.time() - start_time:.1f}s",
+        level="info",
+    )
+    return num_rows
+
+
+# %%
+# Concurrent Queries #
+
+
+def iter_query_snowflake_async(
+    cred_env_key: str,
+    role: str,
+    dict_queries: dict,
+    warehouse: str = "",
+    max_concurrent: int = 8,
+):
+    """
+    Submits queries with execute_async so they run at the same time on
+    Snowflake, and yields each result as soon as its query finishes. At most
+    max_concurrent queries run at once, the rest are submitted as earlier
+    ones finish. Queries still running when the generator is closed early
+    are cancelled.
+
+    Args:
+        cred_env_key (str): The type of Snowflake account.
+        role (str): The role type to use for the connection.
+        dict_queries (dict or list): The queries to run keyed by a name, a
+            list is keyed by position.
+        warehouse (str, optional): The Snowflake warehouse to use. Defaults to an empty string.
+        max_concurrent (int, optional): The max number of queries running at once.
+
+    Yields:
+        tuple: (name, DataFrame or None, exception or None) per finished query.
+    """
+    if not isinstance(dict_queries, dict):
+        dict_queries = dict(enumerate(dict_queries))
+
+    ls_pending_names = list(dict_queries)
+    dict_running = {}  # name -> (sfqid, start time)
+
+    with snowflake_session(cred_env_key, role, warehouse=warehouse) as ctx:
+        cs = ctx.cursor()
+        try:
+            while ls_pending_names or dict_running:
+                while ls_pending_names and len(dict_running) < max_concurrent:
+                    name = ls_pending_names.pop(0)
+                    try:
+                        track_snowflake_session_state(ctx, dict_queries[name])
+                        cs.execute_async(dict_queries[name])
+                    except Exception as e:
+                        yield name, None, e
+                        continue
+                    dict_running[name] = (cs.sfqid, time.time())
+                    print_logger(f"Submitted query {name} as {cs.sfqid}", level="info")
+
+                ls_finished = []
+                for name, (sfqid, start_time) in list(dict_running.items()):
+                    try:
+                        status = ctx.get_query_status_throw_if_error(sfqid)
+                        if ctx.is_still_running(status):
+                            continue
+                        cs.get_results_from_sfqid(sfqid)
+                        df, error = cs.fetch_pandas_all(), None
+                    except Exception as e:
+                        df, error = None, e
+                    del dict_running[name]
+                    print_logger(
+                        f"Query {name} {'failed' if error else 'finished'} "
+                        f"after {time.time() - start_time:.1f}s",
+                        level="warning" if error else "info",
+                    )
+                    ls_finished.append((name, df, error))
+
+                yield from ls_finished
+                if dict_running and not ls_finished:
+                    time.sleep(SNOWFLAKE_ASYNC_POLL_SECONDS)
+        finally:
+            for name, (sfqid, _) in dict_running.items():
+                print_logger(f"Cancelling query {name} ({sfqid})", level="warning")
+                try:
+                    cs.execute(f"SELECT SYSTEM$CANCEL_QUERY('{sfqid}')")
+                except Exception as e:
+                    print_logger(
+                        f"Could not cancel query {sfqid}: {e}", level="warning"
+                    )
+            cs.close()
+
+
+def query_snowflake_many(
+    cred_env_key: str,
+    role: str,
+    dict_queries: dict,
+    warehouse: str = "",
+    max_concurrent: int = 8,
+) -> dict:
+    """
+    Runs independent queries concurrently on Snowflake, so the total time is
+    about that of the slowest query instead of the sum of all of them.
+
+    Args:
+        cred_env_key (str): The type of Snowflake account.
+        role (str): The role type to use for the connection.
+        dict_queries (dict or list): The queries to run keyed by a name, a
+            list is keyed by position.
+        warehouse (str, optional): The Snowflake warehouse to use. Defaults to an empty string.
+        max_concurrent (int, optional): The max number of queries running at once.
+
+    Returns:
+        dict: The name of each query mapped to its results DataFrame.
+
+    Raises:
+        Exception: If any query failed, after every query has finished, with
+            the first failure as its cause.
+    """
+    dict_results = {}
+    dict_errors = {}
+    for name, df, error in iter_query_snowflake_async(
+        cred_env_key,
+        role,
+        dict_queries,
+        warehouse=warehouse,
+        max_concurrent=max_concurrent,
+    ):
+        if error is not None:
+            dict_errors[name] = error
+        else:
+            dict_results[name] = df
+
+    if dict_errors:
+        name, error = next(iter(dict_errors.items()))
+        raise Exception(
+            f"{len(dict_errors)} of {len(dict_errors) + len(dict_results)} queries "
+            f"failed: {list(dict_errors)}, first error in {name}: {error}"
+        ) from error
+
+    return dict_results
+
+
+# %%
+# Streaming Results #
+
+
+def normalize_arrow_table(table):
+    """
+    Casts every integer column to int64. Snowflake picks the narrowest
+    integer type that fits each result batch, so the same NUMBER column can
+    arrive as int8 in one batch and int64 in the next.
+
+    Args:
+        table (pyarrow.Table): A result batch.
+
+    Returns:
+        pyarrow.Table: The batch with one integer width.
+    """
+    schema = pa.schema(
+        [
+            field.with_type(pa.int64()) if pa.types.is_integer(field.type) else field
+            for field in table.schema
+        ]
+    )
+    if schema.equals(table.schema):
+        return table
+    return table.cast(schema)
+
+
+def query_snowflake_batches(
+    cred_env_key: str,
+    role: str,
+    query_to_run: str,
+    warehouse: str = "",
+    as_arrow: bool = False,
+):
+    """
+    Executes a query on Snowflake and yields the results one batch at a time,
+    so only one batch is held in memory. The pooled session is held until the
+    generator is exhausted or closed.
+
+    Args:
+        cred_env_key (str): The type of Snowflake account.
+        role (str): The role type to use for the connection.
+        query_to_run (str): The SQL query to execute.
+        warehouse (str, optional): The Snowflake warehouse to use. Defaults to an empty string.
+        as_arrow (bool, optional): Whether to yield pyarrow Tables instead of
+            DataFrames. Defaults to False.
+
+    Yields:
+        pd.DataFrame or pyarrow.Table: The next batch of results.
+    """
+    print_logger(f"Streaming query: {query_to_run}", level="info")
+
+    with snowflake_session(cred_env_key, role, warehouse=warehouse) as ctx:
+        cs = ctx.cursor()
+        try:
+            track_snowflake_session_state(ctx, query_to_run)
+            cs.execute(query_to_run)
+            if as_arrow:
+                is_empty = True
+                for table in cs.fetch_arrow_batches():
+                    is_empty = False
+                    yield normalize_arrow_table(table)
+                if is_empty:
+                    # an empty table still carries the columns of the result
+                    yield cs.fetch_arrow_all(force_return_table=True)
+            else:
+                yield from cs.fetch_pandas_batches()
+        finally:
+            cs.close()
+
+
+def query_snowflake_to_parquet(
+    cred_env_key: str,
+    role: str,
+    query_to_run: str,
+    path: str,
+    warehouse: str = "",
+    compression: str = "snappy",
+) -> int:
+    """
+    Executes a query on Snowflake and writes the Arrow result batches straight
+    to a Parquet file, one row group per batch, so peak memory stays at one
+    batch. The file is written to a temp path first and only replaces path
+    once complete.
+
+    Args:
+        cred_env_key (str): The type of Snowflake account.
+        role (str): The role type to use for the connection.
+        query_to_run (str): The SQL query to execute.
+        path (str): The path of the Parquet file to write.
+        warehouse (str, optional): The Snowflake warehouse to use. Defaults to an empty string.
+        compression (str, optional): The Parquet compression codec. Defaults to "snappy".
+
+    Returns:
+        int: The number of rows written.
+    """
+    temp_path = path + ".tmp"
+    writer = None
+    num_rows = 0
+    num_batches = 0
+    try:
+        for table in query_snowflake_batches(
+            cred_env_key, role, query_to_run, warehouse=warehouse, as_arrow=True
+        ):
+            if writer is None:
+                writer = pq.ParquetWriter(
+                    temp_path, table.schema, compression=compression
+                )
+            elif not table.schema.equals(writer.schema):
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+            num_rows += table.num_rows
+            num_batches += 1
+
+        writer.close()
+        writer = None
+        os.replace(temp_path, path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    print_logger(f"Wrote {num_rows} rows in {num_batches} batches to {path}")
+    return num_rows
+
+
 # %%
@@ -0,0 +1,148 @@
+# %%
+# Imports #
+
+import tempfile
+import time
+
+import config_test_utils  # noqa F401
+import pandas as pd
+import src.utils.cache_tools as cache_tools
+from src.utils.cache_tools import (
+    clear_query_cache,
+    get_query_cache_key,
+    normalize_sql,
+    read_through_query_cache,
+)
+from src.utils.display_tools import print_logger
+
+# %%
+# Tests #
+
+
+def test_normalize_sql():
+    assert normalize_sql("  select 1;  ") == "select 1"
+    assert normalize_sql("\nselect 1\n") == "select 1"
+
+
+def test_get_query_cache_key():
+    identity = ["account", "role"]
+    key = get_query_cache_key("snowflake", identity, "select 1")
+
+    assert key == get_query_cache_key("snowflake", identity, " select 1; ")
+    assert key != get_query_cache_key("postgres", identity, "select 1")
+    assert key != get_query_cache_key("snowflake", ["account"], "select 1")
+    assert key != get_query_cache_key("snowflake", identity, "select 1", [1])
+    assert key != get_query_cache_key("snowflake", identity, "select 2")
+
+
+def test_get_query_cache_key_differs_by_literal():
+    identity = ["account", "role"]
+    ls_query_pairs = [
+        (
+            "select * from t where name = 'O\\'Brien -- 1'",
+            "select * from t where name = 'O\\'Brien -- 2'",
+        ),
+        ("select $$ a -- b $$", "select $$ a -- c $$"),
+        ("select 'a  b'", "select 'a b'"),
+    ]
+    for query_1, query_2 in ls_query_pairs:
+        assert get_query_cache_key("snowflake", identity, query_1) != (
+            get_query_cache_key("snowflake", identity, query_2)
+        ), f"{query_1} and {query_2} share a cache key"
+
+
+def run_with_temp_query_cache(test_func):
+    original_query_cache_dir = cache_tools.query_cache_dir
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache_tools.query_cache_dir = temp_dir
+        try:
+            test_func()
+        finally:
+            cache_tools.query_cache_dir = original_query_cache_dir
+
+
+def get_counting_fetch_df():
+    dict_calls = {"count": 0}
+
+    def fetch_df():
+        dict_calls["count"] += 1
+        return pd.DataFrame({"run": [dict_calls["count"]]})
+
+    return fetch_df, dict_calls
+
+
+def check_query_cache_ttl():
+    fetch_df, dict_calls = get_counting_fetch_df()
+    for _ in range(2):
+        df = read_through_query_cache(
+            "snowflake", ["account"], "select 1", fetch_df, cache=True
+        )
+    assert dict_calls["count"] == 1
+    assert df["run"].tolist() == [1]
+
+    time.sleep(0.01)
+    df = read_through_query_cache(
+        "snowflake", ["account"], "select 1", fetch_df, cache=True, cache_ttl_seconds=0
+    )
+    assert dict_calls["count"] == 2
+    assert df["run"].tolist() == [2]
+
+
+def check_query_cache_refresh():
+    fetch_df, dict_calls = get_counting_fetch_df()
+    read_through_query_cache("snowflake", ["account"], "select 1", fetch_df, cache=True)
+    df = read_through_query_cache(
+        "snowflake", ["account"], "select 1", fetch_df, cache="refresh"
+    )
+    assert dict_calls["count"] == 2
+    assert df["run"].tolist() == [2]
+
+    # the refreshed result replaces the cached one
+    df = read_through_query_cache(
+        "snowflake", ["account"], "select 1", fetch_df, cache=True
+    )
+    assert dict_calls["count"] == 2
+    assert df["run"].tolist() == [2]
+
+
+def check_clear_query_cache():
+    fetch_df, dict_calls = get_counting_fetch_df()
+    for source in ["snowflake", "postgres"]:
+        read_through_query_cache(source, ["account"], "select 1", fetch_df, cache=True)
+
+    assert clear_query_cache("snowflake") == 1
+    read_through_query_cache("postgres", ["account"], "select 1", fetch_df, cache=True)
+    assert dict_calls["count"] == 2
+    read_through_query_cache("snowflake", ["account"], "select 1", fetch_df, cache=True)
+    assert dict_calls["count"] == 3
+
+    assert clear_query_cache() == 2
+
+
+def test_query_cache_ttl():
+    run_with_temp_query_cache(check_query_cache_ttl)
+
+
+def test_query_cache_refresh():
+    run_with_temp_query_cache(check_query_cache_refresh)
+
+
+def test_clear_query_cache():
+    run_with_temp_query_cache(check_clear_query_cache)
+
+
+# %%
+# Main #
+
+if __name__ == "__main__":
+    test_normalize_sql()
+    test_get_query_cache_key()
+    test_get_query_cache_key_differs_by_literal()
+    test_query_cache_ttl()
+    test_query_cache_refresh()
+    test_clear_query_cache()
+
+    print_logger("All tests passed!")
+
+
+# %%
@@ -1,6 +1,7 @@
 # %%
 # Imports #
 
+import base64
 import datetime
 import os
 import time
@@ -11,9 +12,12 @@ from dotenv import load_dotenv
 from src.utils.display_tools import print_logger
 from src.utils.gmail_tools import (
     get_attachment_from_search_string,
+    get_email_addresses_df,
     get_email_addresses_from_search_string,
     get_gmail_service,
+    get_synced_messages_df,
     send_email,
+    sync_messages_from_search_string,
 )
 
 # %%
@@ -95,6 +99,56 @@ def test_get_attachment_from_search_string():
     assert os.path.join(data_dir, "test_send_email.csv") in ls_paths_with_file_names
 
 
+def test_sync_messages_from_search_string():
+    today_date = datetime.datetime.now().strftime("%Y-%m-%d")
+    gmail_search_string = f"Gmail Test Python after:{today_date}"
+
+    df_full = sync_messages_from_search_string(gmail_search_string, full_sync=True)
+    # nothing new between two back to back syncs
+    df_new = sync_messages_from_search_string(gmail_search_string)
+    df_synced = get_synced_messages_df(gmail_search_string, sync=False)
+
+    print(df_synced)
+    assert len(df_new) == 0
+    assert set(df_full["message_id"]) == set(df_synced["message_id"])
+
+
+def test_get_email_addresses_df():
+    def get_part(part_id, mime_type, text):
+        data = base64.urlsafe_b64encode(text.encode("utf-8")).decode("utf-8")
+        return {"partId": part_id, "mimeType": mime_type, "body": {"data": data}}
+
+    # a multipart/alternative nested inside multipart/mixed, plus an attachment
+    message = {
+        "id": "message_1",
+        "payload": {
+            "partId": "",
+            "mimeType": "multipart/mixed",
+            "body": {},
+            "parts": [
+                {
+                    "partId": "0",
+                    "mimeType": "multipart/alternative",
+                    "body": {},
+                    "parts": [
+                        get_part("0.0", "text/plain", "write to a@example.com"),
+                        get_part("0.1", "text/html", "<b>b@example.org</b>"),
+                    ],
+                },
+                get_part("1", "text/csv", "c@example.com"),
+            ],
+        },
+    }
+
+    df_addresses = get_email_addresses_df([message])
+
+    print(df_addresses)
+    assert df_addresses.values.tolist() == [
+        ["message_1", "0.0", "a@example.com"],
+        ["message_1", "0.1", "b@example.org"],
+    ]
+
+
 # %%
 # Main #
 
@@ -103,5 +157,7 @@ if __name__ == "__main__":
     test_send_email()
     test_get_email_addresses_from_search_string()
     test_get_attachment_from_search_string()
+    test_sync_messages_from_search_string()
+    test_get_email_addresses_df()
 
 # %%
@@ -6,7 +6,13 @@ import datetime
 import config_test_utils  # noqa F401
 import pandas as pd
 from src.utils.display_tools import pprint_df, print_logger
-from src.utils.google_tools import WriteToSheets, get_book, get_book_sheet_df
+from src.utils.google_tools import (
+    WriteToSheets,
+    convert_values_to_df,
+    get_book,
+    get_book_sheet_df,
+    get_df_row_chunks,
+)
 
 # %%
 # Tests #
@@ -104,6 +110,37 @@ def test_create_sheet_on_workbook():
     assert id_datetime_there
 
 
+def test_convert_values_to_df():
+    values = [
+        ["Int", "Float", "Text", "Date", "Mixed"],
+        [1, 1.5, "a", "2024-01-01", 1],
+        [2, "", "b", "2024-01-02", "x"],
+        [3, 2.5],
+    ]
+    df = convert_values_to_df(values)
+    pprint_df(df)
+
+    assert list(df.columns) == ["Int", "Float", "Text", "Date", "Mixed"]
+    assert str(df["Int"].dtype) == "int64"
+    assert str(df["Float"].dtype) == "float64"
+    assert df["Float"].isna().sum() == 1
+    assert df["Text"].tolist() == ["a", "b", ""]
+    assert str(df["Date"].dtype).startswith("datetime64")
+    assert df["Mixed"].tolist() == [1, "x", ""]
+
+
+def test_get_df_row_chunks():
+    df = pd.DataFrame({"A": range(1000), "B": ["x" * 20] * 1000})
+    ls_row_chunks = get_df_row_chunks(df, max_chunk_bytes=10000)
+    print_logger(f"ls_row_chunks: {ls_row_chunks}")
+
+    assert len(ls_row_chunks) > 1
+    assert ls_row_chunks[0][0] == 0
+    assert ls_row_chunks[-1][1] == len(df)
+    for (_, previous_end), (next_start, _) in zip(ls_row_chunks, ls_row_chunks[1:]):
+        assert previous_end == next_start
+
+
 # %%
 # Main #
 
@@ -111,6 +148,8 @@ if __name__ == "__main__":
     test_get_book_sheet_df()
     test_write_to_sheets()
     test_create_sheet_on_workbook()
+    test_convert_values_to_df()
+    test_get_df_row_chunks()
 
     print_logger("All tests passed!")
 
@@ -0,0 +1,80 @@
+# %%
+# Imports #
+
+import os
+import tempfile
+from decimal import Decimal
+
+import config_test_utils  # noqa F401
+import pandas as pd
+import pyarrow.parquet as pq
+from psycopg2.extensions import Column
+from src.utils.display_tools import print_logger
+from src.utils.postgres_tools import (
+    get_postgres_parquet_schema,
+    get_postgres_parquet_table,
+)
+
+# %%
+# Variables #
+
+ls_description = [
+    Column(name="id", type_code=23),
+    Column(name="amount", type_code=1700, precision=12, scale=3),
+    Column(name="total", type_code=1700),
+    Column(name="note", type_code=3802),
+]
+
+ls_batches = [
+    pd.DataFrame(
+        [(1, Decimal("1.50"), Decimal("2"), None)],
+        columns=["id", "amount", "total", "note"],
+    ),
+    pd.DataFrame(
+        [(2, Decimal("123456.789"), Decimal("12345678901234567890.5"), {"a": 1})],
+        columns=["id", "amount", "total", "note"],
+    ),
+]
+
+# %%
+# Tests #
+
+
+def write_batches_to_parquet(path):
+    schema, ls_text_columns = get_postgres_parquet_schema(ls_description, ls_batches[0])
+    with pq.ParquetWriter(path, schema) as writer:
+        for df in ls_batches:
+            writer.write_table(get_postgres_parquet_table(df, schema, ls_text_columns))
+    return pd.read_parquet(path)
+
+
+def test_get_postgres_parquet_schema():
+    schema, ls_text_columns = get_postgres_parquet_schema(ls_description, ls_batches[0])
+    assert str(schema.field("amount").type) == "decimal128(12, 3)"
+    assert str(schema.field("total").type) == "string"
+    assert str(schema.field("note").type) == "string"
+    assert ls_text_columns == ["total", "note"]
+
+
+def test_write_postgres_batches_to_parquet():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        df = write_batches_to_parquet(os.path.join(temp_dir, "result.parquet"))
+
+    assert df["id"].tolist() == [1, 2]
+    assert df["amount"].tolist() == [Decimal("1.500"), Decimal("123456.789")]
+    assert df["total"].tolist() == ["2", "12345678901234567890.5"]
+    assert df["note"].isna().iloc[0]
+    assert df["note"].iloc[1] == '{"a": 1}'
+
+
+# %%
+# Main #
+
+if __name__ == "__main__":
+    test_get_postgres_parquet_schema()
+    test_write_postgres_batches_to_parquet()
+
+    print_logger("All tests passed!")
+
+
+# %%